@@ -1,10 +1,14 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, render_template, request, jsonify, send_file, Response
 import psycopg2
 from psycopg2 import OperationalError, ProgrammingError
 from openpyxl import Workbook
 import openpyxl
-from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
-from datetime import datetime, timedelta
+from openpyxl.styles import Font, Alignment, Border, Side, PatternFill, NamedStyle
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from openpyxl.utils import get_column_letter
+from datetime import datetime, timedelta, date, time as dt_time
+from decimal import Decimal
 import os
 import tempfile
 import logging
@@ -12,20 +16,42 @@ import time
 import json
 import uuid
 import re
-from contextlib import contextmanager
+from contextlib import contextmanager, ExitStack
 import csv
 from io import StringIO, BytesIO
 import base64
 import threading
+import queue
 import time
-from functools import wraps
-from collections import defaultdict
+from functools import wraps, lru_cache
+from abc import ABC, abstractmethod
+from itertools import islice, chain
+from urllib.parse import quote
+from werkzeug.http import http_date
+from collections import defaultdict, deque, OrderedDict, namedtuple
+from array import array
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
 import hashlib
+import importlib
+import copy
+import zipfile
+import zlib
+import gzip
+from html import escape as html_escape
+import pickle
+import sys
+import sqlite3
+import hmac
+import stat
+import heapq
+import secrets
 
 # ===================== 初始化配置 =====================
 
 # 数据库配置文件锁
 DB_CONFIG_LOCK = threading.Lock()
+# 数据库配置缓存两次检查文件状态的最小间隔（秒），本进程内写入配置会立即使缓存失效
+DB_CONFIG_CHECK_INTERVAL = 2.0
 app = Flask(__name__, template_folder='html', static_folder='static')
 
 # 获取路径配置
@@ -35,6 +61,30 @@ PROJECT_ROOT = BASE_DIR
 
 # 临时目录
 TEMP_DIR = tempfile.gettempdir()
+# 应用专用临时目录（导出文件、结果溢出文件、共享状态库），后台清理只处理该目录下登记的文件
+APP_TEMP_DIR = os.path.join(TEMP_DIR, 'hinautility')
+EXPORT_TEMP_DIR = os.path.join(APP_TEMP_DIR, 'exports')
+
+
+def ensure_private_dir(path):
+    """创建只有当前用户可访问的目录（0700），位于应用临时目录下时从 APP_TEMP_DIR 起逐级创建；
+    目录已存在时校验属主并收紧权限：系统临时目录是共享的，其他本地用户可能预先创建同名目录放入文件，
+    或读取其中的状态库和结果文件"""
+    path = os.path.abspath(path)
+    base = os.path.abspath(APP_TEMP_DIR)
+    levels = [path]
+    while levels[0] != base and os.path.commonpath([levels[0], base]) == base:
+        levels.insert(0, os.path.dirname(levels[0]))
+    for path in levels:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        if hasattr(os, 'getuid'):
+            st = os.lstat(path)
+            if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid():
+                raise PermissionError(f"临时目录 {path} 不是当前用户所有的目录，拒绝使用")
+            if st.st_mode & 0o077:
+                os.chmod(path, 0o700)
+    return path
+
 # 数据库配置（优先读取本地配置文件，无则用默认）
 DB_CONFIG_FILE = os.path.join(PROJECT_ROOT, "conf", "db_config.json")
 DEFAULT_DB_CONFIG = {
@@ -112,7 +162,8 @@ DEFAULT_APP_CONFIG = dict(
     app_memory_limit_mb=512,
     app_batch_insert_size=1000,
     app_transaction_timeout=120,
-    app_connection_retry_count=3
+    app_connection_retry_count=3,
+    app_cleanup_interval=60  # 后台清理间隔（秒）
 )
 
 def load_app_config():
@@ -274,61 +325,252 @@ APP_CONFIG = load_app_config()
 # 使用加载的应用配置初始化数据库超时配置
 DB_TIMEOUT_CONFIG = get_db_timeout_config()
 
+# ===================== 共享状态后端 =====================
+# SQLite状态库默认路径（多进程部署时各工作进程共享）
+STATE_DB_FILE = os.path.join(APP_TEMP_DIR, 'state.sqlite3')
+# 清理过期计数器和键值的最小间隔（秒）
+STATE_SWEEP_INTERVAL = 60
+
+
+def sliding_window_estimate(now, window, bucket, current, previous):
+    """滑动窗口计数估算：当前固定窗口的计数加上上一窗口按剩余重叠比例折算的计数"""
+    overlap = 1 - (now - bucket * window) / window
+    return previous * overlap + current
+
+
+class InProcessStateBackend:
+    """进程内共享状态：单进程（多线程）部署时使用"""
+    name = 'memory'
+    shared = False  # 状态是否跨进程可见
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}  # (命名空间, 键) -> [窗口序号, 当前窗口计数, 上一窗口计数, 窗口长度]
+        self._values = {}    # (命名空间, 键) -> (值, 过期时间)
+        self._next_sweep = time.time() + STATE_SWEEP_INTERVAL
+
+    def hit(self, namespace, key, window, limit):
+        """滑动窗口计数（每次O(1)）：窗口内估算次数未达上限时计数并返回True，否则返回False"""
+        now = time.time()
+        bucket = int(now // window)
+        with self._lock:
+            counter = self._counters.get((namespace, key))
+            if counter is None or counter[0] < bucket - 1:
+                current, previous = 0, 0
+            elif counter[0] == bucket - 1:
+                current, previous = 0, counter[1]
+            else:
+                current, previous = counter[1], counter[2]
+            allowed = sliding_window_estimate(now, window, bucket, current, previous) < limit
+            if allowed:
+                current += 1
+            self._counters[(namespace, key)] = [bucket, current, previous, window]
+            if now >= self._next_sweep:
+                self._sweep_locked(now)
+            return allowed
+
+    def clear_counter(self, namespace, key):
+        with self._lock:
+            self._counters.pop((namespace, key), None)
+
+    def set_value(self, namespace, key, value, ttl):
+        with self._lock:
+            self._values[(namespace, key)] = (value, time.time() + ttl)
+
+    def get_value(self, namespace, key):
+        """读取未过期的值，不存在或已过期时返回None"""
+        with self._lock:
+            item = self._values.get((namespace, key))
+            if item is None:
+                return None
+            if item[1] <= time.time():
+                del self._values[(namespace, key)]
+                return None
+            return item[0]
+
+    def delete_value(self, namespace, key):
+        with self._lock:
+            self._values.pop((namespace, key), None)
+
+    def _sweep_locked(self, now):
+        """移除两个窗口内没有请求的计数器和已过期的值（调用方需持有锁）"""
+        self._next_sweep = now + STATE_SWEEP_INTERVAL
+        idle = [k for k, c in self._counters.items() if c[0] < int(now // c[3]) - 1]
+        for k in idle:
+            del self._counters[k]
+        expired = [k for k, item in self._values.items() if item[1] <= now]
+        for k in expired:
+            del self._values[k]
+
+
+class SQLiteStateBackend:
+    """基于本地SQLite文件的共享状态：多进程部署时各工作进程共享频率限制、登录锁定和查询来源"""
+    name = 'sqlite'
+    shared = True
+
+    def __init__(self, path=STATE_DB_FILE):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path) or '.'
+        if directory == APP_TEMP_DIR:
+            ensure_private_dir(directory)
+        else:
+            os.makedirs(directory, exist_ok=True)
+        # 状态库含会话和锁定信息，只允许当前用户读写（WAL和共享内存文件沿用同样的权限）
+        os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+        if hasattr(os, 'getuid') and os.stat(path).st_mode & 0o077:
+            os.chmod(path, 0o600)
+        self._next_sweep = time.time() + STATE_SWEEP_INTERVAL
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS counters (ns TEXT NOT NULL, key TEXT NOT NULL, "
+                         "bucket INTEGER NOT NULL, count INTEGER NOT NULL, expire REAL NOT NULL, "
+                         "PRIMARY KEY (ns, key, bucket))")
+            conn.execute("CREATE TABLE IF NOT EXISTS kv (ns TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                         "expire REAL NOT NULL, PRIMARY KEY (ns, key))")
+
+    def _connection(self):
+        """每个进程的每个线程各用一个连接（fork后的子进程重新打开），自动提交模式"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _connect(self):
+        """写操作的事务（BEGIN IMMEDIATE，获取写锁）"""
+        return _SQLiteTransaction(self._connection())
+
+    def _maybe_sweep(self, conn, now):
+        if now >= self._next_sweep:
+            self._next_sweep = now + STATE_SWEEP_INTERVAL
+            conn.execute("DELETE FROM counters WHERE expire <= ?", (now,))
+            conn.execute("DELETE FROM kv WHERE expire <= ?", (now,))
+
+    def hit(self, namespace, key, window, limit):
+        """滑动窗口计数：每次只读写当前和上一窗口两行"""
+        now = time.time()
+        bucket = int(now // window)
+        with self._connect() as conn:
+            counts = dict(conn.execute("SELECT bucket, count FROM counters WHERE ns = ? AND key = ? AND bucket >= ?",
+                                       (namespace, key, bucket - 1)).fetchall())
+            allowed = sliding_window_estimate(now, window, bucket, counts.get(bucket, 0), counts.get(bucket - 1, 0)) < limit
+            if allowed:
+                conn.execute("INSERT INTO counters (ns, key, bucket, count, expire) VALUES (?, ?, ?, 1, ?) "
+                             "ON CONFLICT (ns, key, bucket) DO UPDATE SET count = count + 1",
+                             (namespace, key, bucket, (bucket + 2) * window))
+            self._maybe_sweep(conn, now)
+            return allowed
+
+    def clear_counter(self, namespace, key):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM counters WHERE ns = ? AND key = ?", (namespace, key))
+
+    def set_value(self, namespace, key, value, ttl):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO kv (ns, key, value, expire) VALUES (?, ?, ?, ?)",
+                         (namespace, key, json.dumps(value, ensure_ascii=False, default=str), now + ttl))
+            self._maybe_sweep(conn, now)
+
+    def get_value(self, namespace, key):
+        # 单条只读查询在自动提交模式下执行：WAL模式下读不阻塞写，也不和其他进程争用写锁
+        row = self._connection().execute("SELECT value FROM kv WHERE ns = ? AND key = ? AND expire > ?",
+                                         (namespace, key, time.time())).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def delete_value(self, namespace, key):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM kv WHERE ns = ? AND key = ?", (namespace, key))
+
+
+class _SQLiteTransaction:
+    """以 BEGIN IMMEDIATE 包裹一组语句，保证多进程下“检查后写入”的原子性"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+def create_state_backend(kind, path=None):
+    """按名称创建共享状态后端：memory（进程内）或 sqlite（本地文件，多进程共享）"""
+    if kind == 'memory':
+        return InProcessStateBackend()
+    if kind == 'sqlite':
+        return SQLiteStateBackend(path or STATE_DB_FILE)
+    raise ValueError(f"不支持的共享状态后端：{kind}（可选 memory、sqlite）")
+
+
+# 默认使用进程内状态；通过 python app.py --workers=N 启动时切换为sqlite，
+# 直接用 gunicorn app:app 多进程启动时可设置环境变量 HINAUTILITY_STATE_BACKEND=sqlite
+STATE_BACKEND = create_state_backend(os.environ.get('HINAUTILITY_STATE_BACKEND', 'memory'),
+                                     os.environ.get('HINAUTILITY_STATE_PATH'))
+
+
+def configure_state_backend(kind, path=None):
+    global STATE_BACKEND
+    STATE_BACKEND = create_state_backend(kind, path)
+    logging.info(f"共享状态后端：{STATE_BACKEND.name}" + (f"（{STATE_BACKEND.path}）" if kind == 'sqlite' else ''))
+    return STATE_BACKEND
+
 # 安全配置：请求频率限制
-REQUEST_COUNTS = defaultdict(list)  # 存储每个IP的请求时间戳
-MAX_REQUESTS_PER_MINUTE = 100  # 每分钟最大请求数
+MAX_REQUESTS_PER_MINUTE = 100  # 每分钟最大请求数（未单独配置的接口）
+RATE_LIMIT_WINDOW = 60  # 频率限制的滑动窗口（秒）
+# 各限制分组每个IP每分钟的最大请求数，分组之间互不占用额度
+RATE_LIMIT_GROUPS = {
+    'default': MAX_REQUESTS_PER_MINUTE,
+    'execute_sql': 60,   # 执行SQL、提交查询任务、执行计划
+    'export': 20,        # 导出文件（重新执行查询、生成大文件）
+}
+# 接口（endpoint）所属的限制分组，未列出的接口属于 default
+RATE_LIMIT_ENDPOINTS = {
+    'execute_sql': 'execute_sql',
+    'submit_query_job': 'execute_sql',
+    'analyze_query_plan': 'execute_sql',
+    'import_data': 'execute_sql',
+    'export_excel': 'export',
+    'export_csv': 'export',
+    'export_html': 'export',
+    'export_parquet': 'export',
+    'export_arrow': 'export',
+    'stream_export': 'export',
+    'submit_export_job': 'export',
+}
 MAX_LOGIN_ATTEMPTS = 5  # 最大登录尝试次数
 LOCKOUT_DURATION = 300  # 锁定持续时间（秒）
-FAILED_LOGIN_ATTEMPTS = {}  # 存储失败的登录尝试
-LOCKED_OUT_USERS = {}  # 存储被锁定的用户
-
-def rate_limit_exceeded(ip_address):
-    """检查是否超过请求频率限制"""
-    now = time.time()
-    # 清理一分钟前的请求记录
-    REQUEST_COUNTS[ip_address] = [
-        timestamp for timestamp in REQUEST_COUNTS[ip_address] 
-        if now - timestamp < 60
-    ]
-    
-    # 检查是否超过限制
-    if len(REQUEST_COUNTS[ip_address]) >= MAX_REQUESTS_PER_MINUTE:
-        return True
-    
-    # 记录当前请求
-    REQUEST_COUNTS[ip_address].append(now)
-    return False
+
+def rate_limit_exceeded(ip_address, endpoint=None):
+    """检查是否超过接口所属分组的请求频率限制（计数保存在共享状态后端，多进程部署时全局生效）"""
+    group = RATE_LIMIT_ENDPOINTS.get(endpoint, 'default')
+    return not STATE_BACKEND.hit(f'request:{group}', ip_address, RATE_LIMIT_WINDOW, RATE_LIMIT_GROUPS[group])
+
+def rate_limited(f):
+    """装饰器：只做请求频率限制（用于不要求身份验证的接口）"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if rate_limit_exceeded(request.environ.get('REMOTE_ADDR'), request.endpoint):
+            return jsonify({"status": "error", "message": "请求过于频繁，请稍后再试"}), 429
+        return f(*args, **kwargs)
+    return decorated_function
 
 def is_user_locked_out(username):
-    """检查用户是否被锁定"""
-    if username in LOCKED_OUT_USERS:
-        if time.time() - LOCKED_OUT_USERS[username] < LOCKOUT_DURATION:
-            return True
-        else:
-            # 锁定时间已过，清除锁定状态
-            del LOCKED_OUT_USERS[username]
-            if username in FAILED_LOGIN_ATTEMPTS:
-                del FAILED_LOGIN_ATTEMPTS[username]
-    return False
+    """检查用户是否被锁定（锁定记录带过期时间，到期自动解除）"""
+    return STATE_BACKEND.get_value('lockout', username) is not None
 
 def record_failed_login_attempt(username):
-    """记录失败的登录尝试"""
-    now = time.time()
-    if username not in FAILED_LOGIN_ATTEMPTS:
-        FAILED_LOGIN_ATTEMPTS[username] = []
-    
-    # 清理5分钟前的尝试记录
-    FAILED_LOGIN_ATTEMPTS[username] = [
-        timestamp for timestamp in FAILED_LOGIN_ATTEMPTS[username]
-        if now - timestamp < 300
-    ]
-    
-    # 添加当前尝试
-    FAILED_LOGIN_ATTEMPTS[username].append(now)
-    
-    # 检查是否达到最大尝试次数
-    if len(FAILED_LOGIN_ATTEMPTS[username]) >= MAX_LOGIN_ATTEMPTS:
-        LOCKED_OUT_USERS[username] = now  # 锁定用户
+    """记录失败的登录尝试，5分钟内达到最大次数即锁定用户"""
+    if not STATE_BACKEND.hit('login_failure', username, 300, MAX_LOGIN_ATTEMPTS - 1):
+        STATE_BACKEND.set_value('lockout', username, time.time(), LOCKOUT_DURATION)  # 锁定用户
+        STATE_BACKEND.clear_counter('login_failure', username)
 
 def validate_input(data, field_name, max_length=None, allowed_patterns=None):
     """验证输入数据"""
@@ -344,12 +586,8 @@ def validate_input(data, field_name, max_length=None, allowed_patterns=None):
     
     # 根据字段名称决定验证策略
     if field_name.lower() == 'sql语句':
-        # 对SQL语句使用较宽松的验证，主要在execute_sql中进行专门的安全检查
-        # 这里只检查最基本的恶意模式，允许正常的SQL操作
-        dangerous_patterns = [
-            r"(?i)\b(shutdown|backup\s+database|restore\s+database)\b",
-            r"(?i)(exec\s*\(|execute\s+\(|sp_|xp_)\s*[^']*;",
-        ]
+        # SQL语句由 check_sql_safety 做词法级安全分析（不误判字符串和注释中的内容），这里只检查长度
+        dangerous_patterns = []
     else:
         # 对其他字段使用更严格的验证
         dangerous_patterns = [
@@ -409,28 +647,571 @@ def require_auth(f):
     def decorated_function(*args, **kwargs):
         # 检查请求频率限制
         ip_address = request.environ.get('REMOTE_ADDR')
-        if rate_limit_exceeded(ip_address):
+        if rate_limit_exceeded(ip_address, request.endpoint):
             return jsonify({"status": "error", "message": "请求过于频繁，请稍后再试"}), 429
         
-        # 检查是否需要密码验证
-        app_password = load_app_password()
+        # 检查是否需要密码验证（密码和会话版本已缓存，不在每个请求中解密）
+        app_password, password_version = APP_PASSWORD_CACHE.get()
         if app_password and app_password.strip():  # 如果设置了应用密码
             session_token = request.headers.get('X-Session-Token') or request.cookies.get('session_token')
             if not session_token:
                 return jsonify({"status": "error", "message": "请先进行身份验证"}), 401
             
-            # 验证会话令牌（简单验证：检查是否存在于有效会话中）
-            expected_token = hashlib.sha256(app_password.encode()).hexdigest()
-            if session_token != expected_token:
+            # 验证会话令牌：查会话表，并确认签发后密码未被修改
+            if not validate_session_token(session_token, password_version):
                 return jsonify({"status": "error", "message": "身份验证已过期或无效"}), 401
         
         return f(*args, **kwargs)
     return decorated_function
 
-# 存储用户查询结果（使用UUID标识，解决并发问题）
-QUERY_RESULTS = {}
 # 结果过期时间（1小时）
 RESULT_EXPIRE_TIME = 3600
+# 查询结果缓存可使用的内存占 app_memory_limit_mb 的比例（其余留给查询执行与导出）
+RESULT_STORE_MEMORY_RATIO = 0.5
+# 查询结果溢出到磁盘的目录
+RESULT_SPILL_DIR = os.path.join(APP_TEMP_DIR, 'results')
+# 溢出文件中每个数据块的行数（按块读取，导出时无需一次性载入）
+RESULT_SPILL_CHUNK_ROWS = 5000
+# 估算结果集大小时抽样的行数
+RESULT_SIZE_SAMPLE_ROWS = 200
+# 列式结果中日期时间列的编码基准（无时区的 datetime 存为相对基准的微秒数）
+RESULT_EPOCH = datetime(1970, 1, 1)
+RESULT_MICROSECOND = timedelta(microseconds=1)
+# 定长数组存储的列类型：Python类型 -> (列类型, array类型码)
+RESULT_ARRAY_KINDS = {
+    int: ('int', 'q'),
+    float: ('float', 'd'),
+    bool: ('bool', 'b'),
+    datetime: ('datetime', 'q'),
+    date: ('date', 'q'),
+    dt_time: ('time', 'q'),
+}
+# 各输出格式中空值的表示：python/json/excel为None，csv为空串，html为&nbsp;
+RESULT_NULL_VALUES = {'python': None, 'json': None, 'excel': None, 'csv': '', 'html': '&nbsp;'}
+
+
+def estimate_values_size(values):
+    """抽样估算对象列表占用的内存字节数"""
+    if not values:
+        return sys.getsizeof(values)
+    step = max(1, len(values) // RESULT_SIZE_SAMPLE_ROWS)
+    sample = values[::step][:RESULT_SIZE_SAMPLE_ROWS]
+    sample_bytes = sum(sys.getsizeof(value) for value in sample)
+    return int(sys.getsizeof(values) + sample_bytes / len(sample) * len(values))
+
+
+def format_json_cell(value):
+    """混合类型列中JSON无法直接序列化的值：二进制按PostgreSQL风格输出十六进制（\\x...），时间输出ISO格式"""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return '\\x' + bytes(value).hex()
+    if isinstance(value, dt_time):
+        return value.isoformat()
+    return value
+
+
+def encode_temporal(kind, value):
+    if kind == 'datetime':
+        return (value - RESULT_EPOCH) // RESULT_MICROSECOND
+    if kind == 'date':
+        return value.toordinal()
+    return ((value.hour * 60 + value.minute) * 60 + value.second) * 1000000 + value.microsecond
+
+
+def decode_temporal(kind, values):
+    if kind == 'datetime':
+        return [RESULT_EPOCH + timedelta(microseconds=value) for value in values]
+    if kind == 'date':
+        return [date.fromordinal(value) for value in values]
+    return [dt_time(value // 3600000000, value // 60000000 % 60, value // 1000000 % 60, value % 1000000)
+            for value in values]
+
+
+class ResultColumn:
+    """列式结果中的一列：
+    int/float/bool 存为定长数组；无时区的 datetime/date/time 编码为整数数组；
+    str/decimal 拼接为一个字符串加偏移数组（decimal保存文本形式，导出时无需再转换）；
+    其他类型（含混合类型、带时区的时间）保留原对象列表。
+    空值记录在位图中（没有空值时为None），定长数组中空值位置填0（date列填1，保证按列批量解码时是合法的日期序数）"""
+    __slots__ = ('kind', 'data', 'offsets', 'nulls', 'clean')
+
+    def __init__(self, kind, data, offsets=None, nulls=None, clean=True):
+        self.kind = kind
+        self.data = data
+        self.offsets = offsets
+        self.nulls = nulls
+        self.clean = clean  # 字符串列中没有Excel非法字符，导出Excel时无需逐单元格清理
+
+    @classmethod
+    def build(cls, values):
+        """按列中实际值的类型选择存储方式"""
+        nulls = None
+        if any(value is None for value in values):
+            nulls = bytearray((len(values) + 7) // 8)
+            for i, value in enumerate(values):
+                if value is None:
+                    nulls[i >> 3] |= 1 << (i & 7)
+        types = {type(value) for value in values if value is not None}
+        value_type = types.pop() if len(types) == 1 else None
+        
+        if value_type in RESULT_ARRAY_KINDS:
+            kind, typecode = RESULT_ARRAY_KINDS[value_type]
+            try:
+                if kind in ('datetime', 'time') and any(v is not None and v.tzinfo is not None for v in values):
+                    raise ValueError("带时区的时间按对象存储")
+                if kind in ('int', 'float', 'bool'):
+                    data = array(typecode, [0 if v is None else v for v in values])
+                else:
+                    placeholder = 1 if kind == 'date' else 0
+                    data = array(typecode, [placeholder if v is None else encode_temporal(kind, v) for v in values])
+                return cls(kind, data, nulls=nulls)
+            except (OverflowError, ValueError):
+                pass  # 超出64位整数范围或带时区，按对象存储
+        elif value_type in (str, Decimal):
+            texts = [v if value_type is str else str(v) for v in values] if nulls is None else \
+                ['' if v is None else (v if value_type is str else str(v)) for v in values]
+            offsets = array('q', [0])
+            position = 0
+            for text in texts:
+                position += len(text)
+                offsets.append(position)
+            data = ''.join(texts)
+            clean = value_type is Decimal or not ILLEGAL_CHARACTERS_RE.search(data)
+            return cls('str' if value_type is str else 'decimal', data, offsets, nulls, clean)
+        return cls('object', list(values), nulls=nulls)
+
+    @property
+    def nbytes(self):
+        size = len(self.nulls) if self.nulls is not None else 0
+        if self.kind == 'object':
+            return size + estimate_values_size(self.data)
+        if self.offsets is not None:
+            return size + sys.getsizeof(self.data) + self.offsets.itemsize * len(self.offsets)
+        return size + self.data.itemsize * len(self.data)
+
+    def slice(self, start, stop):
+        """截取部分行（溢出到磁盘时按块保存）"""
+        nulls = None
+        if self.nulls is not None:
+            nulls = bytearray((stop - start + 7) // 8)
+            for i in range(start, stop):
+                if self.nulls[i >> 3] >> (i & 7) & 1:
+                    nulls[(i - start) >> 3] |= 1 << ((i - start) & 7)
+            if not any(nulls):
+                nulls = None
+        if self.offsets is not None:
+            base = self.offsets[start]
+            offsets = array('q', (offset - base for offset in self.offsets[start:stop + 1]))
+            return ResultColumn(self.kind, self.data[base:self.offsets[stop]], offsets, nulls, self.clean)
+        return ResultColumn(self.kind, self.data[start:stop], nulls=nulls)
+
+    def values(self, start, stop, fmt='python'):
+        """按输出格式批量转换 [start, stop) 的值：
+        python - 原始类型；json - 可直接序列化的值（Decimal为文本，日期时间与Flask默认格式一致）；
+        csv - 字符串；html - 转义后的字符串；excel - Excel可写入的值"""
+        kind = self.kind
+        if self.offsets is not None:
+            data, offsets = self.data, self.offsets
+            values = [data[offsets[i]:offsets[i + 1]] for i in range(start, stop)]
+            if fmt == 'html' and kind == 'str':
+                values = [html_escape(value) for value in values]
+            elif fmt == 'excel' and kind == 'str' and not self.clean:
+                values = [ILLEGAL_CHARACTERS_RE.sub('', value) for value in values]
+            elif kind == 'decimal' and fmt in ('python', 'excel'):
+                # 空值位置为空串，稍后按位图替换
+                values = [Decimal(value) if value else None for value in values]
+        elif kind == 'object':
+            values = self.data[start:stop]
+            if fmt == 'json':
+                values = [format_json_cell(value) for value in values]
+            elif fmt == 'csv':
+                values = [format_csv_cell(value) for value in values]
+            elif fmt == 'html':
+                values = [format_html_cell(value) for value in values]
+            elif fmt == 'excel':
+                values = [format_excel_cell(value) for value in values]
+        else:
+            values = self.data[start:stop]
+            if kind in ('datetime', 'date', 'time'):
+                values = decode_temporal(kind, values)
+                if fmt == 'json':
+                    values = [value.isoformat() for value in values] if kind == 'time' else \
+                        [http_date(value) for value in values]
+                elif fmt == 'csv' and kind == 'datetime':
+                    values = [value.strftime('%Y-%m-%d %H:%M:%S') for value in values]
+                elif fmt in ('csv', 'html'):
+                    values = [str(value) for value in values]
+            elif kind == 'bool':
+                values = [str(bool(value)) for value in values] if fmt in ('csv', 'html') else \
+                    [bool(value) for value in values]
+            elif fmt in ('csv', 'html'):
+                values = [str(value) for value in values]
+            else:
+                values = values.tolist()
+        
+        if self.nulls is not None:
+            nulls = self.nulls
+            null_value = RESULT_NULL_VALUES[fmt]
+            for i in range(start, stop):
+                if nulls[i >> 3] >> (i & 7) & 1:
+                    values[i - start] = null_value
+        return values
+
+
+class ColumnarResult:
+    """列式存储的查询结果：比逐行元组列表占用更少内存，
+    分页、JSON响应和导出按列批量转换格式，不再逐单元格判断类型"""
+    __slots__ = ('columns', 'row_count')
+
+    def __init__(self, columns, row_count):
+        self.columns = columns  # ResultColumn 列表
+        self.row_count = row_count
+
+    @classmethod
+    def from_rows(cls, rows, width):
+        """由驱动返回的行元组列表构造"""
+        columns = list(zip(*rows)) if rows else [()] * width
+        return cls([ResultColumn.build(values) for values in columns], len(rows))
+
+    def __len__(self):
+        return self.row_count
+
+    @property
+    def nbytes(self):
+        return sys.getsizeof(self) + sum(column.nbytes for column in self.columns)
+
+    def slice(self, start, stop):
+        stop = min(stop, self.row_count)
+        return ColumnarResult([column.slice(start, stop) for column in self.columns], max(0, stop - start))
+
+    def rows(self, start=0, stop=None, fmt='python'):
+        """返回 [start, stop) 的行元组列表（按 fmt 转换格式，见 ResultColumn.values）"""
+        stop = self.row_count if stop is None else min(stop, self.row_count)
+        if start >= stop:
+            return []
+        return list(zip(*(column.values(start, stop, fmt) for column in self.columns)))
+
+    def iter_rows(self, fmt='python', batch_rows=None):
+        """按批转换并逐行迭代"""
+        batch_rows = batch_rows or EXPORT_BATCH_ROWS
+        for start in range(0, self.row_count, batch_rows):
+            yield from self.rows(start, start + batch_rows, fmt)
+
+
+def format_row_batches(rows, width, fmt, batch_rows=None):
+    """把逐行读取的原始结果（如数据库游标）按批转为列式后转换格式"""
+    rows = iter(rows)
+    batch_rows = batch_rows or EXPORT_BATCH_ROWS
+    while True:
+        batch = list(islice(rows, batch_rows))
+        if not batch:
+            return
+        yield from ColumnarResult.from_rows(batch, width).rows(fmt=fmt)
+
+
+class QueryResultEntry:
+    """单个查询结果：内存中的列式结果（ColumnarResult），或溢出到磁盘的分块文件；
+    游标分页的查询只记录SQL来源（results为None），导出时重新执行"""
+    __slots__ = ('query_id', 'columns', 'results', 'row_count', 'size', 'create_time',
+                 'spill_path', 'spill_bytes', 'spilling', 'meta')
+
+    def __init__(self, query_id, columns, results, meta):
+        self.query_id = query_id
+        self.columns = columns
+        self.results = results
+        self.row_count = len(results) if results is not None else None
+        self.size = results.nbytes if results is not None else 0
+        self.create_time = time.time()
+        self.spill_path = None
+        self.spill_bytes = 0
+        self.spilling = False  # 正在写入磁盘，写完前结果仍留在内存中
+        self.meta = meta
+
+    @property
+    def cached(self):
+        """结果行是否已缓存（内存或磁盘）"""
+        return self.results is not None or self.spill_path is not None
+
+    def as_dict(self, results):
+        return {
+            'columns': self.columns,
+            'results': results,
+            'row_count': self.row_count,
+            'create_time': self.create_time,
+            **self.meta
+        }
+
+
+class QueryResultStore:
+    """按字节预算管理的查询结果缓存：LRU淘汰，冷数据溢出到磁盘而非直接丢弃"""
+
+    def __init__(self, spill_dir):
+        self.spill_dir = spill_dir
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # 按最近访问排序，左端最久未访问
+        self._expiry_heap = []  # (创建时间, 查询ID)，按创建时间过期，无需扫描全部结果
+        self._memory_bytes = 0
+        self._spilling_bytes = 0  # 正在写入磁盘、写完后释放的内存字节数
+        self.stats = defaultdict(int)
+
+    @property
+    def budget_bytes(self):
+        memory_limit_mb = APP_CONFIG.get('app_memory_limit_mb', DEFAULT_APP_CONFIG['app_memory_limit_mb'])
+        return int(memory_limit_mb * 1024 * 1024 * RESULT_STORE_MEMORY_RATIO)
+
+    def __contains__(self, query_id):
+        with self._lock:
+            entry = self._entries.get(query_id)
+            return entry is not None and entry.cached and not self._is_expired(entry)
+
+    def put(self, query_id, columns, results, **meta):
+        """保存查询结果（行元组列表或 ColumnarResult），超出内存预算时把最久未访问的结果溢出到磁盘"""
+        if not isinstance(results, ColumnarResult):
+            results = ColumnarResult.from_rows(results, len(columns))
+        entry = QueryResultEntry(query_id, columns, results, meta)
+        with self._lock:
+            self._entries[query_id] = entry
+            heapq.heappush(self._expiry_heap, (entry.create_time, query_id))
+            self._memory_bytes += entry.size
+            victims = self._select_victims_locked()
+        self._spill(victims)
+        self._publish_source(query_id, columns, meta)
+
+    def put_source(self, query_id, columns, **meta):
+        """只记录查询来源（SQL、数据库），不缓存结果行"""
+        entry = QueryResultEntry(query_id, columns, None, meta)
+        with self._lock:
+            self._entries[query_id] = entry
+            heapq.heappush(self._expiry_heap, (entry.create_time, query_id))
+        self._publish_source(query_id, columns, meta)
+
+    def lookup(self, query_id):
+        """获取查询结果条目（不载入结果行），不存在或已过期时返回None；
+        本进程没有该查询时，从共享状态后端取回其他工作进程发布的查询来源"""
+        with self._lock:
+            entry = self._entries.get(query_id)
+            if entry is not None and not self._is_expired(entry):
+                self.stats['hits'] += 1
+                self._entries.move_to_end(query_id)
+                return entry
+            self.stats['misses'] += 1
+        if entry is None and STATE_BACKEND.shared:
+            source = STATE_BACKEND.get_value('query_source', query_id)
+            if source:
+                entry = QueryResultEntry(query_id, source['columns'], None, source['meta'])
+                with self._lock:
+                    if self._entries.setdefault(query_id, entry) is entry:
+                        heapq.heappush(self._expiry_heap, (entry.create_time, query_id))
+                    self.stats['shared_sources'] += 1
+                return entry
+        return None
+
+    def _publish_source(self, query_id, columns, meta):
+        """多进程部署时把查询来源写入共享状态，其他工作进程导出时可重新执行"""
+        if not STATE_BACKEND.shared or not meta.get('sql'):
+            return
+        try:
+            STATE_BACKEND.set_value('query_source', query_id, {'columns': list(columns), 'meta': meta},
+                                    RESULT_EXPIRE_TIME)
+        except Exception as e:
+            logging.warning(f"发布查询来源到共享状态失败：{query_id} | {str(e)}")
+
+    def get(self, query_id):
+        """获取查询结果（含全部行），溢出的结果从磁盘载入"""
+        with self._lock:
+            entry = self._entries.get(query_id)
+            if entry is None or not entry.cached or self._is_expired(entry):
+                self.stats['misses'] += 1
+                return None
+            self.stats['hits'] += 1
+            self._entries.move_to_end(query_id)
+            results = entry.results
+            if results is not None:
+                return entry.as_dict(results.rows())
+            spill_path = entry.spill_path
+        
+        rows = [row for chunk in self._read_chunks(spill_path) for row in chunk.rows()]
+        results = ColumnarResult.from_rows(rows, len(entry.columns))
+        with self._lock:
+            self.stats['spill_loads'] += 1
+            victims = []
+            # 结果重新变热，预算允许时放回内存（磁盘文件保留，再次淘汰时无需重写）
+            if entry.results is None and self._entries.get(query_id) is entry and entry.size <= self.budget_bytes:
+                entry.results = results
+                self._memory_bytes += entry.size
+                victims = self._select_victims_locked(keep=entry)
+        self._spill(victims)
+        return entry.as_dict(rows)
+
+    def iter_rows(self, query_id, fmt='python'):
+        """逐块迭代查询结果的行，按 fmt 转换格式（见 ResultColumn.values）；
+        溢出的结果按块从磁盘读取，不整体载入内存"""
+        chunks = self._open_chunks(query_id)
+        if chunks is None:
+            return None
+        return (row for chunk in chunks for row in chunk.iter_rows(fmt))
+
+    def read_page(self, query_id, start, stop, fmt='json'):
+        """读取 [start, stop) 的行（溢出的结果跳过前面的块），结果不存在时返回None"""
+        chunks = self._open_chunks(query_id)
+        if chunks is None:
+            return None
+        rows = []
+        offset = 0
+        for chunk in chunks:
+            if offset + len(chunk) > start:
+                rows.extend(chunk.rows(max(0, start - offset), stop - offset, fmt))
+            offset += len(chunk)
+            if offset >= stop:
+                break
+        return rows
+
+    def _open_chunks(self, query_id):
+        """内存中的结果作为一个块，溢出的结果逐块从磁盘读取"""
+        with self._lock:
+            entry = self._entries.get(query_id)
+            if entry is None or not entry.cached or self._is_expired(entry):
+                self.stats['misses'] += 1
+                return None
+            self.stats['hits'] += 1
+            self._entries.move_to_end(query_id)
+            results = entry.results
+            spill_path = entry.spill_path
+        if results is not None:
+            return iter((results,))
+        return self._read_chunks(spill_path)
+
+    def remove(self, query_id):
+        with self._lock:
+            entry = self._entries.pop(query_id, None)
+            if entry is not None and entry.results is not None:
+                self._memory_bytes -= entry.size
+        if entry is not None:
+            self._remove_spill_file(entry)
+        return entry is not None
+
+    def expire(self, expire_time=RESULT_EXPIRE_TIME):
+        """清理过期结果（含磁盘文件），返回清理的查询ID列表"""
+        now = time.time()
+        expired = []
+        with self._lock:
+            heap = self._expiry_heap
+            while heap and now - heap[0][0] > expire_time:
+                create_time, query_id = heapq.heappop(heap)
+                entry = self._entries.get(query_id)
+                # 已删除或被同ID新结果替换的记录直接跳过
+                if entry is None or entry.create_time != create_time:
+                    continue
+                del self._entries[query_id]
+                if entry.results is not None:
+                    self._memory_bytes -= entry.size
+                expired.append(entry)
+            self.stats['expired'] += len(expired)
+        for entry in expired:
+            self._remove_spill_file(entry)
+        return [entry.query_id for entry in expired]
+
+    def snapshot(self):
+        """缓存统计信息"""
+        with self._lock:
+            memory_entries = sum(1 for e in self._entries.values() if e.results is not None)
+            disk_entries = sum(1 for e in self._entries.values() if e.results is None and e.spill_path)
+            return {
+                "entries": len(self._entries),
+                "memory_entries": memory_entries,
+                "disk_entries": disk_entries,
+                "source_entries": len(self._entries) - memory_entries - disk_entries,
+                "memory_bytes": self._memory_bytes,
+                "disk_bytes": sum(e.spill_bytes for e in self._entries.values()),
+                "budget_bytes": self.budget_bytes,
+                **dict(self.stats),
+            }
+
+    def _is_expired(self, entry):
+        return time.time() - entry.create_time > RESULT_EXPIRE_TIME
+
+    def _select_victims_locked(self, keep=None):
+        """从最久未访问的结果开始，选出需要移出内存的结果（调用方需持有锁）：
+        只标记为正在溢出，结果在写盘完成前仍可从内存读取（见 _spill）"""
+        victims = []
+        budget = self.budget_bytes
+        for entry in list(self._entries.values()):
+            if self._memory_bytes - self._spilling_bytes <= budget:
+                break
+            if entry.results is None or entry.spilling or entry is keep:
+                continue
+            entry.spilling = True
+            self._spilling_bytes += entry.size
+            victims.append(entry)
+            self.stats['evictions'] += 1
+        return victims
+
+    def _spill(self, victims):
+        """把移出内存的结果写入磁盘（在锁外执行），写完后在锁内同时设置 spill_path 并释放内存中的结果，
+        任何时刻读请求都能从内存或磁盘之一读到结果"""
+        for entry in victims:
+            spill_path = entry.spill_path
+            written = False
+            try:
+                if not (spill_path and os.path.exists(spill_path)):
+                    ensure_private_dir(self.spill_dir)
+                    spill_path = os.path.join(self.spill_dir, f"{entry.query_id}.rows")
+                    fd = os.open(spill_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                    with os.fdopen(fd, 'wb') as f:
+                        for start in range(0, len(entry.results), RESULT_SPILL_CHUNK_ROWS):
+                            pickle.dump(entry.results.slice(start, start + RESULT_SPILL_CHUNK_ROWS), f,
+                                        protocol=pickle.HIGHEST_PROTOCOL)
+                    written = True
+            except Exception as e:
+                # 写盘失败时只能丢弃该结果
+                logging.error(f"查询结果溢出到磁盘失败，结果已丢弃：{entry.query_id} | {str(e)}")
+                with self._lock:
+                    entry.spilling = False
+                    self._spilling_bytes -= entry.size
+                    if self._entries.get(entry.query_id) is entry:
+                        del self._entries[entry.query_id]
+                        self._memory_bytes -= entry.size
+                    entry.results = None
+                    self.stats['dropped'] += 1
+                continue
+            with self._lock:
+                entry.spilling = False
+                self._spilling_bytes -= entry.size
+                current = self._entries.get(entry.query_id) is entry
+                if current:
+                    entry.spill_path = spill_path
+                    if written:
+                        entry.spill_bytes = os.path.getsize(spill_path)
+                        self.stats['spills'] += 1
+                    entry.results = None
+                    self._memory_bytes -= entry.size
+            if not current:
+                # 写盘期间结果已被删除或过期
+                if written:
+                    self._remove_spill_file(entry, spill_path)
+            elif written:
+                logging.info(f"查询结果已溢出到磁盘：{entry.query_id} | 行数：{entry.row_count} | 文件大小：{entry.spill_bytes}")
+
+    def _read_chunks(self, spill_path):
+        with open(spill_path, 'rb') as f:
+            while True:
+                try:
+                    yield pickle.load(f)
+                except EOFError:
+                    return
+
+    def _remove_spill_file(self, entry, spill_path=None):
+        spill_path = spill_path or entry.spill_path
+        if spill_path:
+            try:
+                os.remove(spill_path)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logging.warning(f"删除查询结果溢出文件失败：{spill_path} | {str(e)}")
+
+
+# 存储用户查询结果（使用UUID标识，解决并发问题）
+QUERY_RESULTS = QueryResultStore(RESULT_SPILL_DIR)
 
 # 初始化日志（记录SQL执行、导出等操作）
 logging.basicConfig(
@@ -530,12 +1311,56 @@ def decrypt_app_password(enc_password: str) -> str:
         return ""
 
 
+class AppPasswordCache:
+    """已解密的应用访问密码缓存：只在配置中的加密密码变化（设置/修改密码、保存配置、
+    其他进程修改配置文件后重新加载）时解密，并生成新的会话版本使旧会话失效"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._encrypted = None
+        self._state = ("", "")  # (明文密码, 会话版本)
+
+    def get(self):
+        """返回 (明文密码, 会话版本)"""
+        encrypted_password = APP_CONFIG.get('app_password', '')
+        if encrypted_password == self._encrypted:
+            return self._state
+        with self._lock:
+            if encrypted_password != self._encrypted:
+                plain_password = decrypt_app_password(encrypted_password)
+                version = hashlib.sha256(encrypted_password.encode('utf-8')).hexdigest() if plain_password else ""
+                self._state = (plain_password, version)
+                self._encrypted = encrypted_password
+            return self._state
+
+
+APP_PASSWORD_CACHE = AppPasswordCache()
+# 会话有效期（秒）
+SESSION_TTL = 24 * 3600
+
+
+def session_key(token):
+    """会话表中的键：令牌的SHA-256摘要（不保存令牌原文，状态库泄露也无法冒用会话）"""
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+def issue_session_token(password_version):
+    """签发随机会话令牌，记录在会话表（共享状态后端）中"""
+    token = secrets.token_urlsafe(32)
+    STATE_BACKEND.set_value('session', session_key(token), password_version, SESSION_TTL)
+    return token
+
+
+def validate_session_token(token, password_version):
+    """会话令牌存在、未过期且签发时的密码版本与当前一致"""
+    issued_version = STATE_BACKEND.get_value('session', session_key(token))
+    return issued_version is not None and hmac.compare_digest(issued_version, password_version)
+
+
 def load_app_password():
     """加载应用访问密码配置。"""
     try:
-        # 从APP_CONFIG加载密码
-        encrypted_password = APP_CONFIG.get('app_password', '')
-        return decrypt_app_password(encrypted_password)
+        return APP_PASSWORD_CACHE.get()[0]
     except Exception as e:
         logging.error(f"加载应用访问密码失败：{e}")
         return ""
@@ -603,8 +1428,7 @@ def load_db_config():
         if config.get('password'):
             config['password'] = encrypt_password(config['password'])
         try:
-            with open(DB_CONFIG_FILE, 'w', encoding='utf-8') as f:
-                json.dump(config, f, ensure_ascii=False, indent=2)
+            write_db_config_file(config)
         except Exception as e:
             logging.error(f"写入默认数据库配置失败：{e}")
     # 运行时始终返回明文密码，方便后续连接使用
@@ -613,8 +1437,8 @@ def load_db_config():
     return config
 
 
-def load_multi_db_config():
-    """加载多数据库配置（兼容旧格式）"""
+def read_multi_db_config():
+    """从文件读取多数据库配置并解密密码（兼容旧格式）"""
     try:
         with open(DB_CONFIG_FILE, 'r', encoding='utf-8') as f:
             config = json.load(f)
@@ -665,36 +1489,120 @@ def load_multi_db_config():
         }
 
 
+def get_file_signature(path):
+    """文件状态签名（mtime/inode/大小），文件不存在时返回None"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_ino, st.st_size)
+
+
+class DbConfigCache:
+    """已解析（密码已解密）的多数据库配置缓存，按ID建立索引；
+    配置文件mtime/inode变化或本进程写入配置后失效，命中时不读文件也不解密密码"""
+
+    def __init__(self, path, loader, check_interval=DB_CONFIG_CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._config = None
+        self._by_id = {}
+        self._default = None
+        self._signature = None
+        self._checked_at = 0.0
+
+    def invalidate(self):
+        """丢弃缓存，下次访问时重新读取配置文件"""
+        with self._lock:
+            self._config = None
+
+    def _current_locked(self):
+        now = time.monotonic()
+        if self._config is not None and now - self._checked_at < self.check_interval:
+            return self._config
+        # 先取签名再读取，读取期间文件被改写时下次检查会重新加载
+        signature = get_file_signature(self.path)
+        self._checked_at = now
+        if self._config is None or signature != self._signature:
+            config = self._loader()
+            databases = config.get('databases', [])
+            by_id = {}
+            for db in databases:
+                by_id.setdefault(db.get('id'), db)
+            self._by_id = by_id
+            # 标记为默认的数据库，没有则取第一个
+            self._default = next((db for db in databases if db.get('is_default', False)),
+                                 databases[0] if databases else None)
+            self._config = config
+            self._signature = signature
+        return self._config
+
+    def get_config(self):
+        """完整配置的副本（调用方可自由修改）"""
+        with self._lock:
+            return copy.deepcopy(self._current_locked())
+
+    def get_database(self, db_id):
+        with self._lock:
+            self._current_locked()
+            db = self._by_id.get(db_id)
+            return dict(db) if db is not None else None
+
+    def get_default(self):
+        with self._lock:
+            self._current_locked()
+            return dict(self._default) if self._default is not None else None
+
+    def get_databases_by_tag(self, tag):
+        with self._lock:
+            config = self._current_locked()
+            return [dict(db) for db in config.get('databases', []) if tag in (db.get('tags') or [])]
+
+
+def write_db_config_file(config):
+    """写入数据库配置文件（密码需已加密）并使配置缓存失效"""
+    try:
+        with open(DB_CONFIG_FILE, 'w', encoding='utf-8') as f:
+            json.dump(config, f, ensure_ascii=False, indent=2)
+    finally:
+        DB_CONFIG_CACHE.invalidate()
+
+
+def load_multi_db_config():
+    """加载多数据库配置（内存缓存，返回副本）"""
+    return DB_CONFIG_CACHE.get_config()
+
+
 def get_database_by_id(db_id):
     """根据ID获取数据库配置"""
-    config = load_multi_db_config()
-    databases = config.get('databases', [])
-    
-    for db in databases:
-        if db['id'] == db_id:
-            return db
-    
-    return None
+    return DB_CONFIG_CACHE.get_database(db_id)
 
 
 def get_default_database():
     """获取默认数据库配置"""
-    config = load_multi_db_config()
-    databases = config.get('databases', [])
-    
-    # 查找标记为默认的数据库
-    for db in databases:
-        if db.get('is_default', False):
-            return db
-    
-    # 如果没有默认数据库，返回第一个
-    if databases:
-        return databases[0]
-    
-    return None
+    return DB_CONFIG_CACHE.get_default()
+
+
+def get_databases_by_tag(tag):
+    """获取带有指定标签的数据库配置（按配置文件中的顺序）"""
+    return DB_CONFIG_CACHE.get_databases_by_tag(tag)
+
+
+def parse_db_tags(value):
+    """数据库标签：接受字符串列表或逗号分隔的字符串，去掉空白和重复项"""
+    if isinstance(value, str):
+        value = value.split(',')
+    if not isinstance(value, list):
+        return []
+    return list(dict.fromkeys(str(tag).strip() for tag in value if str(tag).strip()))
+
+
+DB_CONFIG_CACHE = DbConfigCache(DB_CONFIG_FILE, read_multi_db_config)
 
 def get_db_connection(db_id=None):
-    """获取数据库连接上下文管理器（支持多数据库类型，确保使用正确的驱动）"""
+    """获取数据库连接上下文管理器（按数据库类型从驱动注册表选择驱动，连接从连接池借出）"""
     db_config = None
     if db_id:
         db_config = get_database_by_id(db_id)
@@ -704,48 +1612,13 @@ def get_db_connection(db_id=None):
     if not db_config:
         raise ValueError("未找到有效的数据库配置")
     
-    db_type = db_config.get('type', 'postgresql').lower()
-    
-    # 数据库驱动映射表 - 确保每种数据库使用正确的驱动
-    DRIVER_MAPPING = {
-        # PostgreSQL系列（包括兼容PostgreSQL协议的国产数据库）
-        'postgresql': ('PostgreSQL', get_postgresql_connection, 'psycopg2'),
-        'highgo': ('瀚高数据库', get_postgresql_connection, 'psycopg2'),
-        'gauss': ('华为高斯数据库', get_postgresql_connection, 'psycopg2'),
-        'uxdb': ('优图数据库', get_postgresql_connection, 'psycopg2'),
-        'vastbase': ('海量数据库', get_postgresql_connection, 'psycopg2'),
-        'yashandb': ('崖山数据库', get_yashandb_connection, 'yasdb'),
-        'gbase': ('南大通用数据库', get_postgresql_connection, 'psycopg2'),
-        'vanward': ('万里数据库', get_postgresql_connection, 'psycopg2'),
-        'kingbase': ('人大金仓数据库', get_kingbase_connection, 'psycopg2'),
-        
-        # MySQL系列（包括兼容MySQL协议的数据库）
-        'mysql': ('MySQL', get_mysql_connection, 'pymysql'),
-        'tidb': ('TiDB分布式数据库', get_tidb_connection, 'pymysql'),
-        'oceanbase': ('OceanBase数据库', get_oceanbase_connection, 'pymysql'),
-        'greatdb': ('巨杉数据库', get_mysql_connection, 'pymysql'),
-        
-        # Oracle系列（包括兼容Oracle协议的数据库）
-        'oracle': ('Oracle数据库', get_oracle_connection, 'cx_Oracle'),
-        'shentong': ('神通数据库', get_oracle_connection, 'cx_Oracle'),
-        
-        # 专用驱动数据库
-        'dm': ('达梦数据库', get_dm_connection, 'dm_python')
-    }
-    
-    # 检查数据库类型是否支持
-    if db_type not in DRIVER_MAPPING:
-        supported_types = ', '.join(DRIVER_MAPPING.keys())
-        raise ValueError(f"不支持的数据库类型：{db_type}。支持的类型：{supported_types}")
-    
-    # 获取驱动信息
-    db_display_name, connection_func, required_driver = DRIVER_MAPPING[db_type]
+    driver = get_db_driver(db_config.get('type', 'postgresql'))
     
     # 记录驱动使用日志
-    logging.info(f"数据库连接 [{db_config['name']}] 使用驱动: {db_display_name} ({required_driver})")
+    logging.info(f"数据库连接 [{db_config['name']}] 使用驱动: {driver.driver_info}")
     
-    # 返回连接函数和配置
-    return connection_func, db_config
+    # 返回连接池连接函数和配置（连接参数与超时由驱动适配器统一设置）
+    return get_pooled_connection, db_config
 
 
 def execute_db_operation(db_id, operation_func):
@@ -776,344 +1649,3223 @@ def set_default_database(db_id):
         if raw_password:
             db_config['password'] = encrypt_password(raw_password)
     
-    with open(DB_CONFIG_FILE, 'w', encoding='utf-8') as f:
-        json.dump(config, f, ensure_ascii=False, indent=2)
+    write_db_config_file(config)
     
     return True
 
 
 
-@contextmanager
-def get_yashandb_connection(db_config):
-    """崖山数据库连接上下文管理器（使用专用yasdb驱动）"""
-    conn = None
-    try:
-        import yasdb
-        # 解密密码
-        decrypted_password = decrypt_password(db_config.get('password', ''))
-        
-        # 构造DSN连接字符串
-        dsn = f"{db_config['host']}:{db_config['port']}"
-        
-        # 使用DSN方式连接
-        conn = yasdb.connect(
-            dsn=dsn,
-            user=db_config['user'],
-            password=decrypted_password,
-        )
-        yield conn
-    except ImportError:
-        raise Exception("未找到崖山数据库驱动(yasdb)，请安装yasdb包")
-    except Exception as e:
-        if conn:
-            conn.rollback()
-        raise Exception(f"崖山数据库连接失败: {str(e)}")
-    finally:
-        if conn:
-            conn.close()
+# ===================== 数据库驱动适配 =====================
+class DatabaseDriver(ABC):
+    """数据库驱动适配器：按数据库类型提供建连、会话语句超时、执行计划和分页改写等方言钩子"""
+    module = None          # 驱动模块名
+    driver_name = None     # 显示用的驱动名称
+    package = None         # 缺少驱动时提示安装的包名
+    validation_query = 'SELECT 1'
+    explain_prefix = 'EXPLAIN'
+    plan_style = 'generic'  # 执行计划结果的整理方式：postgresql/mysql/oracle/generic
+    discard_unfinished_cursor = False  # 未读完的按需取数游标是否直接丢弃连接
+    server_cursor_in_transaction = False  # 按需取数游标是否要求事务保持打开（持有期间占用一个未提交事务）
+    bind_style = 'format'  # 批量写入的参数占位符：format(%s)/numeric(:1)/qmark(?)
+    release_savepoint = True  # 是否支持 RELEASE SAVEPOINT（Oracle系列不支持，保存点随事务结束释放）
+    sql_dialect = 'generic'  # 脚本分割方言：generic/postgresql/mysql/oracle
+    copy_csv_export = False  # 是否支持由数据库直接生成CSV（见 copy_csv_out）
+    # cursor.description 类型码 -> 列类型（int/float/bool/decimal/str/datetime/date/time/bytes），
+    # 用于Arrow/Parquet导出的列类型，未列出的类型码按值推断
+    column_type_codes = {}
+
+    def __init__(self, db_type, display_name):
+        self.db_type = db_type
+        self.display_name = display_name
+
+    @property
+    def driver_info(self):
+        return f"{self.display_name} ({self.driver_name})"
+
+    def import_driver(self):
+        try:
+            return importlib.import_module(self.module)
+        except ImportError:
+            raise ImportError(f"未找到{self.display_name}驱动({self.module})，请安装 {self.package}")
 
+    @abstractmethod
+    def connect(self, db_config, connect_timeout):
+        """建立物理连接（密码兼容加密与明文），connect_timeout 为建立连接的超时秒数"""
 
-def get_postgresql_connection(db_config):
-    """PostgreSQL数据库连接上下文管理器"""
-    conn = None
-    try:
-        import psycopg2
-        from psycopg2 import OperationalError, ProgrammingError
-        # 解密密码
-        decrypted_password = decrypt_password(db_config.get('password', ''))
-        conn = psycopg2.connect(
+    def set_statement_timeout(self, conn, seconds):
+        """设置会话级语句超时，驱动不支持时忽略"""
+        pass
+
+    def cancel(self, conn, db_config):
+        """取消连接上正在执行的语句（由其他线程调用），驱动不支持时返回False"""
+        # psycopg2/cx_Oracle 等驱动的 connection.cancel() 向服务端发送取消请求（如PostgreSQL的cancel request）
+        cancel = getattr(conn, 'cancel', None)
+        if cancel is None:
+            return False
+        cancel()
+        return True
+
+    def explain_sql(self, sql):
+        return f"{self.explain_prefix} {sql}"
+
+    def window_sql(self, sql, offset, limit):
+        """将查询改写为只取指定窗口的查询（Oracle 12c+ 及兼容数据库语法）"""
+        return f"SELECT * FROM ({sql}) OFFSET {int(offset)} ROWS FETCH NEXT {int(limit)} ROWS ONLY"
+
+    def open_server_cursor(self, conn, page_size):
+        """创建只按需取数的游标，返回 (游标, 是否可回滚定位)"""
+        cursor = conn.cursor()
+        # cx_Oracle等驱动按arraysize批量预取
+        cursor.arraysize = page_size
+        return cursor, False
+
+    def column_types(self, description):
+        """由 cursor.description 得到各列的 [列类型, 精度, 小数位]，类型码未知的列类型为None"""
+        types = []
+        for desc in description:
+            try:
+                kind = self.column_type_codes.get(desc[1])
+            except TypeError:  # 不可哈希的类型码
+                kind = None
+            types.append([kind, *(value if isinstance(value, int) else None for value in desc[4:6])])
+        return types
+
+    def insert_sql(self, table, columns):
+        if self.bind_style == 'numeric':
+            placeholders = [f":{i}" for i in range(1, len(columns) + 1)]
+        elif self.bind_style == 'qmark':
+            placeholders = ['?'] * len(columns)
+        else:
+            placeholders = ['%s'] * len(columns)
+        return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(placeholders)})"
+
+    def copy_csv_out(self, conn, sql, sink, separator=',', include_header=True):
+        """由数据库直接将查询结果生成CSV字节写入 sink（有 write 方法），只在 copy_csv_export 为True时调用"""
+        raise ValueError(f"{self.display_name}不支持由数据库直接生成CSV导出！")
+
+    def bulk_insert(self, conn, table, columns, rows):
+        """在当前事务中批量写入一批行（不提交）：默认使用 executemany——
+        PyMySQL会改写为多行INSERT，cx_Oracle为数组绑定，一批只需一次往返"""
+        cursor = conn.cursor()
+        try:
+            cursor.executemany(self.insert_sql(table, columns), rows)
+        finally:
+            cursor.close()
+
+
+class PostgreSQLDriver(DatabaseDriver):
+    """PostgreSQL及兼容PostgreSQL协议的数据库（psycopg2）"""
+    module = 'psycopg2'
+    driver_name = 'psycopg2'
+    package = 'psycopg2-binary'
+    explain_prefix = 'EXPLAIN ANALYZE'
+    plan_style = 'postgresql'
+    sql_dialect = 'postgresql'
+    copy_csv_export = True
+    server_cursor_in_transaction = True
+    # 类型OID（timestamptz等带时区的类型按值推断）
+    column_type_codes = {
+        16: 'bool', 20: 'int', 21: 'int', 23: 'int', 700: 'float', 701: 'float', 1700: 'decimal',
+        19: 'str', 25: 'str', 1042: 'str', 1043: 'str', 1082: 'date', 1114: 'datetime', 1083: 'time', 17: 'bytes',
+    }
+
+    def connect(self, db_config, connect_timeout):
+        psycopg2_module = self.import_driver()
+        return psycopg2_module.connect(
             host=db_config['host'],
             port=int(db_config['port']),  # 确保端口是整数
             user=db_config['user'],
-            password=decrypted_password,
+            password=decrypt_password(db_config.get('password', '')),
             database=db_config['database'],
-            connect_timeout=10  # 连接超时时间
+            connect_timeout=connect_timeout
         )
-        yield conn
-    except Exception as e:
-        if conn:
-            conn.rollback()
-        raise e
-    finally:
-        if conn:
-            conn.close()
+
+    def set_statement_timeout(self, conn, seconds):
+        with conn.cursor() as cur:
+            cur.execute(f"SET statement_timeout = {int(seconds) * 1000};")  # 转换为毫秒
+        conn.commit()
+
+    def window_sql(self, sql, offset, limit):
+        return f"SELECT * FROM ({sql}) hina_page LIMIT {int(limit)} OFFSET {int(offset)}"
+
+    def open_server_cursor(self, conn, page_size):
+        # psycopg2命名游标即服务端游标（DECLARE ... SCROLL CURSOR），按需FETCH；游标只在声明它的事务内有效
+        cursor = conn.cursor(name=f"hina_{uuid.uuid4().hex}", scrollable=True)
+        cursor.itersize = page_size
+        return cursor, True
+
+    def bulk_insert(self, conn, table, columns, rows):
+        # COPY FROM STDIN：一批行编码为CSV一次发送（CSV格式中未加引号的空值为NULL）
+        buffer = StringIO()
+        csv.writer(buffer, lineterminator='\n').writerows(rows)
+        buffer.seek(0)
+        with conn.cursor() as cur:
+            cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+    def copy_csv_out(self, conn, sql, sink, separator=',', include_header=True):
+        # COPY (查询) TO STDOUT：服务端生成CSV，copy_expert 把收到的字节直接交给 sink.write，不构造Python行对象；
+        # 调用方已用 is_copy_export_query 校验，查询单独成行，末尾的行注释不会注释掉后面的 ") TO STDOUT"
+        header = 'true' if include_header else 'false'
+        query = sql.strip().rstrip(';').rstrip()
+        with conn.cursor() as cur:
+            cur.copy_expert(
+                f"COPY (\n{query}\n) TO STDOUT WITH (FORMAT csv, HEADER {header}, DELIMITER '{separator}', ENCODING 'UTF8')",
+                sink
+            )
 
 
+class MySQLDriver(DatabaseDriver):
+    """MySQL及兼容MySQL协议的数据库（PyMySQL）"""
+    module = 'pymysql'
+    driver_name = 'PyMySQL'
+    package = 'PyMySQL'
+    explain_prefix = 'EXPLAIN FORMAT=JSON'
+    plan_style = 'mysql'
+    sql_dialect = 'mysql'
+    # FIELD_TYPE（字符串和二进制共用类型码，按值推断；TIME返回timedelta，同样按值推断）
+    column_type_codes = {
+        0: 'decimal', 246: 'decimal', 1: 'int', 2: 'int', 3: 'int', 8: 'int', 9: 'int', 13: 'int',
+        4: 'float', 5: 'float', 10: 'date', 7: 'datetime', 12: 'datetime',
+    }
+    # 非缓冲游标关闭时会读完剩余结果，直接丢弃连接更快
+    discard_unfinished_cursor = True
 
-# 为其他数据库类型预留连接函数
-@contextmanager
-def get_mysql_connection(db_config):
-    """MySQL数据库连接上下文管理器"""
-    try:
-        import pymysql
-        # 解密密码
-        decrypted_password = decrypt_password(db_config.get('password', ''))
-        conn = pymysql.connect(
+    def connect(self, db_config, connect_timeout):
+        pymysql = self.import_driver()
+        return pymysql.connect(
             host=db_config['host'],
             port=int(db_config['port']),
             user=db_config['user'],
-            password=decrypted_password,
+            password=decrypt_password(db_config.get('password', '')),
             database=db_config['database'],
             charset='utf8mb4',
-            connect_timeout=10
+            connect_timeout=connect_timeout
         )
-        yield conn
-    except ImportError:
-        raise ImportError("请安装PyMySQL：pip install PyMySQL")
-    except Exception as e:
-        raise e
-    finally:
-        if 'conn' in locals() and conn:
-            conn.close()
 
+    def set_statement_timeout(self, conn, seconds):
+        with conn.cursor() as cur:
+            cur.execute(f"SET SESSION MAX_EXECUTION_TIME = {int(seconds) * 1000};")  # 转换为毫秒
+
+    def cancel(self, conn, db_config):
+        # PyMySQL没有取消接口，另开连接执行 KILL QUERY 终止该会话当前的语句
+        thread_id = conn.thread_id()
+        killer = self.connect(db_config, DB_TIMEOUT_CONFIG['connect_timeout'])
+        try:
+            with killer.cursor() as cur:
+                cur.execute(f"KILL QUERY {int(thread_id)}")
+        finally:
+            killer.close()
+        return True
 
+    def window_sql(self, sql, offset, limit):
+        return f"SELECT * FROM ({sql}) hina_page LIMIT {int(limit)} OFFSET {int(offset)}"
 
-@contextmanager
-def get_oracle_connection(db_config):
-    """Oracle数据库连接上下文管理器"""
-    try:
-        import cx_Oracle
-        # 解密密码
-        decrypted_password = decrypt_password(db_config.get('password', ''))
+    def open_server_cursor(self, conn, page_size):
+        # PyMySQL非缓冲游标，结果逐行从网络读取
+        import pymysql.cursors
+        return conn.cursor(pymysql.cursors.SSCursor), False
+
+
+class OceanBaseDriver(MySQLDriver):
+    """OceanBase（MySQL模式），语句超时由 ob_query_timeout 控制"""
+
+    def set_statement_timeout(self, conn, seconds):
+        with conn.cursor() as cur:
+            cur.execute(f"SET SESSION ob_query_timeout = {int(seconds) * 1000000};")  # 转换为微秒
+
+
+class OracleDriver(DatabaseDriver):
+    """Oracle及兼容Oracle协议的数据库（cx_Oracle）"""
+    module = 'cx_Oracle'
+    driver_name = 'cx_Oracle'
+    package = 'cx_Oracle'
+    validation_query = 'SELECT 1 FROM DUAL'
+    explain_prefix = 'EXPLAIN PLAN FOR'
+    plan_style = 'oracle'
+    bind_style = 'numeric'
+    release_savepoint = False
+    sql_dialect = 'oracle'
+    # cx_Oracle 类型名称（8.x为 DB_TYPE_* 对象，更早版本为类型类）-> 列类型，NUMBER 按精度区分整数和小数
+    column_type_names = {
+        'VARCHAR': 'str', 'NVARCHAR': 'str', 'CHAR': 'str', 'NCHAR': 'str', 'LONG': 'str', 'STRING': 'str',
+        'FIXED_CHAR': 'str', 'FIXED_NCHAR': 'str', 'LONG_STRING': 'str', 'DATE': 'datetime', 'DATETIME': 'datetime',
+        'TIMESTAMP': 'datetime', 'BINARY_FLOAT': 'float', 'BINARY_DOUBLE': 'float', 'NATIVE_FLOAT': 'float',
+        'RAW': 'bytes', 'BINARY': 'bytes',
+    }
+
+    def column_types(self, description):
+        types = []
+        for desc in description:
+            name = getattr(desc[1], 'name', None) or getattr(desc[1], '__name__', '')
+            name = name[8:] if name.startswith('DB_TYPE_') else name
+            precision, scale = desc[4], desc[5]
+            kind = self.column_type_names.get(name)
+            if name == 'NUMBER' and precision:
+                kind = 'int' if scale == 0 and precision <= 18 else 'decimal'
+            types.append([kind, precision or None, scale if precision else None])
+        return types
+
+    def connect(self, db_config, connect_timeout):
+        cx_Oracle = self.import_driver()
         dsn = cx_Oracle.makedsn(db_config['host'], int(db_config['port']), service_name=db_config['database'])
-        conn = cx_Oracle.connect(
+        # cx_Oracle.connect 没有超时参数：写入连接描述符（TCP建连和整个建连过程的超时，单位秒）
+        timeout = int(connect_timeout)
+        dsn = dsn.replace('(DESCRIPTION=', f'(DESCRIPTION=(TRANSPORT_CONNECT_TIMEOUT={timeout})(CONNECT_TIMEOUT={timeout})', 1)
+        return cx_Oracle.connect(
             user=db_config['user'],
-            password=decrypted_password,
+            password=decrypt_password(db_config.get('password', '')),
             dsn=dsn,
             encoding="UTF-8"
         )
-        yield conn
-    except ImportError:
-        raise ImportError("请安装cx_Oracle：pip install cx_Oracle")
-    except Exception as e:
-        raise e
-    finally:
-        if 'conn' in locals() and conn:
-            conn.close()
+
+    def set_statement_timeout(self, conn, seconds):
+        # cx_Oracle 7+：单次数据库往返的超时（毫秒）
+        if hasattr(conn, 'call_timeout'):
+            conn.call_timeout = int(seconds) * 1000
+
+
+class YashanDBDriver(DatabaseDriver):
+    """崖山数据库（专用yasdb驱动）"""
+    module = 'yasdb'
+    driver_name = 'yasdb'
+    package = 'yasdb'
+    validation_query = 'SELECT 1 FROM DUAL'
+    explain_prefix = 'EXPLAIN ANALYZE'
+    plan_style = 'postgresql'
+    bind_style = 'numeric'
+    release_savepoint = False
+    sql_dialect = 'oracle'
+
+    def connect(self, db_config, connect_timeout):
+        yasdb = self.import_driver()
+        # 使用DSN方式连接；yasdb驱动没有建连超时参数，connect_timeout（db_connect_timeout）对崖山数据库不生效
+        return yasdb.connect(
+            dsn=f"{db_config['host']}:{db_config['port']}",
+            user=db_config['user'],
+            password=decrypt_password(db_config.get('password', '')),
+        )
 
 
+class DMDriver(DatabaseDriver):
+    """达梦数据库（dm_python）"""
+    module = 'dm_python'
+    driver_name = 'dm_python'
+    package = 'dm-python'
+    validation_query = 'SELECT 1 FROM DUAL'
+    bind_style = 'qmark'
+    release_savepoint = False
+    sql_dialect = 'oracle'
 
-@contextmanager
-def get_kingbase_connection(db_config):
-    """人大金仓数据库连接上下文管理器"""
-    # 金仓数据库通常兼容PostgreSQL协议，所以可以使用psycopg2
-    try:
-        import psycopg2 as kingbase_psycopg2
-        # 解密密码
-        decrypted_password = decrypt_password(db_config.get('password', ''))
-        conn = kingbase_psycopg2.connect(
+    def connect(self, db_config, connect_timeout):
+        dm = self.import_driver()
+        return dm.connect(
             host=db_config['host'],
             port=int(db_config['port']),
             user=db_config['user'],
-            password=decrypted_password,
+            password=decrypt_password(db_config.get('password', '')),
             database=db_config['database'],
-            connect_timeout=10
+            connect_timeout=connect_timeout
         )
-        yield conn
-    except ImportError:
-        raise ImportError("请安装psycopg2：pip install psycopg2")
-    except Exception as e:
-        raise e
-    finally:
-        if 'conn' in locals() and conn:
-            conn.close()
 
 
+# 数据库驱动注册表：数据库类型 -> 驱动适配器
+DB_DRIVERS = {
+    # PostgreSQL系列（包括兼容PostgreSQL协议的国产数据库）
+    'postgresql': PostgreSQLDriver('postgresql', 'PostgreSQL'),
+    'highgo': PostgreSQLDriver('highgo', '瀚高数据库'),
+    'gauss': PostgreSQLDriver('gauss', '华为高斯数据库'),
+    'uxdb': PostgreSQLDriver('uxdb', '优图数据库'),
+    'vastbase': PostgreSQLDriver('vastbase', '海量数据库'),
+    'gbase': PostgreSQLDriver('gbase', '南大通用数据库'),
+    'vanward': PostgreSQLDriver('vanward', '万里数据库'),
+    'kingbase': PostgreSQLDriver('kingbase', '人大金仓数据库'),
+    
+    # MySQL系列（包括兼容MySQL协议的数据库）
+    'mysql': MySQLDriver('mysql', 'MySQL'),
+    'tidb': MySQLDriver('tidb', 'TiDB分布式数据库'),
+    'oceanbase': OceanBaseDriver('oceanbase', 'OceanBase数据库'),
+    'greatdb': MySQLDriver('greatdb', '巨杉数据库'),
+    
+    # Oracle系列（包括兼容Oracle协议的数据库）
+    'oracle': OracleDriver('oracle', 'Oracle数据库'),
+    'shentong': OracleDriver('shentong', '神通数据库'),
+    
+    # 专用驱动数据库
+    'yashandb': YashanDBDriver('yashandb', '崖山数据库'),
+    'dm': DMDriver('dm', '达梦数据库'),
+}
+
+
+def get_db_driver(db_type):
+    """获取数据库类型对应的驱动适配器"""
+    driver = DB_DRIVERS.get((db_type or 'postgresql').lower())
+    if driver is None:
+        supported_types = ', '.join(DB_DRIVERS.keys())
+        raise ValueError(f"不支持的数据库类型：{db_type}。支持的类型：{supported_types}")
+    return driver
 
-@contextmanager
-def get_tidb_connection(db_config):
-    """TiDB数据库连接上下文管理器"""
-    # TiDB兼容MySQL协议，所以使用PyMySQL
-    return get_mysql_connection(db_config)
 
+def create_db_connection(db_config, connect_timeout=None):
+    """根据数据库类型建立新的物理连接，并设置会话级语句超时"""
+    driver = get_db_driver(db_config.get('type', 'postgresql'))
+    if connect_timeout is None:
+        connect_timeout = DB_TIMEOUT_CONFIG['connect_timeout']
+    conn = driver.connect(db_config, connect_timeout)
+    try:
+        driver.set_statement_timeout(conn, DB_TIMEOUT_CONFIG['statement_timeout'])
+        # psycopg2等驱动的SET在隐式事务中执行，提交后才对会话生效；否则归还连接池时的回滚会撤销超时设置
+        conn.commit()
+    except Exception:
+        conn.close()
+        raise
+    return conn
 
 
-@contextmanager
-def get_oceanbase_connection(db_config):
-    """OceanBase数据库连接上下文管理器"""
-    # OceanBase兼容MySQL协议，所以使用PyMySQL
-    return get_mysql_connection(db_config)
+# ===================== 数据库连接池 =====================
+# 空闲连接最长保留时间（秒），超时后回收（始终保留最小连接数）
+POOL_IDLE_TIMEOUT = 300
+# 连接空闲超过该时间（秒）后，借出前先执行探活查询
+POOL_VALIDATE_AFTER_IDLE = 30
 
+class ConnectionPoolTimeout(Exception):
+    """连接池已满且等待超时"""
+    pass
 
-@contextmanager
-def get_dm_connection(db_config):
-    """达梦数据库连接上下文管理器"""
-    try:
-        import dm_python as dm
-        # 解密密码
-        decrypted_password = decrypt_password(db_config.get('password', ''))
-        conn = dm.connect(
-            host=db_config['host'],
-            port=int(db_config['port']),
-            user=db_config['user'],
-            password=decrypted_password,
-            database=db_config['database'],
-            connect_timeout=10
-        )
-        yield conn
-    except ImportError:
-        raise ImportError("请安装达梦数据库驱动：pip install dm-python")
-    except Exception as e:
-        raise e
-    finally:
-        if 'conn' in locals() and conn:
-            conn.close()
 
+def _is_connection_closed(conn):
+    """判断驱动连接对象是否已关闭（兼容psycopg2/pymysql等驱动的不同属性）"""
+    closed = getattr(conn, 'closed', None)
+    if closed is not None and not callable(closed):
+        return bool(closed)
+    is_open = getattr(conn, 'open', None)
+    if is_open is not None and not callable(is_open):
+        return not is_open
+    return False
 
-def split_sql_statements(sql_content):
-    """分割SQL语句，支持多种分隔符"""
-    import re
-    # 使用正则表达式分割SQL语句，支持 ; 或 GO 作为分隔符
-    # 先移除多行注释 /* */ 和单行注释 --
-    cleaned_sql = re.sub(r'/\*.*?\*/', '', sql_content, flags=re.DOTALL)
-    cleaned_sql = re.sub(r'--.*?$', '', cleaned_sql, flags=re.MULTILINE)
-    
-    # 按分号分割，并去除空语句
-    statements = [stmt.strip() for stmt in cleaned_sql.split(';') if stmt.strip()]
-    return statements
 
-def check_sql_safety(sql):
-    """增强版SQL安全校验：禁止危险操作，但允许合法的数据操作"""
-    # 移除注释和空格，避免绕过检测
-    clean_sql = re.sub(r'/\*.*?\*/|--.*?$', '', sql, flags=re.DOTALL | re.MULTILINE).strip().upper()
-    clean_sql = re.sub(r'\s+', ' ', clean_sql)
-    
-    # 危险操作关键词（更全面）
-    dangerous_keywords = [
-        'DROP', 'TRUNCATE', 'ALTER', 'CREATE', 'RENAME', 'GRANT', 'REVOKE', 'LOCK', 'SHUTDOWN'
-    ]
-    
-    # 检查危险关键词（独立单词匹配，避免误判）
-    for keyword in dangerous_keywords:
-        # 检查是否是独立的关键词，而不是其他词的一部分（如comment中的关键词）
-        if re.search(rf'\b{keyword}\b', clean_sql):
-            return False, f"禁止执行包含「{keyword}」的危险SQL！"
-    
-    # 检查可能的SQL注入模式
-    injection_patterns = [
-        r"(?i)(\bUNION\b.*\bSELECT\b)",  # UNION注入
-        r"(?i)(\bOR\b\s+\d+\s*=\s*\d+)",  # 永真式注入
-        r"(?i)(exec\s*\(|execute\s+\(|sp_|xp_)\s*[^']*;",  # 存储过程执行
+def _db_config_fingerprint(db_config):
+    """计算连接相关配置的指纹，配置或超时变化后连接池自动重建"""
+    parts = [
+        db_config.get('type', 'postgresql').lower(),
+        db_config.get('host', ''),
+        db_config.get('port', ''),
+        db_config.get('user', ''),
+        db_config.get('password', ''),
+        db_config.get('database', ''),
+        DB_TIMEOUT_CONFIG.get('connect_timeout'),
+        DB_TIMEOUT_CONFIG.get('statement_timeout'),
     ]
-    
-    for pattern in injection_patterns:
-        if re.search(pattern, sql):
-            return False, "检测到潜在的SQL注入攻击模式！"
-    
-    return True, ""
-
-def clean_expired_data():
-    """清理过期的查询结果和临时文件"""
-    try:
-        # 清理过期查询结果
-        current_time = time.time()
-        expired_keys = []
-        for key, value in QUERY_RESULTS.items():
-            if current_time - value['create_time'] > RESULT_EXPIRE_TIME:
-                expired_keys.append(key)
-        for key in expired_keys:
-            del QUERY_RESULTS[key]
-            logging.info(f"清理过期查询结果：{key}")
-        
-        # 清理2小时前的临时文件（Excel和CSV）
-        for file in os.listdir(TEMP_DIR):
-            if (file.startswith('SQL查询结果_') and 
-                (file.endswith('.xlsx') or file.endswith('.csv'))):
-                file_path = os.path.join(TEMP_DIR, file)
-                if current_time - os.path.getctime(file_path) > 7200:  # 2小时
-                    os.remove(file_path)
-                    logging.info(f"清理过期文件：{file}")
-    except Exception as e:
-        logging.error(f"清理过期数据失败：{str(e)}")
+    return hashlib.sha256('\x1f'.join(str(p) for p in parts).encode('utf-8')).hexdigest()
+
+
+class DBConnectionPool:
+    """单个数据库配置的连接池（线程安全，借出时探活，空闲连接定期回收）"""
+
+    def __init__(self, db_config, max_size, min_size, timeout):
+        self.db_id = db_config.get('id')
+        self.db_name = db_config.get('name', '')
+        self.db_type = db_config.get('type', 'postgresql').lower()
+        self.db_config = db_config
+        self.fingerprint = _db_config_fingerprint(db_config)
+        self._cond = threading.Condition()
+        self._idle = deque()  # 元素为 (连接, 最近归还时间)，后进先出以复用热连接
+        self._total = 0       # 已建立（含正在建立）的物理连接数
+        self._closed = False
+        self.stats = defaultdict(int)
+        self._settings = None
+        self.configure(max_size, min_size, timeout)
+
+    def configure(self, max_size, min_size, timeout):
+        """根据应用配置调整连接池大小与等待超时"""
+        settings = (max_size, min_size, timeout)
+        if settings == self._settings:
+            return
+        with self._cond:
+            self._settings = settings
+            self.max_size = max(1, int(max_size))
+            self.min_size = max(0, min(int(min_size), self.max_size))
+            self.timeout = max(0.1, float(timeout))
+            self._cond.notify_all()
+
+    def acquire(self):
+        """借出连接：优先复用空闲连接，池满时最多等待 timeout 秒"""
+        deadline = time.time() + self.timeout
+        while True:
+            conn = None
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise ConnectionPoolTimeout("连接池已关闭")
+                    if self._idle:
+                        conn, last_used = self._idle.pop()
+                        break
+                    if self._total < self.max_size:
+                        self._total += 1
+                        break
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        self.stats['wait_timeouts'] += 1
+                        raise ConnectionPoolTimeout(
+                            f"获取数据库连接超时：连接池已满（最大连接数 {self.max_size}），请稍后再试"
+                        )
+                    self.stats['waits'] += 1
+                    self._cond.wait(remaining)
+                self.stats['checkouts'] += 1
+
+            if conn is None:
+                # 占用了一个新连接名额，在锁外建立物理连接
+                try:
+                    conn = create_db_connection(self.db_config)
+                except Exception:
+                    self._forget()
+                    raise
+                with self._cond:
+                    self.stats['created'] += 1
+                return conn
+
+            if self._is_healthy(conn, last_used):
+                return conn
+            # 失效连接丢弃后重新借出
+            with self._cond:
+                self.stats['health_check_failures'] += 1
+            self.discard(conn)
+
+    def release(self, conn):
+        """归还连接：回滚未提交事务，失效或池已重建时直接关闭"""
+        if conn is None:
+            return
+        reusable = not _is_connection_closed(conn)
+        if reusable:
+            try:
+                conn.rollback()
+            except Exception:
+                reusable = False
+        with self._cond:
+            if reusable and not self._closed:
+                self._idle.append((conn, time.time()))
+                self._cond.notify()
+                conn = None
+        if conn is not None:
+            self.discard(conn)
+        self.evict_idle()
+
+    def evict_idle(self, idle_timeout=POOL_IDLE_TIMEOUT):
+        """回收空闲超时的连接，保留最小连接数"""
+        expired = []
+        now = time.time()
+        with self._cond:
+            # 空闲队列左端为最久未使用的连接
+            while self._idle and self._total - len(expired) > self.min_size:
+                conn, last_used = self._idle[0]
+                if now - last_used <= idle_timeout:
+                    break
+                self._idle.popleft()
+                expired.append(conn)
+            self.stats['evicted_idle'] += len(expired)
+        for conn in expired:
+            self.discard(conn)
+        return len(expired)
+
+    def close(self):
+        """关闭连接池：立即关闭空闲连接，借出中的连接在归还时关闭"""
+        with self._cond:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._cond.notify_all()
+        for conn in idle:
+            self.discard(conn)
+
+    def snapshot(self):
+        """连接池统计信息"""
+        with self._cond:
+            idle = len(self._idle)
+            return {
+                "db_id": self.db_id,
+                "db_name": self.db_name,
+                "db_type": self.db_type,
+                "max_size": self.max_size,
+                "min_size": self.min_size,
+                "timeout": self.timeout,
+                "total": self._total,
+                "idle": idle,
+                "in_use": self._total - idle,
+                "closed": self._closed,
+                **dict(self.stats),
+            }
 
-def set_excel_style(ws, header_color="4472C4"):
-    """设置Excel样式（支持自定义表头颜色）"""
-    # 字体配置
-    header_font = Font(name='微软雅黑', size=11, bold=True, color='FFFFFF')
-    content_font = Font(name='微软雅黑', size=10)
-    # 对齐方式
-    align = Alignment(horizontal='center', vertical='center')
-    # 边框样式
-    border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-    # 表头背景色
-    header_fill = PatternFill(start_color=header_color, end_color=header_color, fill_type='solid')
-    
-    # 应用样式
-    for cell in ws[1]:
-        cell.font = header_font
-        cell.alignment = align
-        cell.border = border
-        cell.fill = header_fill
-    
-    for row in ws.iter_rows(min_row=2):
-        for cell in row:
-            cell.font = content_font
-            cell.alignment = align
-            cell.border = border
-    
-    # 自动调整列宽
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        for cell in column:
+    def _is_healthy(self, conn, last_used):
+        """借出前健康检查：已关闭的连接直接判定失效，空闲较久的连接执行探活语句"""
+        if _is_connection_closed(conn):
+            return False
+        if time.time() - last_used < POOL_VALIDATE_AFTER_IDLE:
+            return True
+        try:
+            cursor = conn.cursor()
             try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column_letter].width = adjusted_width
+                cursor.execute(get_db_driver(self.db_type).validation_query)
+                cursor.fetchall()
+            finally:
+                cursor.close()
+            conn.rollback()
+            return True
+        except Exception as e:
+            logging.warning(f"连接池探活失败，丢弃连接 [{self.db_name}]：{str(e)}")
+            return False
 
-def generate_csv_content(columns, results, separator=',', include_header=True):
-    """生成CSV内容"""
-    # 使用StringIO处理CSV内容
-    output = StringIO()
-    # 设置CSV写入器，处理中文和特殊字符
-    writer = csv.writer(output, delimiter=separator, 
-                       quoting=csv.QUOTE_MINIMAL,
-                       lineterminator='\n',
-                       escapechar='\\')
-    
-    # 写入表头
-    if include_header and columns:
-        writer.writerow(columns)
-    
-    # 写入数据行
-    for row in results:
-        # 处理None值和特殊类型
-        cleaned_row = []
-        for cell in row:
-            if cell is None:
-                cleaned_row.append('')
-            elif isinstance(cell, (datetime,)):
-                cleaned_row.append(cell.strftime('%Y-%m-%d %H:%M:%S'))
-            else:
-                cleaned_row.append(str(cell))
-        writer.writerow(cleaned_row)
-    
-    # 重置指针到开头
-    output.seek(0)
-    # 转换为BytesIO并编码为UTF-8（带BOM，解决Excel打开中文乱码）
-    csv_bytes = BytesIO()
-    # 写入BOM头
-    csv_bytes.write(b'\xef\xbb\xbf')
-    # 写入CSV内容
-    csv_bytes.write(output.getvalue().encode('utf-8'))
-    csv_bytes.seek(0)
-    
-    return csv_bytes
+    def discard(self, conn):
+        """关闭物理连接并释放名额"""
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self.stats['discarded'] += 1
+        self._forget()
+
+    def _forget(self):
+        with self._cond:
+            self._total -= 1
+            self._cond.notify()
+
+
+class ConnectionPoolManager:
+    """按数据库ID管理连接池，池大小取自 app_max_connections / app_min_connections / app_connection_pool_timeout"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pools = {}
+
+    def get_pool(self, db_config):
+        """获取（必要时创建或重建）数据库配置对应的连接池"""
+        db_id = db_config.get('id') or 'default_db'
+        fingerprint = _db_config_fingerprint(db_config)
+        max_size = APP_CONFIG.get('app_max_connections', DEFAULT_APP_CONFIG['app_max_connections'])
+        min_size = APP_CONFIG.get('app_min_connections', DEFAULT_APP_CONFIG['app_min_connections'])
+        timeout = APP_CONFIG.get('app_connection_pool_timeout', DEFAULT_APP_CONFIG['app_connection_pool_timeout'])
+        stale = None
+        with self._lock:
+            pool = self._pools.get(db_id)
+            if pool is not None and pool.fingerprint != fingerprint:
+                # 连接参数已变化，旧连接池作废
+                stale, pool = pool, None
+            if pool is None:
+                pool = DBConnectionPool(db_config, max_size, min_size, timeout)
+                self._pools[db_id] = pool
+        if stale is not None:
+            logging.info(f"数据库配置已变化，重建连接池：{db_id}")
+            stale.close()
+        pool.configure(max_size, min_size, timeout)
+        return pool
+
+    def close_pool(self, db_id):
+        """关闭指定数据库的连接池"""
+        with self._lock:
+            pool = self._pools.pop(db_id, None)
+        if pool is not None:
+            pool.close()
+
+    def close_all(self):
+        """关闭全部连接池"""
+        with self._lock:
+            pools = list(self._pools.values())
+            self._pools.clear()
+        for pool in pools:
+            pool.close()
+
+    def evict_idle(self):
+        """回收所有连接池中的空闲超时连接"""
+        with self._lock:
+            pools = list(self._pools.values())
+        return sum(pool.evict_idle() for pool in pools)
+
+    def stats(self):
+        """所有连接池的统计信息"""
+        with self._lock:
+            pools = list(self._pools.values())
+        return [pool.snapshot() for pool in pools]
+
+
+CONNECTION_POOLS = ConnectionPoolManager()
 
-# ===================== 路由 =====================
-@app.route('/')
+
+@contextmanager
+def get_pooled_connection(db_config):
+    """从连接池借出连接的上下文管理器，退出时自动归还"""
+    pool = CONNECTION_POOLS.get_pool(db_config)
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+
+# ===================== 服务端游标分页 =====================
+# 游标分页模式下持有的游标空闲超时时间（秒），超时后关闭游标并归还连接
+HELD_CURSOR_IDLE_TIMEOUT = 300
+# 需要保持事务打开的游标（PostgreSQL系列命名游标）的空闲超时时间（秒）：
+# 持有期间事务一直打开，会阻止VACUUM清理并保持表上的锁，因此比普通游标短
+HELD_CURSOR_TRANSACTION_IDLE_TIMEOUT = 60
+# 跳过行时每次从游标读取的行数
+CURSOR_SKIP_CHUNK_SIZE = 1000
+# 可以使用服务端游标分页的语句（只读查询）
+def is_row_query(sql, dialect='generic'):
+    """判断语句是否为返回结果集的只读查询（SELECT/VALUES，WITH按其后的主语句判断且其中不能修改数据，忽略注释）"""
+    verdict = classify_sql(sql, dialect)
+    return verdict.command in SQL_ROW_QUERY_COMMANDS and not verdict.writes
+
+
+def open_server_cursor(conn, db_type, page_size):
+    """按数据库类型创建只按需取数的游标，返回 (游标, 是否可回滚定位)"""
+    return get_db_driver(db_type).open_server_cursor(conn, page_size)
+
+
+def close_server_cursor(pool, conn, cursor, db_type, exhausted):
+    """关闭按需取数的游标并归还连接"""
+    if not exhausted and get_db_driver(db_type).discard_unfinished_cursor:
+        pool.discard(conn)
+        return
+    try:
+        cursor.close()
+    except Exception:
+        pass
+    pool.release(conn)
+
+
+def build_window_sql(db_type, sql, offset, limit):
+    """将查询改写为只取指定窗口的分页查询（方言由驱动适配器决定）"""
+    return get_db_driver(db_type).window_sql(sql.strip().rstrip(';'), offset, limit)
+
+
+class HeldQueryCursor:
+    """游标分页模式下跨请求持有的游标（占用一个连接池连接）"""
+
+    def __init__(self, query_id, sql, db_config, pool, conn, cursor, scrollable):
+        self.query_id = query_id
+        self.sql = sql
+        self.db_id = db_config.get('id')
+        self.db_type = db_config.get('type', 'postgresql').lower()
+        self.pool = pool
+        self.conn = conn
+        self.cursor = cursor
+        self.scrollable = scrollable
+        self.idle_timeout = (HELD_CURSOR_TRANSACTION_IDLE_TIMEOUT
+                             if get_db_driver(self.db_type).server_cursor_in_transaction else HELD_CURSOR_IDLE_TIMEOUT)
+        self.columns = []
+        self.position = 0      # 下一次返回的行号（从0开始）
+        self.rows_seen = 0     # 确认存在的行数（实际读到的最大行号+1）
+        self.exhausted = False  # 游标是否已读完
+        self._buffer = []      # 已从游标读出、尚未返回的行
+        self.lock = threading.Lock()
+        self.create_time = time.time()
+        self.last_access = self.create_time
+        self.closed = False
+
+    def can_seek(self, offset):
+        """前进总是可行；回退需要可滚动游标"""
+        return offset >= self.position or self.scrollable
+
+    def fetch_page(self, offset, limit):
+        """读取 [offset, offset+limit) 窗口的行，返回 (行列表, 是否还有更多行)"""
+        self.last_access = time.time()
+        if offset < self.position:
+            # 可滚动游标直接定位（psycopg2: MOVE ABSOLUTE）
+            self.cursor.scroll(offset, mode='absolute')
+            self.position = offset
+            self._buffer = []
+            self.exhausted = False
+        elif offset > self.position:
+            self._skip(offset - self.position)
+        
+        self._fill(limit + 1)
+        rows = self._buffer[:limit]
+        self._buffer = self._buffer[limit:]
+        self.position += len(rows)
+        if not self.columns and self.cursor.description:
+            self.columns = [desc[0] for desc in self.cursor.description]
+        return rows, bool(self._buffer)
+
+    def total_count(self):
+        """游标读完后总行数已知，否则返回None；可滚动游标跳过时可能越过结果末尾（位置只是上限），
+        此时按实际读到的行数计（见 total_count_exact）"""
+        if self.exhausted and not self._buffer:
+            return min(self.position, self.rows_seen)
+        return None
+
+    def total_count_exact(self):
+        """total_count 是否为准确总数：越过末尾后未读到过末尾附近的行时只是下限"""
+        return self.total_count() is not None and self.position <= self.rows_seen
+
+    def _skip(self, count):
+        buffered = min(count, len(self._buffer))
+        self._buffer = self._buffer[buffered:]
+        self.position += buffered
+        count -= buffered
+        if count <= 0:
+            return
+        if self.scrollable:
+            self.cursor.scroll(count, mode='relative')
+            self.position += count
+            return
+        while count > 0 and not self.exhausted:
+            rows = self.cursor.fetchmany(min(count, CURSOR_SKIP_CHUNK_SIZE))
+            if not rows:
+                self.exhausted = True
+                break
+            count -= len(rows)
+            self.position += len(rows)
+            self.rows_seen = max(self.rows_seen, self.position)
+
+    def _fill(self, size):
+        while len(self._buffer) < size and not self.exhausted:
+            rows = self.cursor.fetchmany(size - len(self._buffer))
+            if not rows:
+                self.exhausted = True
+                break
+            self._buffer.extend(rows)
+            self.rows_seen = max(self.rows_seen, self.position + len(self._buffer))
+
+    def close(self):
+        """关闭游标并归还连接"""
+        if self.closed:
+            return
+        self.closed = True
+        close_server_cursor(self.pool, self.conn, self.cursor, self.db_type, self.exhausted)
+
+
+class HeldCursorRegistry:
+    """管理游标分页模式下持有的游标，超时或超出数量上限时关闭"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cursors = {}
+
+    def add(self, held):
+        evicted = self.sweep()
+        with self._lock:
+            self._cursors[held.query_id] = held
+            # 每个数据库最多占用连接池一半的连接用于持有游标
+            limit = max(1, held.pool.max_size // 2)
+            same_db = sorted(
+                (c for c in self._cursors.values() if c.db_id == held.db_id and c is not held),
+                key=lambda c: c.last_access
+            )
+            while len(same_db) >= limit:
+                oldest = same_db.pop(0)
+                del self._cursors[oldest.query_id]
+                evicted.append(oldest)
+        self._close_all(evicted)
+
+    def get(self, query_id):
+        self._close_all(self.sweep())
+        with self._lock:
+            return self._cursors.get(query_id)
+
+    def discard(self, query_id):
+        with self._lock:
+            held = self._cursors.pop(query_id, None)
+        if held is not None:
+            self._close_all([held])
+        return held is not None
+
+    def sweep(self, idle_timeout=None):
+        """摘除空闲超时的游标（未指定 idle_timeout 时按各游标自身的超时时间），返回待关闭的游标列表"""
+        now = time.time()
+        with self._lock:
+            expired = [c for c in self._cursors.values()
+                       if now - c.last_access > (c.idle_timeout if idle_timeout is None else idle_timeout)]
+            for held in expired:
+                del self._cursors[held.query_id]
+        return expired
+
+    def close_expired(self):
+        expired = self.sweep()
+        self._close_all(expired)
+        return len(expired)
+
+    def stats(self):
+        with self._lock:
+            return [
+                {
+                    "query_id": c.query_id,
+                    "db_id": c.db_id,
+                    "position": c.position,
+                    "exhausted": c.exhausted,
+                    "idle_seconds": round(time.time() - c.last_access, 1),
+                }
+                for c in self._cursors.values()
+            ]
+
+    def _close_all(self, cursors):
+        for held in cursors:
+            # 等待正在进行的读取结束后再关闭
+            with held.lock:
+                try:
+                    held.close()
+                except Exception as e:
+                    logging.warning(f"关闭查询游标失败：{held.query_id} | {str(e)}")
+
+
+HELD_CURSORS = HeldCursorRegistry()
+
+
+def build_cursor_page_response(query_id, columns, rows, page, page_size, has_more, total_count, total_count_exact=None):
+    """构造游标分页模式的返回数据（总数未知时按是否还有下一页估算总页数）"""
+    if total_count_exact is None:
+        total_count_exact = total_count is not None
+    if total_count is not None:
+        total_page = max(1, (total_count + page_size - 1) // page_size)
+    else:
+        total_page = page + 1 if has_more else page
+    return {
+        "status": "success",
+        "columns": columns,
+        "results": rows,
+        "count": len(rows),
+        "total_count": total_count,
+        "total_count_exact": total_count_exact,
+        "has_more": has_more,
+        "page": page,
+        "page_size": page_size,
+        "total_page": total_page,
+        "query_id": query_id,
+        "paging_mode": "cursor"
+    }
+
+
+def execute_window_query(sql, page, page_size, db_config, query_id):
+    """游标不可用（已过期或不可回退）时，改写为 LIMIT/OFFSET 查询只取当前页"""
+    db_type = db_config.get('type', 'postgresql').lower()
+    offset = (page - 1) * page_size
+    window_sql = build_window_sql(db_type, sql, offset, page_size + 1)
+    with get_pooled_connection(db_config) as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(window_sql)
+            columns = [desc[0] for desc in cursor.description] if cursor.description else []
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    total_count = None if has_more or (not rows and offset > 0) else offset + len(rows)
+    return build_cursor_page_response(query_id, columns, rows, page, page_size, has_more, total_count)
+
+
+def execute_paged_statement(sql, page, page_size, db_id, query_id=None):
+    """游标分页模式执行查询：只读取请求的页，后续页从持有的游标继续读取"""
+    dialect = get_sql_dialect(db_id)
+    if not is_row_query(sql, dialect):
+        # 非查询语句没有结果集，按普通模式执行
+        return execute_single_statement(sql, page, page_size, db_id)
+    
+    is_safe, msg = check_sql_safety(sql, dialect)
+    if not is_safe:
+        logging.warning(f"SQL安全校验失败：{sql[:100]}... | 原因：{msg}")
+        return {"status": "error", "message": msg}
+    
+    db_config = get_database_by_id(db_id) if db_id else get_default_database()
+    if not db_config:
+        return {"status": "error", "message": "未找到有效的数据库配置"}
+    db_type = db_config.get('type', 'postgresql').lower()
+    offset = (page - 1) * page_size
+    
+    try:
+        if query_id:
+            held = HELD_CURSORS.get(query_id)
+            if held is not None and held.sql == sql:
+                with held.lock:
+                    if not held.closed and held.can_seek(offset):
+                        rows, has_more = held.fetch_page(offset, page_size)
+                        return build_cursor_page_response(
+                            query_id, held.columns, rows, page, page_size, has_more, held.total_count(),
+                            held.total_count_exact()
+                        )
+            # 游标已过期或无法回退，改写为窗口查询
+            return execute_window_query(sql, page, page_size, db_config, query_id)
+        
+        pool = CONNECTION_POOLS.get_pool(db_config)
+        conn = pool.acquire()
+        query_id = str(uuid.uuid4())
+        try:
+            cursor, scrollable = open_server_cursor(conn, db_type, page_size)
+            cursor.execute(sql)
+            held = HeldQueryCursor(query_id, sql, db_config, pool, conn, cursor, scrollable)
+            rows, has_more = held.fetch_page(offset, page_size)
+        except Exception:
+            pool.release(conn)
+            raise
+        
+        # 记录查询来源，导出时重新执行查询读取全部结果
+        QUERY_RESULTS.put_source(query_id, held.columns, sql=sql, db_id=db_id)
+        total_count = held.total_count()
+        total_count_exact = held.total_count_exact()
+        if held.exhausted:
+            # 结果已全部读完，无需继续持有连接
+            held.close()
+        else:
+            HELD_CURSORS.add(held)
+        logging.info(f"SQL执行成功（游标分页）：{sql[:100]}... | 页码：{page} | 查询ID：{query_id} | 数据库：{db_id or 'default'}")
+        return build_cursor_page_response(query_id, held.columns, rows, page, page_size, has_more, total_count,
+                                          total_count_exact)
+    except Exception as e:
+        if query_id:
+            HELD_CURSORS.discard(query_id)
+        logging.error(f"SQL执行错误（游标分页）- DB: {db_id or 'default'}, SQL: {sql}, 错误: {str(e)}", exc_info=True)
+        return {"status": "error", "message": f"SQL执行失败: {str(e)[:200]}..."}
+
+
+# ===================== 查询准入控制 =====================
+# 全局并发查询上限为单个数据库上限（app_concurrent_queries）的倍数
+QUERY_ADMISSION_GLOBAL_FACTOR = 2
+# 排队等待执行的最长时间（秒），超时后拒绝（503）
+QUERY_ADMISSION_TIMEOUT = 30
+
+
+class QueryAdmissionRejected(Exception):
+    """查询未获准执行：排队已满（429）或等待超时（503）"""
+
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class QueryAdmissionController:
+    """语句执行前的准入控制：每个数据库最多 app_concurrent_queries 个查询同时执行，
+    全局再乘以 QUERY_ADMISSION_GLOBAL_FACTOR；其余请求排队，每个数据库最多排队 app_query_queue_size 个"""
+
+    def __init__(self, timeout=QUERY_ADMISSION_TIMEOUT):
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._active = defaultdict(int)
+        self._waiting = defaultdict(int)
+        self._global_active = 0
+        self._stats = defaultdict(lambda: defaultdict(int))
+
+    def _limits(self):
+        per_db = APP_CONFIG.get('app_concurrent_queries', DEFAULT_APP_CONFIG['app_concurrent_queries'])
+        queue_size = APP_CONFIG.get('app_query_queue_size', DEFAULT_APP_CONFIG['app_query_queue_size'])
+        per_db = max(1, int(per_db))
+        return per_db, per_db * QUERY_ADMISSION_GLOBAL_FACTOR, max(0, int(queue_size))
+
+    def _can_run(self, db_key, per_db, global_limit):
+        return self._active[db_key] < per_db and self._global_active < global_limit
+
+    def acquire(self, db_key):
+        """获取执行名额：有空闲名额且无人排队时立即执行，否则排队等待"""
+        per_db, global_limit, queue_size = self._limits()
+        start = time.time()
+        with self._cond:
+            stats = self._stats[db_key]
+            if not (self._waiting[db_key] == 0 and self._can_run(db_key, per_db, global_limit)):
+                if self._waiting[db_key] >= queue_size:
+                    stats['rejected_queue_full'] += 1
+                    raise QueryAdmissionRejected(
+                        f"查询排队已满（并发上限 {per_db}，最多排队 {queue_size} 个），请稍后再试", 429
+                    )
+                self._waiting[db_key] += 1
+                stats['queued'] += 1
+                try:
+                    deadline = start + self.timeout
+                    while not self._can_run(db_key, per_db, global_limit):
+                        remaining = deadline - time.time()
+                        if remaining <= 0:
+                            stats['rejected_timeout'] += 1
+                            raise QueryAdmissionRejected(
+                                f"查询排队等待超过 {self.timeout} 秒，数据库繁忙，请稍后再试", 503
+                            )
+                        self._cond.wait(remaining)
+                finally:
+                    self._waiting[db_key] -= 1
+            self._active[db_key] += 1
+            self._global_active += 1
+            wait_ms = int((time.time() - start) * 1000)
+            stats['admitted'] += 1
+            stats['wait_ms_total'] += wait_ms
+            stats['wait_ms_max'] = max(stats['wait_ms_max'], wait_ms)
+
+    def release(self, db_key):
+        with self._cond:
+            self._active[db_key] -= 1
+            self._global_active -= 1
+            # 排队者可能在等待不同数据库的名额，全部唤醒后各自检查
+            self._cond.notify_all()
+
+    @contextmanager
+    def admit(self, db_id):
+        """在准入控制下执行语句的上下文管理器（db_id为空时按默认数据库计）"""
+        db_key = db_id or (get_default_database() or {}).get('id') or 'default_db'
+        self.acquire(db_key)
+        try:
+            yield
+        finally:
+            self.release(db_key)
+
+    def snapshot(self):
+        """各数据库的执行中/排队数量与等待时间统计"""
+        per_db, global_limit, queue_size = self._limits()
+        with self._cond:
+            databases = []
+            for db_key, stats in self._stats.items():
+                admitted = stats['admitted']
+                databases.append({
+                    "db_id": db_key,
+                    "active": self._active[db_key],
+                    "waiting": self._waiting[db_key],
+                    **dict(stats),
+                    "wait_ms_avg": round(stats['wait_ms_total'] / admitted, 1) if admitted else 0,
+                })
+            return {
+                "per_db_limit": per_db,
+                "global_limit": global_limit,
+                "queue_size": queue_size,
+                "timeout": self.timeout,
+                "global_active": self._global_active,
+                "global_waiting": sum(self._waiting.values()),
+                "databases": databases,
+            }
+
+
+QUERY_ADMISSION = QueryAdmissionController()
+
+
+# ===================== 异步查询任务 =====================
+# 已结束的查询任务保留时间（秒），超时后清理
+QUERY_JOB_RETENTION = 3600
+# 异步查询读取结果时每批读取的行数（每批更新一次进度并检查是否已取消）
+QUERY_JOB_FETCH_ROWS = 5000
+# 查询任务状态
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+JOB_CANCELLED = 'cancelled'
+JOB_FINISHED_STATES = (JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED)
+
+
+class QueryQueueFull(Exception):
+    """查询队列已满"""
+    pass
+
+
+class QueryCancelled(Exception):
+    """查询已被取消"""
+    pass
+
+
+class QueryJob:
+    """异步执行的查询任务：记录状态、进度和结果，执行期间登记所用连接以便取消"""
+    kind = 'query'
+
+    def __init__(self, sql_statements, page, page_size, db_id, transaction=False, on_error='auto'):
+        self.job_id = str(uuid.uuid4())
+        self.sql_statements = sql_statements
+        self.page = page
+        self.page_size = page_size
+        self.db_id = db_id
+        self.transaction = transaction
+        self.on_error = on_error
+        self.status = JOB_QUEUED
+        self.result = None
+        self.error = None
+        self.rows_fetched = 0
+        self.cancel_requested = False
+        self.create_time = time.time()
+        self.start_time = None
+        self.finish_time = None
+        self._lock = threading.Lock()
+        self._conn = None
+        self._db_config = None
+
+    def attach(self, conn, db_config):
+        """登记正在执行语句的连接（已请求取消时不再执行）"""
+        with self._lock:
+            if self.cancel_requested:
+                raise QueryCancelled("查询已取消")
+            self._conn = conn
+            self._db_config = db_config
+
+    def detach(self):
+        # 与cancel()互斥，保证连接归还连接池后不会再被取消
+        with self._lock:
+            self._conn = None
+            self._db_config = None
+
+    def cancel(self):
+        """请求取消：执行中的语句通过驱动的取消机制中断，返回是否向数据库发出了取消请求"""
+        with self._lock:
+            self.cancel_requested = True
+            conn, db_config = self._conn, self._db_config
+            if conn is None:
+                return False
+            try:
+                return get_db_driver(db_config.get('type', 'postgresql')).cancel(conn, db_config)
+            except Exception as e:
+                logging.warning(f"取消查询失败：任务ID={self.job_id} | {str(e)}")
+                return False
+
+    def execute(self):
+        """在工作线程中执行任务，返回与 /execute_sql 相同格式的结果"""
+        return execute_sql_statements(self.sql_statements, self.page, self.page_size, self.db_id, self,
+                                      self.transaction, self.on_error)
+
+    @property
+    def label(self):
+        """任务列表中显示的SQL摘要"""
+        if len(self.sql_statements) == 1:
+            return self.sql_statements[0].text[:100]
+        return f"共{len(self.sql_statements)}条语句"
+
+    def snapshot(self):
+        """任务状态与进度（不含结果数据）"""
+        now = time.time()
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "job_status": self.status,
+            "db_id": self.db_id,
+            "sql": self.label,
+            "rows_fetched": self.rows_fetched,
+            "cancel_requested": self.cancel_requested,
+            "create_time": datetime.fromtimestamp(self.create_time).strftime('%Y-%m-%d %H:%M:%S'),
+            "wait_seconds": round((self.start_time or now) - self.create_time, 2),
+            "run_seconds": round((self.finish_time or now) - self.start_time, 2) if self.start_time else 0,
+            "error": self.error,
+        }
+
+
+def fetch_all_with_progress(cursor, job):
+    """按批读取全部结果行，每批更新任务进度，已请求取消时中止"""
+    rows = []
+    while True:
+        if job.cancel_requested:
+            raise QueryCancelled("查询已取消")
+        batch = cursor.fetchmany(QUERY_JOB_FETCH_ROWS)
+        if not batch:
+            return rows
+        rows.extend(batch)
+        job.rows_fetched += len(batch)
+
+
+class QueryJobManager:
+    """异步查询任务管理：工作线程数取 app_concurrent_queries，排队任务数上限取 app_query_queue_size"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._jobs = OrderedDict()  # 按提交顺序
+        self._workers = 0
+        self._idle_workers = 0
+        self.max_workers = 1
+        self.queue_size = 1
+        self.stats = defaultdict(int)
+
+    def configure(self):
+        """按应用配置调整工作线程数与队列上限（多出的工作线程空闲时自动退出）"""
+        max_workers = APP_CONFIG.get('app_concurrent_queries', DEFAULT_APP_CONFIG['app_concurrent_queries'])
+        queue_size = APP_CONFIG.get('app_query_queue_size', DEFAULT_APP_CONFIG['app_query_queue_size'])
+        with self._cond:
+            self.max_workers = max(1, int(max_workers))
+            self.queue_size = max(1, int(queue_size))
+            self._cond.notify_all()
+
+    def submit(self, sql_statements, page, page_size, db_id, transaction=False, on_error='auto'):
+        """提交查询任务，队列已满时抛出 QueryQueueFull"""
+        return self.submit_job(QueryJob(sql_statements, page, page_size, db_id, transaction, on_error))
+
+    def submit_job(self, job):
+        """提交任务（查询或导入），队列已满时抛出 QueryQueueFull"""
+        self.configure()
+        self.expire()
+        with self._cond:
+            # 能立即开始执行的任务数：空闲工作线程 + 还可以新建的工作线程
+            available = self._idle_workers + max(0, self.max_workers - self._workers)
+            if len(self._queue) + 1 - available > self.queue_size:
+                self.stats['rejected'] += 1
+                raise QueryQueueFull(f"查询队列已满（最多排队 {self.queue_size} 个查询），请稍后再试")
+            self._jobs[job.job_id] = job
+            self._queue.append(job)
+            self.stats['submitted'] += 1
+            if len(self._queue) > self._idle_workers and self._workers < self.max_workers:
+                self._workers += 1
+                threading.Thread(target=self._worker, name=f"query-job-{self._workers}", daemon=True).start()
+            self._cond.notify()
+        return job
+
+    def get(self, job_id):
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def queue_position(self, job):
+        """排队中的任务前面还有几个任务（从1开始），不在队列中时返回None"""
+        with self._cond:
+            for position, queued in enumerate(self._queue, start=1):
+                if queued is job:
+                    return position
+        return None
+
+    def cancel(self, job_id):
+        """取消任务：排队中的直接出队，执行中的向数据库发送取消请求，返回任务（不存在时返回None）"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job.status == JOB_QUEUED:
+                self._queue.remove(job)
+                job.cancel_requested = True
+                self._finish(job, JOB_CANCELLED)
+                return job
+        if job.status == JOB_RUNNING:
+            job.cancel()
+        return job
+
+    def expire(self, retention=QUERY_JOB_RETENTION):
+        """清理结束超过保留时间的任务"""
+        now = time.time()
+        with self._cond:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.finish_time is not None and now - job.finish_time > retention]
+            for job_id in expired:
+                del self._jobs[job_id]
+        return len(expired)
+
+    def snapshot(self):
+        with self._cond:
+            jobs = list(self._jobs.values())
+            return {
+                "max_workers": self.max_workers,
+                "queue_size": self.queue_size,
+                "workers": self._workers,
+                "queued": len(self._queue),
+                "running": sum(1 for job in jobs if job.status == JOB_RUNNING),
+                **dict(self.stats),
+                "jobs": [job.snapshot() for job in jobs],
+            }
+
+    def _finish(self, job, status):
+        job.status = status
+        job.finish_time = time.time()
+        self.stats[status] += 1
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                self._idle_workers += 1
+                while not self._queue and self._workers <= self.max_workers:
+                    self._cond.wait()
+                self._idle_workers -= 1
+                if self._workers > self.max_workers:
+                    # 并发数调小后多出的工作线程退出，队列中的任务交给其他工作线程
+                    self._workers -= 1
+                    self._cond.notify()
+                    return
+                job = self._queue.popleft()
+                job.status = JOB_RUNNING
+                job.start_time = time.time()
+            self._run(job)
+
+    def _run(self, job):
+        try:
+            with QUERY_ADMISSION.admit(job.db_id):
+                result = job.execute()
+            if job.cancel_requested:
+                status = JOB_CANCELLED
+            elif result.get('status') == 'success':
+                status = JOB_SUCCEEDED
+            else:
+                status = JOB_FAILED
+                job.error = result.get('message')
+            job.result = result
+        except QueryAdmissionRejected as e:
+            logging.warning(f"异步查询任务被拒绝：任务ID={job.job_id} | {str(e)}")
+            status = JOB_FAILED
+            job.error = str(e)
+        except Exception as e:
+            logging.error(f"异步查询任务失败：任务ID={job.job_id} | {str(e)}")
+            status = JOB_FAILED
+            job.error = f"执行失败：{str(e)}"
+        with self._cond:
+            self._finish(job, status)
+        logging.info(f"异步查询任务结束：任务ID={job.job_id} | 状态：{status} | 读取行数：{job.rows_fetched} | 数据库：{job.db_id or 'default'}")
+
+
+QUERY_JOBS = QueryJobManager()
+
+
+# ===================== 批量数据导入 =====================
+# 支持导入的文件类型
+IMPORT_FILE_TYPES = ('.csv', '.xlsx')
+# 目标表名（可带模式名）与列名：字母或下划线开头，只含字母、数字、下划线（含中文）
+IMPORT_TABLE_RE = re.compile(r'[^\W\d]\w*(\.[^\W\d]\w*)?')
+IMPORT_COLUMN_RE = re.compile(r'[^\W\d]\w*')
+# 导入事务提交方式：all 全部数据一个事务，batch 每批提交一次
+IMPORT_COMMIT_MODES = ('all', 'batch')
+
+
+class ImportJob(QueryJob):
+    """批量导入任务：读取上传的CSV/XLSX文件，按 app_batch_insert_size 分批写入目标表"""
+    kind = 'import'
+
+    def __init__(self, file_path, file_type, table, columns, db_id, has_header=True,
+                 separator=',', sheet=None, commit_mode='all'):
+        super().__init__([], 1, 1, db_id)
+        self.file_path = file_path
+        self.file_type = file_type
+        self.table = table
+        self.columns = columns
+        self.has_header = has_header
+        self.separator = separator
+        self.sheet = sheet
+        self.commit_mode = commit_mode
+        self.rows_loaded = 0
+        self.batches = 0
+
+    @property
+    def label(self):
+        return f"导入数据到 {self.table}"
+
+    def execute(self):
+        try:
+            return run_bulk_import(self)
+        finally:
+            remove_temp_file(self.file_path)
+
+    def snapshot(self):
+        return {
+            **super().snapshot(),
+            "table": self.table,
+            "rows_loaded": self.rows_loaded,
+            "batches": self.batches,
+        }
+
+
+def iter_import_rows(file_path, file_type, separator=',', sheet=None):
+    """逐行读取导入文件（CSV按分隔符解析，XLSX只读模式流式读取），跳过空行"""
+    if file_type == '.csv':
+        with open(file_path, 'r', encoding='utf-8-sig', newline='') as f:
+            for row in csv.reader(f, delimiter=separator):
+                if any(cell != '' for cell in row):
+                    # CSV空单元格按NULL导入
+                    yield [cell if cell != '' else None for cell in row]
+        return
+    wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        if sheet and sheet not in wb.sheetnames:
+            raise ValueError(f"工作表不存在：{sheet}")
+        ws = wb[sheet] if sheet else wb.active
+        for row in ws.iter_rows(values_only=True):
+            if any(cell is not None for cell in row):
+                yield list(row)
+    finally:
+        wb.close()
+
+
+def resolve_import_columns(header, columns):
+    """确定文件列到目标表列的映射，返回 (文件列下标列表, 目标列名列表)：
+    columns 为空时使用表头作为列名；为列表时按文件列顺序对应（null 表示跳过该列）；
+    为字典时按表头名称映射（{文件列名: 目标列名}）"""
+    if columns is None:
+        if header is None:
+            raise ValueError("文件没有表头时必须指定列映射")
+        pairs = [(i, str(name).strip()) for i, name in enumerate(header) if name is not None and str(name).strip()]
+    elif isinstance(columns, list):
+        pairs = [(i, name) for i, name in enumerate(columns) if name]
+    elif isinstance(columns, dict):
+        if header is None:
+            raise ValueError("按列名映射时文件必须包含表头")
+        positions = {str(name).strip(): i for i, name in enumerate(header) if name is not None}
+        missing = [name for name in columns if name not in positions]
+        if missing:
+            raise ValueError(f"文件中不存在列：{', '.join(missing)}")
+        pairs = [(positions[name], target) for name, target in columns.items() if target]
+    else:
+        raise ValueError("列映射格式错误")
+    if not pairs:
+        raise ValueError("没有需要导入的列")
+    invalid = [name for _, name in pairs if not isinstance(name, str) or not IMPORT_COLUMN_RE.fullmatch(name)]
+    if invalid:
+        raise ValueError(f"列名不合法：{', '.join(map(str, invalid))}")
+    return [i for i, _ in pairs], [name for _, name in pairs]
+
+
+def get_batch_insert_size():
+    try:
+        return max(1, int(APP_CONFIG.get('app_batch_insert_size', DEFAULT_APP_CONFIG['app_batch_insert_size'])))
+    except (TypeError, ValueError):
+        return DEFAULT_APP_CONFIG['app_batch_insert_size']
+
+
+def run_bulk_import(job):
+    """执行批量导入：按 app_batch_insert_size 分批调用驱动的批量写入，
+    事务（commit_mode=batch 时为每批的事务）超过 app_transaction_timeout 时回滚并报错"""
+    db_config = get_database_by_id(job.db_id) if job.db_id else get_default_database()
+    if not db_config:
+        return {"status": "error", "message": "未找到有效的数据库配置"}
+    driver = get_db_driver(db_config.get('type', 'postgresql'))
+    batch_size = get_batch_insert_size()
+    transaction_timeout = APP_CONFIG.get('app_transaction_timeout', DEFAULT_APP_CONFIG['app_transaction_timeout'])
+    
+    rows = iter_import_rows(job.file_path, job.file_type, job.separator, job.sheet)
+    header = next(rows, None) if job.has_header else None
+    indices, target_columns = resolve_import_columns(header, job.columns)
+    
+    pool = CONNECTION_POOLS.get_pool(db_config)
+    conn = pool.acquire()
+    committed = 0  # 已提交的行数
+    try:
+        job.attach(conn, db_config)
+        # 单批语句不超过事务超时时间（批次之间另行检查整个事务的耗时）
+        driver.set_statement_timeout(conn, transaction_timeout)
+        deadline = time.monotonic() + transaction_timeout
+        while True:
+            batch = [tuple(row[i] if i < len(row) else None for i in indices) for row in islice(rows, batch_size)]
+            if not batch:
+                break
+            if job.cancel_requested:
+                raise QueryCancelled("导入已取消")
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"导入事务超过 {transaction_timeout} 秒未完成，已回滚")
+            driver.bulk_insert(conn, job.table, target_columns, batch)
+            job.rows_loaded += len(batch)
+            job.batches += 1
+            if job.commit_mode == 'batch':
+                conn.commit()
+                committed = job.rows_loaded
+                deadline = time.monotonic() + transaction_timeout
+        conn.commit()
+        RESULT_CACHE.invalidate(job.db_id)
+        logging.info(f"数据导入完成：表 {job.table} | 行数：{job.rows_loaded} | 批次：{job.batches} | 数据库：{job.db_id or 'default'}")
+        return {
+            "status": "success",
+            "message": f"导入完成！共导入 {job.rows_loaded} 行",
+            "rows_loaded": job.rows_loaded,
+            "batches": job.batches,
+        }
+    except Exception as e:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        job.rows_loaded = committed
+        if job.cancel_requested:
+            logging.info(f"数据导入已取消：表 {job.table} | 已提交行数：{job.rows_loaded} | 任务ID：{job.job_id}")
+            return {"status": "error", "message": "导入已取消", "cancelled": True, "rows_loaded": job.rows_loaded}
+        logging.error(f"数据导入失败：表 {job.table} | 第 {job.batches + 1} 批 | 数据库：{job.db_id or 'default'} | 错误：{str(e)}")
+        return {"status": "error", "message": f"导入失败（第 {job.batches + 1} 批）：{str(e)[:200]}",
+                "rows_loaded": job.rows_loaded}
+    finally:
+        job.detach()
+        try:
+            # 恢复连接池连接的会话语句超时
+            driver.set_statement_timeout(conn, DB_TIMEOUT_CONFIG['statement_timeout'])
+        except Exception:
+            pool.discard(conn)
+        else:
+            pool.release(conn)
+
+
+# 额外验证SQL语句的安全性 - 仅检查明确的危险操作
+# 注意：SELECT, INSERT, UPDATE, DELETE 是正常操作，不应阻止
+def validate_sql_request(sql, page, page_size, dialect='generic'):
+    """校验SQL执行请求（输入、危险操作、分页参数），返回错误信息，通过时返回None；
+    整个脚本先做一次安全分析，含危险语句时一条都不执行"""
+    # 输入验证
+    is_valid, message = validate_input(sql, "SQL语句", max_length=10000)
+    if not is_valid:
+        return message
+    
+    is_safe, msg = check_sql_safety(sql, dialect)
+    if not is_safe:
+        logging.warning(f"检测到潜在危险SQL操作: {sql[:100]}... | 原因：{msg}")
+        return msg
+    
+    # 参数校验
+    if not sql:
+        return "请输入SQL语句！"
+    if page < 1 or page_size < 1 or page_size > 1000:
+        return "页码需≥1，每页条数需1-1000之间！"
+    return None
+
+
+def execute_sql_statements(sql_statements, page, page_size, db_id, job=None, transaction=False, on_error='auto',
+                           use_cache=False):
+    """执行 split_sql_script 分割后的语句：单条直接返回结果，多条在同一会话中依次执行后汇总（job为异步查询任务，用于进度和取消；
+    use_cache只对单条只读查询生效）"""
+    if len(sql_statements) == 1:
+        # 单条语句执行（原有逻辑）
+        return execute_single_statement(sql_statements[0].text, page, page_size, db_id, job, use_cache)
+    
+    # 多条语句执行
+    return execute_sql_script(sql_statements, page, page_size, db_id, job, transaction, on_error)
+
+
+# 分割后的SQL语句：语句文本、在脚本中的起止偏移和起始行号（用于错误定位）
+SqlStatement = namedtuple('SqlStatement', ['text', 'start', 'end', 'line'])
+
+# 各方言的字符串/引用标识符写法（“展开循环”写法，未闭合时匹配到脚本末尾，不会回溯）
+SQL_QUOTED_PATTERNS = {
+    'generic': r"""'[^']*(?:''[^']*)*(?:'|\Z)|"[^"]*(?:""[^"]*)*(?:"|\Z)""",
+    'postgresql': r"""(?<!\w)[eE]'[^'\\]*(?:(?:\\.|'')[^'\\]*)*(?:'|\Z)|'[^']*(?:''[^']*)*(?:'|\Z)|"[^"]*(?:""[^"]*)*(?:"|\Z)""",
+    'mysql': r"""'[^'\\]*(?:(?:\\.|'')[^'\\]*)*(?:'|\Z)|"[^"\\]*(?:(?:\\.|"")[^"\\]*)*(?:"|\Z)|`[^`]*(?:``[^`]*)*(?:`|\Z)""",
+    'oracle': r"""'[^']*(?:''[^']*)*(?:'|\Z)|"[^"]*(?:""[^"]*)*(?:"|\Z)""",
+}
+# Oracle PL/SQL块的开头：匿名块、存储过程/函数/触发器/包/类型体
+SQL_PLSQL_START_RE = re.compile(
+    r'(?:DECLARE|BEGIN|CREATE\s+(?:OR\s+REPLACE\s+)?(?:(?:NON)?EDITIONABLE\s+)?'
+    r'(?:FUNCTION|PROCEDURE|TRIGGER|(?P<package>PACKAGE|TYPE\s+BODY)))\b',
+    re.IGNORECASE
+)
+# PL/SQL块中 END 之后不结束 BEGIN/CASE 的关键字（END IF、END LOOP 等）
+SQL_PLSQL_END_SUFFIX_RE = re.compile(r'\s+(IF|LOOP|WHILE|REPEAT|CASE)\b', re.IGNORECASE)
+# Oracle q'[...]' 字符串的成对定界符
+SQL_Q_QUOTE_CLOSERS = {'[': ']', '{': '}', '(': ')', '<': '>'}
+
+
+@lru_cache(maxsize=32)
+def sql_token_pattern(dialect, delimiter, plsql):
+    """按方言和当前语句分隔符构造词法扫描正则（只匹配注释、字符串、分隔符等需要处理的记号，普通文本整体跳过）"""
+    comment = r'--[^\n]*|/\*.*?(?:\*/|\Z)'
+    if dialect == 'mysql':
+        comment += r'|\#[^\n]*'
+    parts = [
+        f'(?P<comment>{comment})',
+        f"(?P<quoted>{SQL_QUOTED_PATTERNS.get(dialect, SQL_QUOTED_PATTERNS['generic'])})",
+        r'(?P<go>^[ \t]*GO[ \t]*(?:\n|\Z))',  # SQL Server风格的批次分隔行
+    ]
+    if dialect == 'postgresql':
+        parts.append(r'(?P<dollar>(?<![\w$])\$(?:[A-Za-z_]\w*)?\$)')
+    if dialect == 'oracle':
+        parts.append(r"(?P<qquote>(?<!\w)[qQ]'.)")
+        parts.append(r'(?P<slash>^[ \t]*/[ \t]*(?:\n|\Z))')  # SQL*Plus风格的PL/SQL块结束行
+        if plsql:
+            parts.append(r'(?P<word>\b(?:BEGIN|CASE|END|AS|IS)\b)')
+    if dialect == 'mysql':
+        parts.append(r'(?P<delimiter_cmd>^[ \t]*DELIMITER[ \t]+(?P<new_delimiter>\S+)[ \t]*(?:\n|\Z))')
+    parts.append(f'(?P<delim>{re.escape(delimiter)})')
+    return re.compile('|'.join(parts), re.IGNORECASE | re.MULTILINE | re.DOTALL)
+
+
+def split_sql_script(sql, dialect='generic'):
+    """单遍扫描分割SQL脚本，返回 SqlStatement 列表（线性时间）：
+    字符串、引用标识符和注释中的分号不分割；语句前的注释不计入语句，语句内的注释（如优化器提示）保留；
+    postgresql - 支持 $$/$tag$ 美元引用（函数体）；
+    mysql - 支持 DELIMITER 命令切换分隔符、# 注释和反斜杠转义；
+    oracle - PL/SQL块（DECLARE/BEGIN/CREATE PROCEDURE等）按 BEGIN/END 嵌套结束，或以单独一行的 / 结束，
+             块语句保留结尾的分号，普通语句去掉分号；
+    所有方言都支持单独一行的 GO 作为分隔符"""
+    statements = []
+    delimiter = ';'
+    pos = 0
+    length = len(sql)
+    line, line_pos = 1, 0  # 增量统计行号
+    start = None           # 当前语句第一个有效字符的位置
+    plsql = False
+    depth = 0              # PL/SQL块中 BEGIN/CASE 的嵌套层数
+    block_opened = False
+    package_pending = False  # 包/类型体的第一个 AS/IS 开启块
+
+    def finish(end, keep_end=None):
+        nonlocal start, plsql, depth, block_opened, package_pending, line, line_pos
+        if start is not None:
+            text = sql[start:keep_end if keep_end is not None else end].rstrip()
+            if text:
+                line += sql.count('\n', line_pos, start)
+                line_pos = start
+                statements.append(SqlStatement(text, start, start + len(text), line))
+        start = None
+        plsql = False
+        depth = 0
+        block_opened = False
+        package_pending = False
+
+    while pos < length:
+        m = sql_token_pattern(dialect, delimiter, plsql).search(sql, pos)
+        token_start = m.start() if m else length
+        kind = m.lastgroup if m else None
+        
+        if start is None:
+            # 确定语句开头：记号之前的普通文本，或不是注释/分隔符的记号本身
+            gap = sql[pos:token_start]
+            stripped = len(gap) - len(gap.lstrip())
+            if stripped < len(gap):
+                start = pos + stripped
+            elif kind in ('quoted', 'dollar', 'qquote', 'word'):
+                start = token_start
+            if start is not None and dialect == 'oracle':
+                plsql_match = SQL_PLSQL_START_RE.match(sql, start)
+                if plsql_match:
+                    plsql = True
+                    package_pending = bool(plsql_match.group('package'))
+                    # 从语句开头按PL/SQL模式重新扫描，统计开头的 BEGIN
+                    pos = start
+                    continue
+        if m is None:
+            break
+        
+        pos = m.end()
+        if kind == 'dollar':
+            closer = sql.find(m.group(), pos)
+            pos = length if closer < 0 else closer + len(m.group())
+        elif kind == 'qquote':
+            close_char = SQL_Q_QUOTE_CLOSERS.get(m.group()[-1], m.group()[-1]) + "'"
+            closer = sql.find(close_char, pos)
+            pos = length if closer < 0 else closer + 2
+        elif kind == 'word':
+            word = m.group().upper()
+            if word in ('BEGIN', 'CASE'):
+                depth += 1
+                block_opened = True
+            elif word == 'END':
+                suffix = SQL_PLSQL_END_SUFFIX_RE.match(sql, pos)
+                if suffix:
+                    pos = suffix.end()
+                if suffix is None or suffix.group(1).upper() == 'CASE':
+                    depth -= 1
+            elif package_pending:
+                depth += 1
+                block_opened = True
+                package_pending = False
+        elif kind == 'delim':
+            if plsql and not (block_opened and depth <= 0):
+                continue  # PL/SQL块内部的分号
+            finish(m.start(), m.end() if plsql else None)
+        elif kind in ('go', 'slash'):
+            finish(m.start())
+        elif kind == 'delimiter_cmd':
+            finish(m.start())
+            delimiter = m.group('new_delimiter')
+    finish(length)
+    return statements
+
+
+def split_sql_statements(sql_content, dialect='generic'):
+    """分割SQL语句，返回语句文本列表"""
+    return [stmt.text for stmt in split_sql_script(sql_content, dialect)]
+
+
+def get_db_driver_for(db_id):
+    """数据库对应的驱动适配器，未找到配置或类型不支持时返回None"""
+    db_config = get_database_by_id(db_id) if db_id else get_default_database()
+    if not db_config:
+        return None
+    try:
+        return get_db_driver(db_config.get('type', 'postgresql'))
+    except ValueError:
+        return None
+
+
+def get_sql_dialect(db_id):
+    """数据库对应的SQL分割方言"""
+    driver = get_db_driver_for(db_id)
+    return driver.sql_dialect if driver is not None else 'generic'
+
+# SQL安全分析结果：主语句类型（首个命令关键字，WITH按其后的主语句计）、是否允许执行、拒绝原因、
+# 是否修改数据（主语句为写操作，或 WITH 中任意层级含 INSERT/UPDATE/DELETE/MERGE）
+SqlVerdict = namedtuple('SqlVerdict', ['command', 'safe', 'message', 'writes'], defaults=(False,))
+
+# 禁止执行的命令关键字（位于语句开头，或后面紧跟对象类型时）
+SQL_BLOCKED_COMMANDS = frozenset({
+    'DROP', 'TRUNCATE', 'ALTER', 'CREATE', 'RENAME', 'GRANT', 'REVOKE', 'LOCK', 'SHUTDOWN', 'BACKUP', 'RESTORE'
+})
+# 对象类型关键字：DROP TABLE、LOCK TABLE 等出现在语句中间（如PL/SQL分支内）时同样禁止
+SQL_OBJECT_TYPES = frozenset({
+    'TABLE', 'VIEW', 'INDEX', 'SEQUENCE', 'SCHEMA', 'DATABASE', 'USER', 'ROLE', 'PROCEDURE', 'FUNCTION',
+    'TRIGGER', 'PACKAGE', 'TYPE', 'SYNONYM', 'TABLESPACE', 'COLUMN', 'CONSTRAINT', 'MATERIALIZED',
+    'UNIQUE', 'GLOBAL', 'TEMPORARY', 'TEMP', 'EXTENSION', 'DOMAIN', 'TABLES', 'LOG',
+})
+# 之后开始新命令的关键字（PL块和条件分支）
+SQL_COMMAND_LEADERS = frozenset({'BEGIN', 'THEN', 'ELSE', 'LOOP'})
+# WITH 之后决定语句类型的主语句关键字（只看括号外的）
+SQL_WITH_MAIN_COMMANDS = frozenset({'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'MERGE', 'VALUES'})
+# 修改数据的命令关键字
+SQL_DML_COMMANDS = frozenset({'INSERT', 'UPDATE', 'DELETE', 'MERGE'})
+# 返回结果集的只读查询
+SQL_ROW_QUERY_COMMANDS = frozenset({'SELECT', 'VALUES'})
+# 系统存储过程前缀
+SQL_SYSTEM_PROCEDURE_PREFIXES = ('SP_', 'XP_')
+SQL_INJECTION_MESSAGE = "检测到潜在的SQL注入攻击模式！"
+# 括号不配对（右括号多于左括号可闭合外层包装的语句，如 COPY (...) TO ...）
+SQL_UNBALANCED_MESSAGE = "SQL语句括号不匹配！"
+
+
+@lru_cache(maxsize=32)
+def sql_lex_pattern(dialect):
+    """按方言构造安全分析用的词法正则：注释、字符串、引用标识符、单词、数字和关心的符号"""
+    comment = r'--[^\n]*|/\*.*?(?:\*/|\Z)'
+    parts = []
+    if dialect == 'mysql':
+        comment += r'|\#[^\n]*'
+        # MySQL 会执行 /*! ... */（可带版本号）中的内容：只跳过开头，内容照常分析
+        parts.append(r'(?P<versioned>/\*!\d*)')
+    parts.append(f'(?P<comment>{comment})')
+    if dialect == 'postgresql':
+        parts.append(r'(?P<dollar>(?<![\w$])\$(?:[A-Za-z_]\w*)?\$)')
+    if dialect == 'oracle':
+        parts.append(r"(?P<qquote>(?<!\w)[qQ]'.)")
+    parts += [
+        f"(?P<quoted>{SQL_QUOTED_PATTERNS.get(dialect, SQL_QUOTED_PATTERNS['generic'])})",
+        r'(?P<word>[^\W\d][\w$#]*)',
+        r'(?P<number>\d+(?:\.\d*)?)',
+        r'(?P<symbol>[;(),=.])',
+    ]
+    return re.compile('|'.join(parts), re.DOTALL)
+
+
+def lex_sql(sql, dialect='generic'):
+    """单遍词法扫描，返回 (类型, 值) 列表：word 为大写单词，string 为字符串内容，identifier 为引用标识符（不含内容），
+    body 为美元引用的函数体内容，注释直接跳过"""
+    pattern = sql_lex_pattern(dialect)
+    tokens = []
+    pos = 0
+    length = len(sql)
+    while pos < length:
+        m = pattern.search(sql, pos)
+        if m is None:
+            break
+        kind = m.lastgroup
+        pos = m.end()
+        if kind == 'word':
+            tokens.append(('word', m.group().upper()))
+        elif kind == 'quoted':
+            text = m.group()
+            if text[0] in '"`':
+                tokens.append(('identifier', None))
+            else:
+                # 去掉 E 前缀和引号，还原两个连续的单引号（反斜杠转义保留原样，不影响安全分析）
+                content = text[text.index("'") + 1:]
+                if content.endswith("'"):
+                    content = content[:-1]
+                tokens.append(('string', content.replace("''", "'")))
+        elif kind == 'dollar':
+            closer = sql.find(m.group(), pos)
+            end = length if closer < 0 else closer
+            tokens.append(('body', sql[pos:end]))
+            pos = end + len(m.group())
+        elif kind == 'qquote':
+            close_char = SQL_Q_QUOTE_CLOSERS.get(m.group()[-1], m.group()[-1]) + "'"
+            closer = sql.find(close_char, pos)
+            end = length if closer < 0 else closer
+            tokens.append(('string', sql[pos:end]))
+            pos = end + 2
+        elif kind not in ('comment', 'versioned'):
+            tokens.append((kind, m.group()))
+    return tokens
+
+
+def is_dynamic_sql(tokens, i):
+    """EXEC/EXECUTE 之后是字符串、括号、IMMEDIATE 或系统存储过程时视为动态SQL/存储过程执行"""
+    kind, value = tokens[i + 1] if i + 1 < len(tokens) else (None, None)
+    return (kind == 'string' or value in ('(', 'IMMEDIATE')
+            or (kind == 'word' and value.startswith(SQL_SYSTEM_PROCEDURE_PREFIXES)))
+
+
+def is_code_string(tokens, i):
+    """字符串是否为要执行的代码：DO [LANGUAGE 语言] '代码块' 或 PREPARE 名称 FROM '语句'"""
+    previous = [value for kind, value in tokens[max(0, i - 3):i]]
+    return (previous[-1:] == ['DO'] or previous[-3:-1] == ['DO', 'LANGUAGE']
+            or (previous[-3:-2] == ['PREPARE'] and previous[-1:] == ['FROM']))
+
+
+def is_union_select(tokens, i):
+    """UNION [ALL|DISTINCT] [(] SELECT"""
+    for kind, value in islice(tokens, i + 1, None):
+        if value in ('ALL', 'DISTINCT', '('):
+            continue
+        return value == 'SELECT'
+    return False
+
+
+def is_tautology(tokens, i):
+    """OR 数字 = 数字"""
+    following = [kind if kind != 'symbol' else value for kind, value in islice(tokens, i + 1, i + 4)]
+    return following == ['number', '=', 'number']
+
+
+@lru_cache(maxsize=1024)
+def classify_sql(sql, dialect='generic', plbody=False):
+    """词法级SQL安全分析（结果按SQL文本缓存）：只扫描一遍，字符串、注释和引用标识符中的内容不参与判断，
+    危险命令只在命令位置（语句开头、分号或 BEGIN/THEN/ELSE/LOOP 之后）或后接对象类型时拦截，
+    美元引用的函数体（如 DO $$ ... $$）、DO 的字符串代码块和 PREPARE ... FROM 的语句文本递归分析，
+    函数体（plbody）中的 EXECUTE 一律视为动态SQL；每条语句的括号必须配对"""
+    tokens = lex_sql(sql, dialect)
+    command = None
+    expect_command = True
+    depth = 0
+    in_with = False
+    writes = False
+    for i, (kind, value) in enumerate(tokens):
+        if kind == 'body' or (kind == 'string' and is_code_string(tokens, i)):
+            verdict = classify_sql(value, dialect, kind == 'body' or tokens[i - 1][1] != 'FROM')
+            if not verdict.safe:
+                return SqlVerdict(command, False, verdict.message)
+            expect_command = False
+        elif kind == 'symbol':
+            if value == '(':
+                depth += 1
+                continue  # 语句开头的括号（如 (SELECT ...) UNION ...）不影响命令位置
+            if value == ')':
+                depth -= 1
+                if depth < 0:
+                    return SqlVerdict(command, False, SQL_UNBALANCED_MESSAGE)
+            elif value == ';' and depth != 0:
+                return SqlVerdict(command, False, SQL_UNBALANCED_MESSAGE)
+            expect_command = value == ';'
+        elif kind == 'word':
+            if value in SQL_BLOCKED_COMMANDS:
+                next_value = tokens[i + 1][1] if i + 1 < len(tokens) else None
+                if expect_command or next_value in SQL_OBJECT_TYPES:
+                    return SqlVerdict(command or value, False, f"禁止执行包含「{value}」的危险SQL！")
+            if value in ('EXEC', 'EXECUTE') and (plbody or is_dynamic_sql(tokens, i)):
+                return SqlVerdict(command or value, False, SQL_INJECTION_MESSAGE)
+            if value == 'FROM' and i >= 2 and tokens[i - 2] == ('word', 'PREPARE') \
+                    and (i + 1 == len(tokens) or tokens[i + 1][0] != 'string'):
+                # PREPARE ... FROM @变量：语句文本无法分析
+                return SqlVerdict(command, False, SQL_INJECTION_MESSAGE)
+            if expect_command and value.startswith(SQL_SYSTEM_PROCEDURE_PREFIXES):
+                return SqlVerdict(command or value, False, SQL_INJECTION_MESSAGE)
+            if (value == 'UNION' and is_union_select(tokens, i)) or (value == 'OR' and is_tautology(tokens, i)):
+                return SqlVerdict(command, False, SQL_INJECTION_MESSAGE)
+            if command is None and expect_command:
+                command = value
+            elif command == 'WITH' and depth == 0 and value in SQL_WITH_MAIN_COMMANDS:
+                command = value
+            in_with = in_with or value == 'WITH'  # 包括 EXPLAIN ANALYZE WITH ...
+            if in_with and value in SQL_DML_COMMANDS and tokens[i - 1][1] not in ('FOR', 'KEY'):
+                # WITH d AS (DELETE ... RETURNING *) SELECT ...：主语句是查询，但会修改数据（FOR [NO KEY] UPDATE 是行锁）
+                writes = True
+            expect_command = value in SQL_COMMAND_LEADERS
+        else:
+            expect_command = False
+    if depth != 0:
+        return SqlVerdict(command, False, SQL_UNBALANCED_MESSAGE)
+    return SqlVerdict(command or '', True, "", writes or command in SQL_DML_COMMANDS)
+
+
+# 未加引号的标识符不区分大小写的方言（规范化时可统一转大写；MySQL表名在部分系统上区分大小写）
+SQL_CASE_FOLDING_DIALECTS = ('postgresql', 'oracle')
+
+
+@lru_cache(maxsize=1024)
+def normalize_sql(sql, dialect='generic'):
+    """规范化SQL文本（用于结果缓存指纹）：去掉注释和末尾分号、合并空白，
+    字符串和引用标识符原样保留，不区分大小写的方言中单词统一转大写"""
+    pattern = sql_lex_pattern(dialect)
+    fold_case = dialect in SQL_CASE_FOLDING_DIALECTS
+    parts = []
+    pos = 0
+    length = len(sql)
+    while pos < length:
+        m = pattern.search(sql, pos)
+        gap = sql[pos:m.start() if m else length].split()
+        parts.extend(gap)
+        if m is None:
+            break
+        kind = m.lastgroup
+        pos = m.end()
+        if kind == 'comment':
+            continue
+        if kind == 'dollar':
+            closer = sql.find(m.group(), pos)
+            pos = length if closer < 0 else closer + len(m.group())
+            parts.append(sql[m.start():pos])
+        elif kind == 'qquote':
+            close_char = SQL_Q_QUOTE_CLOSERS.get(m.group()[-1], m.group()[-1]) + "'"
+            closer = sql.find(close_char, pos)
+            pos = length if closer < 0 else closer + 2
+            parts.append(sql[m.start():pos])
+        elif kind == 'word' and fold_case:
+            parts.append(m.group().upper())
+        else:
+            parts.append(m.group())
+    while parts and parts[-1] == ';':
+        parts.pop()
+    return ' '.join(parts)
+
+
+def check_sql_safety(sql, dialect='generic'):
+    """SQL安全校验：禁止DDL/DCL等危险操作和常见注入模式，但允许合法的数据操作，返回 (是否安全, 原因)"""
+    verdict = classify_sql(sql, dialect)
+    return verdict.safe, verdict.message
+
+# Excel单个工作表的最大行数（含表头），超出后自动拆分到新工作表
+EXCEL_MAX_ROWS_PER_SHEET = 1048576
+# 估算列宽时抽样的行数
+EXCEL_WIDTH_SAMPLE_ROWS = 1000
+# Excel原生支持的单元格类型，其余类型转为字符串
+EXCEL_NATIVE_TYPES = (int, float, Decimal, str, bool, date, dt_time)
+
+
+def build_excel_named_styles(header_color="4472C4"):
+    """构造表头和内容的命名样式（整个工作簿共享，避免逐单元格创建样式对象）"""
+    # 边框样式
+    side = Side(style='thin')
+    border = Border(left=side, right=side, top=side, bottom=side)
+    # 对齐方式
+    align = Alignment(horizontal='center', vertical='center')
+    header_style = NamedStyle(
+        name=f'hina_header_{header_color}',
+        font=Font(name='微软雅黑', size=11, bold=True, color='FFFFFF'),
+        fill=PatternFill(start_color=header_color, end_color=header_color, fill_type='solid'),
+        alignment=align,
+        border=border
+    )
+    content_style = NamedStyle(
+        name='hina_content',
+        font=Font(name='微软雅黑', size=10),
+        alignment=align,
+        border=border
+    )
+    return header_style, content_style
+
+
+def format_excel_cell(value):
+    """转换为Excel可写入的值：不支持的类型转为字符串，去除非法控制字符和时区"""
+    if value is None or isinstance(value, EXCEL_NATIVE_TYPES) and not isinstance(value, (str, datetime, dt_time)):
+        return value
+    if isinstance(value, str):
+        return ILLEGAL_CHARACTERS_RE.sub('', value)
+    if isinstance(value, (datetime, dt_time)):
+        return value.replace(tzinfo=None) if value.tzinfo is not None else value
+    return ILLEGAL_CHARACTERS_RE.sub('', str(value))
+
+
+def estimate_excel_column_widths(columns, sample_rows):
+    """根据表头和抽样行估算列宽（最大50）"""
+    widths = [len(str(col)) for col in columns]
+    for row in sample_rows:
+        for idx, value in enumerate(row[:len(widths)]):
+            length = len(str(value)) if value is not None else 0
+            if length > widths[idx]:
+                widths[idx] = length
+    return [min(width + 2, 50) for width in widths]
+
+
+def build_excel_content_style_arrays(ws, style_name):
+    """按值类型预先计算内容单元格的样式数组（日期时间类型需附带数字格式，否则Excel中显示为数字）"""
+    style_arrays = {}
+    for value_type, number_format in ((None, None), (datetime, 'yyyy-mm-dd h:mm:ss'),
+                                      (date, 'yyyy-mm-dd'), (dt_time, 'h:mm:ss')):
+        cell = WriteOnlyCell(ws)
+        cell.style = style_name
+        if number_format:
+            cell.number_format = number_format
+        style_arrays[value_type] = cell._style
+    return style_arrays
+
+
+def write_excel_workbook(file_path, columns, rows, header_color="4472C4", include_header=True,
+                         sheet_title=None):
+    """以只写模式流式写出Excel文件，返回 (数据行数, 工作表数)
+    - rows 为已按excel格式转换的行，行逐条写入磁盘，不在内存中保留整个工作表
+    - 表头和内容使用共享的命名样式（只有导出表头时才设置样式，与原有行为一致）
+    - 超过单表行数上限时自动拆分到多个工作表"""
+    sheet_title = sheet_title or f"查询结果_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+    styled = bool(include_header and columns)
+    wb = Workbook(write_only=True)
+    if styled:
+        header_style, content_style = build_excel_named_styles(header_color)
+        wb.add_named_style(header_style)
+        wb.add_named_style(content_style)
+    
+    rows = iter(rows)
+    # 先读取抽样行估算列宽（只写模式下列宽必须在写入数据前设置）
+    sample = list(islice(rows, EXCEL_WIDTH_SAMPLE_ROWS))
+    widths = estimate_excel_column_widths(columns, sample) if styled else []
+    
+    header_rows = 1 if include_header and columns else 0
+    rows_per_sheet = EXCEL_MAX_ROWS_PER_SHEET - header_rows
+    content_style_arrays = None
+    ws = None
+    sheet_count = 0
+    sheet_rows = rows_per_sheet
+    row_count = 0
+    
+    def new_sheet():
+        title = sheet_title if sheet_count == 0 else f"{sheet_title}_{sheet_count + 1}"
+        sheet = wb.create_sheet(title=title[:31])
+        for idx, width in enumerate(widths, start=1):
+            sheet.column_dimensions[get_column_letter(idx)].width = width
+        if header_rows:
+            header = []
+            for col in columns:
+                cell = WriteOnlyCell(sheet, value=format_excel_cell(col))
+                cell.style = header_style.name
+                header.append(cell)
+            sheet.append(header)
+        return sheet
+    
+    for row in chain(sample, rows):
+        if sheet_rows >= rows_per_sheet:
+            ws = new_sheet()
+            sheet_count += 1
+            sheet_rows = 0
+        if styled:
+            if content_style_arrays is None:
+                content_style_arrays = build_excel_content_style_arrays(ws, content_style.name)
+            default_style_array = content_style_arrays[None]
+            cells = []
+            for value in row:
+                cell = WriteOnlyCell(ws, value=value)
+                # 只写模式的单元格写出后不再修改，可直接共享样式数组，省去逐单元格按名称查找样式
+                cell._style = content_style_arrays.get(type(value), default_style_array)
+                cells.append(cell)
+            ws.append(cells)
+        else:
+            ws.append(row)
+        sheet_rows += 1
+        row_count += 1
+    
+    if ws is None:
+        # 空结果也输出一个只有表头的工作表
+        new_sheet()
+        sheet_count = 1
+    
+    wb.save(file_path)
+    return row_count, sheet_count
+
+
+# 导出时每批编码写出的行数
+EXPORT_BATCH_ROWS = 1000
+# 导出时从数据库游标每次读取的行数
+EXPORT_FETCH_ROWS = 5000
+# 下载临时文件时每次读取的字节数
+EXPORT_FILE_CHUNK_SIZE = 256 * 1024
+# 数据库直接生成CSV（COPY）时，等待响应输出的数据块数上限（每块 EXPORT_FILE_CHUNK_SIZE）
+STREAM_EXPORT_QUEUE_CHUNKS = 8
+# 客户端断开后等待COPY线程结束的秒数
+STREAM_EXPORT_CANCEL_WAIT = 5
+# CSV/HTML导出下载的流式压缩方式 -> (文件扩展名, MIME类型)，zip为单文件压缩包
+EXPORT_COMPRESSIONS = {
+    'gzip': ('.gz', 'application/gzip'),
+    'zip': ('.zip', 'application/zip'),
+    'zstd': ('.zst', 'application/zstd'),
+}
+# 压缩级别（gzip/zip为zlib级别1-9，zstd为1-22），偏向速度
+EXPORT_GZIP_LEVEL = 6
+EXPORT_ZSTD_LEVEL = 3
+
+
+class DatabaseRowStream:
+    """重新执行查询，通过服务端游标逐批读取结果行（导出时不在内存中保留整个结果集）"""
+
+    def __init__(self, sql, db_config, fetch_size=EXPORT_FETCH_ROWS):
+        self.db_type = db_config.get('type', 'postgresql').lower()
+        self.fetch_size = fetch_size
+        self.pool = CONNECTION_POOLS.get_pool(db_config)
+        self.conn = self.pool.acquire()
+        self.cursor = None
+        self.exhausted = False
+        self.closed = False
+        try:
+            self.cursor, _ = open_server_cursor(self.conn, self.db_type, fetch_size)
+            self.cursor.execute(sql)
+            # 命名游标在首次FETCH后才有列信息
+            self._first_batch = self.cursor.fetchmany(fetch_size)
+            description = self.cursor.description or []
+            self.columns = [desc[0] for desc in description]
+            self.column_types = get_db_driver(self.db_type).column_types(description)
+        except Exception:
+            self.close()
+            raise
+
+    def __iter__(self):
+        rows, self._first_batch = self._first_batch, None
+        while rows:
+            yield from rows
+            rows = self.cursor.fetchmany(self.fetch_size)
+        self.exhausted = True
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        if self.cursor is None:
+            self.pool.release(self.conn)
+            return
+        close_server_cursor(self.pool, self.conn, self.cursor, self.db_type, self.exhausted)
+
+
+def is_copy_export_query(sql, dialect='generic'):
+    """能否由数据库直接生成CSV（见 DatabaseDriver.copy_csv_out，语句会嵌入 COPY (...) TO STDOUT）：
+    必须是单条安全的只读查询，括号配对（classify_sql 校验），末尾分号之外没有其他语句"""
+    verdict = classify_sql(sql, dialect)
+    if not verdict.safe or not is_row_query(sql, dialect):
+        return False
+    tokens = lex_sql(sql, dialect)
+    while tokens and tokens[-1] == ('symbol', ';'):
+        tokens.pop()
+    return bool(tokens) and ('symbol', ';') not in tokens
+
+
+class CopyExportStream:
+    """由数据库直接生成CSV的流式导出（见 DatabaseDriver.copy_csv_out）：
+    copy_expert 只能写入文件对象，由后台线程执行COPY，收到的字节按块经有界队列交给响应逐块输出；
+    客户端断开时取消服务端语句并丢弃连接（COPY中断后连接状态不确定）"""
+
+    def __init__(self, sql, db_config, separator=',', include_header=True):
+        self.db_config = db_config
+        self.driver = get_db_driver(db_config.get('type', 'postgresql').lower())
+        self.pool = CONNECTION_POOLS.get_pool(db_config)
+        self.conn = self.pool.acquire()
+        self.bytes_written = 0
+        self.closed = False
+        self._queue = queue.Queue(maxsize=STREAM_EXPORT_QUEUE_CHUNKS)
+        self._buffer = []
+        self._buffered = 0
+        self._cancelled = threading.Event()
+        self._finished = threading.Event()  # 服务端COPY语句已正常执行完毕，连接处于空闲状态
+        self._error = None
+        self._thread = threading.Thread(target=self._run, args=(sql, separator, include_header),
+                                        name='copy-export', daemon=True)
+        self._thread.start()
+        # 等待第一块数据（或执行结束），SQL错误在开始下载之前抛出；最多等待语句超时时间
+        self._first = self._get(DB_TIMEOUT_CONFIG['statement_timeout'] + STREAM_EXPORT_CANCEL_WAIT)
+        if self._first is None and self._error is not None:
+            self.close()
+            raise self._error
+
+    def write(self, data):
+        """copy_expert 的写入回调：累积到 EXPORT_FILE_CHUNK_SIZE 后放入队列"""
+        self._buffer.append(data)
+        self._buffered += len(data)
+        if self._buffered >= EXPORT_FILE_CHUNK_SIZE:
+            self._put(b''.join(self._buffer))
+            self._buffer = []
+            self._buffered = 0
+
+    def _put(self, item):
+        # 队列满时等待响应消费，客户端断开后中止COPY
+        while not self._cancelled.is_set():
+            try:
+                self._queue.put(item, timeout=1)
+                return
+            except queue.Full:
+                continue
+        raise RuntimeError("导出已取消")
+
+    def _get(self, timeout=None):
+        """从队列取下一块数据；COPY线程已退出且队列为空时视为结束，超过 timeout 秒则取消导出"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                return self._queue.get(timeout=1)
+            except queue.Empty:
+                if not self._thread.is_alive() and self._queue.empty():
+                    return None
+                if deadline is not None and time.monotonic() >= deadline:
+                    self.close()
+                    raise TimeoutError(f"COPY导出在 {timeout} 秒内未返回数据")
+
+    def _run(self, sql, separator, include_header):
+        try:
+            self.driver.copy_csv_out(self.conn, sql, self, separator, include_header)
+        except Exception as e:
+            self._error = e
+        else:
+            self._finished.set()
+        try:
+            if self._finished.is_set() and self._buffer:
+                self._put(b''.join(self._buffer))
+            self._put(None)
+        except RuntimeError:
+            pass
+
+    def __iter__(self):
+        chunk, self._first = self._first, None
+        while chunk is not None:
+            self.bytes_written += len(chunk)
+            yield chunk
+            chunk = self._get()
+        if self._error is not None:
+            raise self._error
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        if self._finished.is_set():
+            # COPY已正常结束，线程只剩放入队列的数据块：停止等待响应消费后等线程退出，连接可以归还连接池
+            self._cancelled.set()
+            self._thread.join(STREAM_EXPORT_CANCEL_WAIT)
+        elif self._thread.is_alive():
+            # 客户端提前断开（或超时）：COPY仍在执行，取消服务端语句
+            self._cancelled.set()
+            try:
+                self.driver.cancel(self.conn, self.db_config)
+            except Exception as e:
+                logging.warning(f"取消COPY导出失败：{str(e)}")
+            self._thread.join(STREAM_EXPORT_CANCEL_WAIT)
+        if self._finished.is_set() and not self._thread.is_alive():
+            self.pool.release(self.conn)
+        else:
+            self.pool.discard(self.conn)
+
+
+class ExportSource:
+    """导出用的结果行来源：缓存的查询结果，或重新执行查询的数据库游标"""
+
+    def __init__(self, columns, rows, row_count=None, on_close=None, column_types=None):
+        self.columns = columns
+        self.column_types = column_types  # 由 cursor.description 得到的列类型（见 DatabaseDriver.column_types）
+        self.row_count = row_count  # 未知时为None（重新执行查询）
+        self.rows_read = 0
+        self._rows = rows
+        self._on_close = on_close
+
+    def __iter__(self):
+        for row in self._rows:
+            self.rows_read += 1
+            yield row
+
+    def close(self):
+        on_close, self._on_close = self._on_close, None
+        if on_close is not None:
+            on_close()
+
+
+def open_export_source(query_id, source='auto', fmt='python'):
+    """打开导出数据来源，行按 fmt（csv/html/excel）批量转换格式：
+    auto - 有缓存结果时读取缓存，否则重新执行查询；
+    cache - 只读取缓存结果；
+    database - 总是重新执行查询，通过游标流式读取（逐批转为列式后转换格式）。
+    查询不存在或已过期时返回None"""
+    entry = QUERY_RESULTS.lookup(query_id) if query_id else None
+    if entry is None:
+        return None
+    if entry.cached and source != 'database':
+        rows = QUERY_RESULTS.iter_rows(query_id, fmt)
+        if rows is not None:
+            return ExportSource(entry.columns, rows, entry.row_count, column_types=entry.meta.get('column_types'))
+    if source == 'cache' or not entry.meta.get('sql'):
+        return None
+    
+    db_id = entry.meta.get('db_id')
+    db_config = get_database_by_id(db_id) if db_id else get_default_database()
+    if not db_config:
+        raise ValueError("未找到有效的数据库配置")
+    stream = DatabaseRowStream(entry.meta['sql'], db_config)
+    rows = iter(stream) if fmt == 'python' else format_row_batches(stream, len(stream.columns), fmt)
+    return ExportSource(stream.columns, rows, None, stream.close, stream.column_types)
+
+
+def build_content_disposition(filename):
+    """构造附件下载头（兼容中文文件名）"""
+    stem, ext = os.path.splitext(filename)
+    ascii_stem = stem.encode('ascii', 'ignore').decode('ascii').replace('"', '').strip() or 'download'
+    ascii_name = ascii_stem + ext.encode('ascii', 'ignore').decode('ascii')
+    return f"attachment; filename=\"{ascii_name}\"; filename*=UTF-8''{quote(filename)}"
+
+
+def build_download_response(chunks, filename, mimetype, on_close=None, content_length=None):
+    """以分块传输方式返回下载文件，响应结束（含客户端中断）后执行清理"""
+    response = Response(chunks, mimetype=mimetype)
+    response.headers['Content-Disposition'] = build_content_disposition(filename)
+    if content_length is not None:
+        response.headers['Content-Length'] = str(content_length)
+    # 禁止反向代理缓冲，边生成边下发
+    response.headers['X-Accel-Buffering'] = 'no'
+    if on_close is not None:
+        response.call_on_close(on_close)
+    return response
+
+
+def iter_file_chunks(file_path, chunk_size=EXPORT_FILE_CHUNK_SIZE):
+    """按块读取文件内容用于下载"""
+    with open(file_path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def remove_temp_file(file_path):
+    """删除导出生成的临时文件"""
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logging.warning(f"删除临时文件失败：{file_path} | {str(e)}")
+
+
+def compress_chunks(chunks, compressor):
+    """用流式压缩器（zlib/zstandard 的 compressobj）逐块压缩，压缩器内部缓冲满时才输出"""
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class ZipStreamSink:
+    """不可定位的zip输出缓冲：zipfile 检测到不支持seek时改用数据描述符，边压缩边取出已写入的字节"""
+
+    def __init__(self):
+        self._buffer = BytesIO()
+        self._position = 0
+
+    def write(self, data):
+        self._position += len(data)
+        return self._buffer.write(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate(0)
+        return data
+
+
+def zip_chunks(chunks, member_name):
+    """将字节块流式写入只含一个文件的zip压缩包（大小事先未知，强制使用ZIP64）"""
+    sink = ZipStreamSink()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED, compresslevel=EXPORT_GZIP_LEVEL) as zf:
+        with zf.open(member_name, 'w', force_zip64=True) as member:
+            for chunk in chunks:
+                member.write(chunk)
+                data = sink.drain()
+                if data:
+                    yield data
+    yield sink.drain()
+
+
+def compress_export_stream(chunks, filename, mimetype, compression):
+    """按压缩方式（none/gzip/zip/zstd）包装下载字节块，返回 (字节块, 文件名, MIME类型)；
+    zstd 需要安装 zstandard，未安装时抛出ImportError（在开始下载之前）"""
+    if compression == 'none':
+        return chunks, filename, mimetype
+    extension, compressed_mimetype = EXPORT_COMPRESSIONS[compression]
+    if compression == 'gzip':
+        compressor = zlib.compressobj(EXPORT_GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits=31：gzip格式
+        return compress_chunks(chunks, compressor), filename + extension, compressed_mimetype
+    if compression == 'zstd':
+        try:
+            zstandard = importlib.import_module('zstandard')
+        except ImportError:
+            raise ImportError("未找到 zstandard，zstd压缩导出请安装 zstandard")
+        compressor = zstandard.ZstdCompressor(level=EXPORT_ZSTD_LEVEL).compressobj()
+        return compress_chunks(chunks, compressor), filename + extension, compressed_mimetype
+    return zip_chunks(chunks, filename), os.path.splitext(filename)[0] + extension, compressed_mimetype
+
+
+def format_csv_cell(cell):
+    """CSV单元格格式化：None写为空串，日期时间统一格式"""
+    if cell is None:
+        return ''
+    if isinstance(cell, datetime):
+        return cell.strftime('%Y-%m-%d %H:%M:%S')
+    return str(cell)
+
+
+def generate_csv_stream(columns, rows, separator=',', include_header=True):
+    """逐批生成CSV字节块（先写BOM，解决Excel打开中文乱码）；rows 为已按csv格式转换的行"""
+    output = StringIO()
+    # 设置CSV写入器，处理中文和特殊字符
+    writer = csv.writer(output, delimiter=separator, 
+                       quoting=csv.QUOTE_MINIMAL,
+                       lineterminator='\n',
+                       escapechar='\\')
+    
+    yield b'\xef\xbb\xbf'
+    
+    # 写入表头
+    if include_header and columns:
+        writer.writerow(columns)
+    
+    # 写入数据行，每批编码后输出并清空缓冲区
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= EXPORT_BATCH_ROWS:
+            yield output.getvalue().encode('utf-8')
+            output.seek(0)
+            output.truncate(0)
+            pending = 0
+    
+    tail = output.getvalue()
+    if tail:
+        yield tail.encode('utf-8')
+
+
+# AWR风格HTML报告的头部（样式与标题）
+AWR_HTML_HEAD = '''<!DOCTYPE HTML PUBLIC "-//W3C//DTD HTML 4.01 Transitional//EN" "http://www.w3.org/TR/html4/loose.dtd">
+<html>
+<head>
+    <meta http-equiv="Content-Type" content="text/html; charset=UTF-8">
+    <title>SQL查询结果报告 - Oracle AWR风格</title>
+    <style type="text/css">
+        body {font:9pt Arial,Helvetica,sans-serif; color:black; background:White;}
+        p {font:9pt Arial,Helvetica,sans-serif; color:black; background:White;}
+        table,tr,td {font:9pt Arial,Helvetica,sans-serif; color:Black; background:#FFFFCC; padding:0px 0px 0px 0px; margin:0px 0px 0px 0px;}
+        th {font:bold 9pt Arial,Helvetica,sans-serif; color:White; background:#0066CC; padding:0px 0px 0px 0px;}
+        h1 {font:bold 12pt Arial,Helvetica,Geneva,sans-serif; color:#336699; background-color:White; border-bottom:1px solid #cccc99; margin-top:0pt; margin-bottom:0pt; padding:0px 0px 0px 0px;}
+        a {font:10pt Arial,Helvetica,sans-serif; color:#0066CC; margin-top:0pt; margin-bottom:0pt; vertical-align:top;text-decoration: none;}
+        a.link {font:10pt Arial,Helvetica,sans-serif; color:#0066CC; margin-top:0pt; margin-bottom:0pt; vertical-align:top;text-decoration: none;}
+        .awr-report { background:white; padding:0px; margin:0px;}
+        .report-header { font:bold 14pt Arial,Helvetica,Geneva,sans-serif; color:#336699; background-color:White; border-bottom:1px solid #cccc99; margin-top:0pt; margin-bottom:0pt; padding:10px 0px 10px 0px; text-align:center;}
+        .section-title { font:bold 10pt Arial,Helvetica,Geneva,sans-serif; color:white; background:#0066CC; margin:15px 0px 5px 0px; padding:5px;}
+        .summary-info { font:9pt Arial,Helvetica,sans-serif; margin:10px 0px 10px 0px;}
+        .summary-item { margin:5px 0px 5px 0px;}
+        .page-nav { font:9pt Arial,Helvetica,sans-serif; margin:10px 0px 10px 0px; text-align:center;}
+        .report-footer { font:8pt Arial,Helvetica,sans-serif; color:#666666; text-align:center; margin-top:20px; padding-top:5px; border-top:1px solid #cccc99;}
+    </style>
+</head>
+<body BGCOLOR="#C0C0C0">
+    <div class="awr-report">
+        <h1 class="report-header">SQL查询结果报告</h1>
+        <p class="summary-info">
+'''
+
+
+def format_html_cell(cell):
+    """HTML单元格格式化：None输出为&nbsp;，其余转义特殊字符"""
+    if cell is None:
+        return '&nbsp;'
+    return html_escape(str(cell))
+
+
+def generate_awr_html_stream(columns, rows, total_rows=None, page=None, page_nav=None):
+    """逐批生成类似Oracle AWR报告样式的HTML文本块（rows 为已按html格式转义的行）
+    - total_rows 未知（重新执行查询）时，记录数在报告末尾给出
+    - page 为分页导出时的页码，page_nav 在本页数据输出完后调用，返回 (上一页链接, 下一页链接)"""
+    summary = [f'            <span class="summary-item"><b>报告生成时间:</b> {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}</span><br>\n']
+    if total_rows is not None:
+        summary.append(f'            <span class="summary-item"><b>总记录数:</b> {total_rows}</span><br>\n')
+    summary.append(f'            <span class="summary-item"><b>总列数:</b> {len(columns)}</span><br>\n')
+    if page is not None:
+        summary.append(f'            <span class="summary-item"><b>页码:</b> {page}</span><br>\n')
+    header = ''.join(f'<th>{format_html_cell(col)}</th>' for col in columns)
+    yield AWR_HTML_HEAD + ''.join(summary) + f'''        </p>
+        <div class="section-title">查询结果</div>
+        <table WIDTH="100%" CELLPADDING="2" CELLSPACING="0" BORDER="1" BORDERCOLOR="#0066CC" BGCOLOR="#FFFFCC">
+            <thead>
+                <tr>{header}</tr>
+            </thead>
+            <tbody>
+'''
+    
+    # 表格内容，每批拼接后输出
+    batch = []
+    row_count = 0
+    for row in rows:
+        batch.append('<tr><td>' + '</td><td>'.join(row) + '</td></tr>\n')
+        row_count += 1
+        if len(batch) >= EXPORT_BATCH_ROWS:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+    
+    # 表格结束（分页导出时附带上一页/下一页链接）
+    tail = ['''            </tbody>
+        </table>
+''']
+    if page_nav is not None:
+        prev_href, next_href = page_nav()
+        links = []
+        if prev_href:
+            links.append(f'<a class="link" href="{html_escape(prev_href)}">&laquo; 上一页</a>')
+        links.append(f'第 {page} 页')
+        if next_href:
+            links.append(f'<a class="link" href="{html_escape(next_href)}">下一页 &raquo;</a>')
+        tail.append(f'        <div class="page-nav">{" | ".join(links)}</div>\n')
+    if total_rows is None:
+        tail.append(f'        <p class="summary-info"><span class="summary-item"><b>记录数:</b> {row_count}</span></p>\n')
+    tail.append(f'''        <div class="report-footer">
+            Generated by 数据报表工具 | {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+        </div>
+    </div>
+</body>
+</html>''')
+    yield ''.join(tail)
+
+
+def encode_html_stream(chunks):
+    """将HTML文本块编码为UTF-8字节块"""
+    for chunk in chunks:
+        yield chunk.encode('utf-8')
+
+
+def html_page_name(page):
+    """分页导出时各页的文件名"""
+    return f"page_{page:04d}.html"
+
+
+def write_paged_html_zip(file_path, columns, rows, page_rows, total_rows=None):
+    """按每页行数将结果拆分为多个互相链接的HTML文件，逐页流式写入zip，返回页数（空结果也输出一页）"""
+    rows = iter(rows)
+    next_row = next(rows, None)
+    page = 0
+    with zipfile.ZipFile(file_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        while page == 0 or next_row is not None:
+            page += 1
+            page_iter = chain([next_row], islice(rows, page_rows - 1)) if next_row is not None else iter(())
+            
+            def page_nav(page=page):
+                # 本页数据输出完后再预读一行，判断是否还有下一页
+                nonlocal next_row
+                next_row = next(rows, None)
+                prev_href = html_page_name(page - 1) if page > 1 else None
+                next_href = html_page_name(page + 1) if next_row is not None else None
+                return prev_href, next_href
+            
+            with zf.open(html_page_name(page), 'w') as f:
+                for chunk in generate_awr_html_stream(columns, page_iter, total_rows, page, page_nav):
+                    f.write(chunk.encode('utf-8'))
+    return page
+
+# ===================== Arrow/Parquet导出 =====================
+# 每个记录批次（Arrow RecordBatch / Parquet行组）的行数
+ARROW_BATCH_ROWS = 50000
+# 各格式支持的压缩算法（第一个为默认值，none表示不压缩）
+ARROW_COMPRESSIONS = {
+    'parquet': ('snappy', 'zstd', 'gzip', 'lz4', 'brotli', 'none'),
+    'arrow': ('lz4', 'zstd', 'none'),
+}
+# 导出格式 -> (文件扩展名, MIME类型, 显示名称)
+ARROW_FILE_TYPES = {
+    'parquet': ('.parquet', 'application/vnd.apache.parquet', 'Parquet'),
+    'arrow': ('.arrow', 'application/vnd.apache.arrow.file', 'Arrow'),
+}
+
+
+def import_pyarrow():
+    """按需导入pyarrow（与数据库驱动一样，未安装时只影响Arrow/Parquet导出）"""
+    try:
+        return importlib.import_module('pyarrow')
+    except ImportError:
+        raise ImportError("未找到 pyarrow，导出Arrow/Parquet格式请安装 pyarrow")
+
+
+def arrow_type_for(pa, column_type):
+    """由列类型 [类型, 精度, 小数位] 得到Arrow类型，类型未知时返回None（按值推断）"""
+    if not column_type:
+        return None
+    kind, precision, scale = column_type
+    if kind == 'decimal':
+        # 精度未知（如PostgreSQL不带精度的numeric）或超出decimal128范围时按值推断
+        if precision and 0 < precision <= 38 and scale is not None and 0 <= scale <= precision:
+            return pa.decimal128(precision, scale)
+        return None
+    return {
+        'int': pa.int64(), 'float': pa.float64(), 'bool': pa.bool_(), 'str': pa.string(), 'bytes': pa.binary(),
+        'datetime': pa.timestamp('us'), 'date': pa.date32(), 'time': pa.time64('us'),
+    }.get(kind)
+
+
+def format_arrow_text(value):
+    """无法按原类型写入的值转为字符串（二进制、时间与JSON输出一致）"""
+    value = format_json_cell(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value if isinstance(value, str) else str(value)
+
+
+def to_arrow_array(pa, values, arrow_type):
+    """将一列值转为Arrow数组：指定类型时按类型转换；否则按值推断，
+    推断失败、全为空值或推断为decimal（各批次精度可能不同）时转为字符串"""
+    if arrow_type is None:
+        try:
+            array = pa.array(values)
+        except (TypeError, ValueError):  # ArrowTypeError / ArrowInvalid
+            array = None
+        if array is not None and not pa.types.is_null(array.type) and not pa.types.is_decimal(array.type):
+            return array
+        arrow_type = pa.string()
+    if pa.types.is_string(arrow_type):
+        values = [value if value is None or isinstance(value, str) else format_arrow_text(value) for value in values]
+    elif pa.types.is_binary(arrow_type):
+        values = [bytes(value) if isinstance(value, memoryview) else value for value in values]
+    return pa.array(values, type=arrow_type)
+
+
+def unique_column_names(columns):
+    """同名列（如多表连接的id）依次追加序号，避免读取Arrow/Parquet文件时列名冲突"""
+    names = []
+    used = set()
+    for column in columns:
+        name = base = str(column)
+        suffix = 1
+        while name in used:
+            suffix += 1
+            name = f"{base}_{suffix}"
+        used.add(name)
+        names.append(name)
+    return names
+
+
+def write_arrow_file(file_path, file_format, columns, rows, column_types=None, compression=None):
+    """按记录批次将结果行写入Parquet文件或Arrow IPC文件，返回记录数。
+    - column_types 为 DatabaseDriver.column_types 得到的列类型，未知类型的列由第一批数据推断，之后各批次沿用同一schema
+    - compression 为 ARROW_COMPRESSIONS 中的压缩算法"""
+    pa = import_pyarrow()
+    names = unique_column_names(columns)
+    column_types = column_types if column_types and len(column_types) == len(columns) else [None] * len(columns)
+    arrow_types = [arrow_type_for(pa, column_type) for column_type in column_types]
+    compression = None if compression == 'none' else compression
+    
+    rows = iter(rows)
+    writer = None
+    row_count = 0
+    try:
+        while True:
+            batch = list(islice(rows, ARROW_BATCH_ROWS))
+            if not batch and writer is not None:
+                break
+            values = list(zip(*batch)) if batch else [()] * len(names)
+            arrays = []
+            for index, name in enumerate(names):
+                try:
+                    arrays.append(to_arrow_array(pa, list(values[index]), arrow_types[index]))
+                except (TypeError, ValueError) as e:
+                    raise ValueError(f"列 {name} 的值无法转换为 {arrow_types[index]} 类型：{e}")
+            record_batch = pa.RecordBatch.from_arrays(arrays, names=names)
+            if writer is None:
+                # 第一批确定schema，之后按同一schema转换
+                arrow_types = [field.type for field in record_batch.schema]
+                if file_format == 'parquet':
+                    pq = importlib.import_module('pyarrow.parquet')
+                    writer = pq.ParquetWriter(file_path, record_batch.schema, compression=compression or 'none')
+                else:
+                    options = pa.ipc.IpcWriteOptions(compression=compression)
+                    writer = pa.ipc.new_file(file_path, record_batch.schema, options=options)
+            if batch:
+                if file_format == 'parquet':
+                    writer.write_table(pa.Table.from_batches([record_batch]))
+                else:
+                    writer.write_batch(record_batch)
+                row_count += len(batch)
+            if len(batch) < ARROW_BATCH_ROWS:
+                break
+    finally:
+        if writer is not None:
+            writer.close()
+    return row_count
+
+# ===================== 后台导出任务 =====================
+# 后台导出支持的格式 -> (文件扩展名, MIME类型, 显示名称)
+EXPORT_JOB_FORMATS = {
+    'excel': ('.xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'Excel'),
+    'csv': ('.csv', 'text/csv; charset=utf-8-sig', 'CSV'),
+    'html': ('.html', 'text/html; charset=utf-8', 'HTML'),
+    **ARROW_FILE_TYPES,
+}
+
+
+class ExportJob(QueryJob):
+    """后台导出任务：在查询任务工作线程中将查询结果写入应用临时目录，完成后通过 /export_job_download 下载；
+    rows_fetched 为已写出的行数，每批检查是否已取消"""
+    kind = 'export'
+
+    def __init__(self, query_id, source, export_format, filename, options, db_id):
+        super().__init__([], 1, 1, db_id)
+        self.query_id = query_id
+        self.source = source
+        self.export_format = export_format
+        self.filename = filename
+        self.options = options  # header_color/include_header/separator/compression
+        self.total_rows = None  # 重新执行查询导出时事先未知
+        self.file_path = None
+        self.file_size = None
+
+    @property
+    def label(self):
+        return f"导出{EXPORT_JOB_FORMATS[self.export_format][2]}：{self.filename}"
+
+    @property
+    def mimetype(self):
+        compression = self.options.get('compression', 'none')
+        if self.export_format in ('csv', 'html') and compression != 'none':
+            return EXPORT_COMPRESSIONS[compression][1]
+        return EXPORT_JOB_FORMATS[self.export_format][1]
+
+    def track(self, rows):
+        """逐行交给写出函数并更新进度，每 EXPORT_BATCH_ROWS 行检查一次是否已取消"""
+        for row in rows:
+            yield row
+            self.rows_fetched += 1
+            if self.rows_fetched % EXPORT_BATCH_ROWS == 0 and self.cancel_requested:
+                raise QueryCancelled("导出已取消")
+
+    def execute(self):
+        row_format = 'python' if self.export_format in ARROW_FILE_TYPES else self.export_format
+        export_source = open_export_source(self.query_id, self.source, row_format)
+        if export_source is None:
+            return {"status": "error", "message": "查询结果不存在或已过期！请重新执行查询。"}
+        self.total_rows = export_source.row_count
+        file_path = create_export_temp_file(os.path.splitext(self.filename)[1])
+        try:
+            self.write(file_path, export_source)
+        except Exception as e:
+            remove_temp_file(file_path)
+            if self.cancel_requested:
+                logging.info(f"后台导出已取消：任务ID={self.job_id} | 已写出行数：{self.rows_fetched}")
+                return {"status": "error", "message": "导出已取消", "cancelled": True}
+            logging.error(f"后台导出失败：任务ID={self.job_id} | 查询ID={self.query_id} | {str(e)}")
+            return {"status": "error", "message": f"导出失败：{str(e)}"}
+        finally:
+            export_source.close()
+        self.file_path = file_path
+        self.file_size = os.path.getsize(file_path)
+        logging.info(f"后台导出完成：任务ID={self.job_id} | 查询ID={self.query_id} | 记录数：{self.rows_fetched} | 文件名：{self.filename} | 大小：{self.file_size}")
+        return {
+            "status": "success",
+            "message": f"导出完成！共 {self.rows_fetched} 行",
+            "rows": self.rows_fetched,
+            "filename": self.filename,
+            "file_size": self.file_size,
+            "download_url": f"/export_job_download?job_id={self.job_id}",
+        }
+
+    def write(self, file_path, export_source):
+        """按导出格式写出文件（与对应导出接口的输出相同）"""
+        columns, options = export_source.columns, self.options
+        rows = self.track(export_source)
+        if self.export_format == 'excel':
+            write_excel_workbook(file_path, columns, rows, options['header_color'], options['include_header'])
+            return
+        if self.export_format in ARROW_FILE_TYPES:
+            write_arrow_file(file_path, self.export_format, columns, rows, export_source.column_types,
+                             options['compression'])
+            return
+        if self.export_format == 'csv':
+            chunks = generate_csv_stream(columns, rows, options['separator'], options['include_header'])
+        else:
+            chunks = encode_html_stream(generate_awr_html_stream(columns, rows, export_source.row_count))
+        chunks, _, _ = compress_export_stream(chunks, self.filename, self.mimetype, options['compression'])
+        with open(file_path, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+
+    def snapshot(self):
+        progress = None
+        if self.status == JOB_SUCCEEDED:
+            progress = 100
+        elif self.total_rows:
+            progress = min(99, int(self.rows_fetched * 100 / self.total_rows))
+        return {
+            **super().snapshot(),
+            "format": self.export_format,
+            "filename": self.filename,
+            "total_rows": self.total_rows,
+            "progress": progress,
+            "file_size": self.file_size,
+        }
+
+
+# ===================== 多数据库并发查询 =====================
+# 合并结果中来源数据库列的列名
+FANOUT_SOURCE_COLUMN = 'source_db'
+# 单次并发查询最多涉及的数据库数
+FANOUT_MAX_DATABASES = 64
+# 同时执行的数据库数上限（线程池大小）
+FANOUT_MAX_WORKERS = 16
+# 检查各数据库是否超时的间隔（秒）
+FANOUT_POLL_INTERVAL = 0.2
+# 超时后发出取消请求，再等待该秒数仍未结束的数据库不再等待（连接在执行结束后归还）
+FANOUT_CANCEL_GRACE = 5
+# 单个数据库的执行状态
+FANOUT_SUCCESS = 'success'
+FANOUT_ERROR = 'error'
+FANOUT_TIMEOUT = 'timeout'
+# 单个数据库执行结果的快照（合并和汇总只读取快照，不再受执行线程影响）
+FanoutResult = namedtuple('FanoutResult', ['db_id', 'name', 'status', 'message', 'columns', 'column_types',
+                                           'rows', 'elapsed_ms'])
+
+
+class FanoutNode:
+    """并发查询中单个数据库的执行：执行期间登记所用连接，超时后通过驱动的取消机制中断"""
+
+    def __init__(self, db_config):
+        self.db_config = db_config
+        self.db_id = db_config.get('id')
+        self.name = db_config.get('name') or self.db_id
+        self.status = None
+        self.message = None
+        self.columns = None
+        self.column_types = None
+        self.rows = ()
+        self.started_at = None
+        self.elapsed_ms = None
+        self.timed_out = False
+        self.cancelled_at = None
+        self.abandoned = False
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def run(self, sql, timeout):
+        """在工作线程中执行查询并读取全部结果（会话语句超时设为 timeout，结束后恢复）；
+        结果在锁内一次性写入，已放弃等待（abandon）的数据库不再写入"""
+        self.started_at = time.monotonic()
+        driver = get_db_driver(self.db_config.get('type', 'postgresql'))
+        columns = column_types = None
+        rows = ()
+        message = None
+        try:
+            with QUERY_ADMISSION.admit(self.db_id):
+                pool = CONNECTION_POOLS.get_pool(self.db_config)
+                conn = pool.acquire()
+                try:
+                    with self._lock:
+                        if self.timed_out:
+                            raise QueryCancelled("执行超时")
+                        self._conn = conn
+                    driver.set_statement_timeout(conn, timeout)
+                    cursor = conn.cursor()
+                    cursor.execute(sql)
+                    if not cursor.description:
+                        raise ValueError("语句没有返回结果集")
+                    columns = [desc[0] for desc in cursor.description]
+                    column_types = driver.column_types(cursor.description)
+                    rows = cursor.fetchall()
+                    cursor.close()
+                finally:
+                    with self._lock:
+                        self._conn = None
+                    try:
+                        driver.set_statement_timeout(conn, DB_TIMEOUT_CONFIG['statement_timeout'])
+                    except Exception:
+                        pool.discard(conn)
+                    else:
+                        pool.release(conn)
+            status = FANOUT_SUCCESS
+        except Exception as e:
+            if self.timed_out:
+                status, message = FANOUT_TIMEOUT, f"执行超过 {timeout} 秒，已取消"
+            else:
+                status = FANOUT_ERROR
+                message = str(e) if isinstance(e, QueryAdmissionRejected) else describe_sql_error(e)
+            columns = column_types = None
+            rows = ()
+        with self._lock:
+            if self.abandoned:
+                return
+            self.status, self.message = status, message
+            self.columns, self.column_types, self.rows = columns, column_types, rows
+            self.elapsed_ms = round((time.monotonic() - self.started_at) * 1000, 1)
+
+    def cancel(self):
+        """超时：标记后向数据库发送取消请求（尚未借到连接时不再执行）"""
+        with self._lock:
+            self.timed_out = True
+            self.cancelled_at = time.monotonic()
+            if self._conn is None:
+                return
+            try:
+                get_db_driver(self.db_config.get('type', 'postgresql')).cancel(self._conn, self.db_config)
+            except Exception as e:
+                logging.warning(f"取消并发查询失败：数据库 {self.name} | {str(e)}")
+
+    def abandon(self):
+        """取消后仍未结束：不再等待，按超时返回（执行线程结束后自行归还连接，结果不再写入）"""
+        with self._lock:
+            if self.status is not None:
+                return  # 恰好已执行结束
+            self.abandoned = True
+            self.status, self.message = FANOUT_TIMEOUT, "执行超时，取消后未及时结束"
+            self.elapsed_ms = round((time.monotonic() - self.started_at) * 1000, 1)
+
+    def snapshot(self):
+        """在锁内取当前执行结果；等待结束后调用，之后执行线程不会再修改（见 run/abandon）"""
+        with self._lock:
+            self.abandoned = True
+            return FanoutResult(self.db_id, self.name, self.status, self.message, self.columns,
+                                self.column_types, self.rows, self.elapsed_ms)
+
+
+def fanout_summary(result):
+    """单个数据库的执行状态（响应中的 nodes）"""
+    return {
+        "db_id": result.db_id,
+        "name": result.name,
+        "status": result.status,
+        "row_count": len(result.rows),
+        "elapsed_ms": result.elapsed_ms,
+        "message": result.message,
+    }
+
+
+def resolve_fanout_databases(db_ids, db_tag):
+    """并发查询的数据库列表：按ID列表（保持顺序、去重）或按标签，返回 (数据库配置列表, 错误信息)"""
+    if db_tag:
+        databases = get_databases_by_tag(db_tag)
+        if not databases:
+            return None, f"没有标签为 {db_tag} 的数据库！"
+    else:
+        databases = []
+        for db_id in dict.fromkeys(db_ids):
+            db_config = get_database_by_id(db_id)
+            if not db_config:
+                return None, f"未找到数据库配置：{db_id}"
+            databases.append(db_config)
+    if len(databases) > FANOUT_MAX_DATABASES:
+        return None, f"并发查询最多涉及 {FANOUT_MAX_DATABASES} 个数据库！"
+    return databases, None
+
+
+def execute_fanout_query(sql, databases, page, page_size, timeout):
+    """在多个数据库上并发执行同一只读查询，合并结果（首列为来源数据库名称）存入结果缓存并返回请求页；
+    各数据库的状态和耗时在 nodes 中返回，列与第一个成功的数据库不一致的结果不合并"""
+    nodes = [FanoutNode(db_config) for db_config in databases]
+    executor = ThreadPoolExecutor(max_workers=min(len(nodes), FANOUT_MAX_WORKERS), thread_name_prefix='fanout')
+    try:
+        pending = {executor.submit(node.run, sql, timeout): node for node in nodes}
+        while pending:
+            done, _ = wait_futures(pending, timeout=FANOUT_POLL_INTERVAL)
+            for future in done:
+                del pending[future]
+            now = time.monotonic()
+            for future, node in list(pending.items()):
+                if node.started_at is None:
+                    continue
+                if node.cancelled_at is None and now - node.started_at > timeout:
+                    node.cancel()
+                elif node.cancelled_at is not None and now - node.cancelled_at > FANOUT_CANCEL_GRACE:
+                    node.abandon()
+                    del pending[future]
+    finally:
+        executor.shutdown(wait=False)
+    
+    # 以第一个成功的数据库的列为准合并结果（只使用快照，放弃等待的数据库稍后执行结束也不影响）
+    node_results = [node.snapshot() for node in nodes]
+    first = next((result for result in node_results if result.status == FANOUT_SUCCESS), None)
+    for i, result in enumerate(node_results):
+        if result.status == FANOUT_SUCCESS and result.columns != first.columns:
+            node_results[i] = result._replace(status=FANOUT_ERROR, rows=(),
+                                              message=f"结果列与数据库 {first.name} 不一致，未合并")
+    summaries = [fanout_summary(result) for result in node_results]
+    failed_count = sum(1 for result in node_results if result.status != FANOUT_SUCCESS)
+    logging.info(f"并发查询完成：{sql[:100]}... | 数据库数：{len(nodes)} | 失败：{failed_count} | "
+                 + ' | '.join(f"{result.name}:{result.status}/{result.elapsed_ms}ms" for result in node_results))
+    if first is None:
+        return {"status": "error", "message": "所有数据库均执行失败！", "nodes": summaries, "failed_count": failed_count}
+    columns, column_types = first.columns, first.column_types
+    
+    # 按列拼接各数据库的结果（与 ColumnarResult.from_rows 相同的列式构造）
+    merged = [[] for _ in range(len(columns) + 1)]
+    for result in node_results:
+        if result.status != FANOUT_SUCCESS or not result.rows:
+            continue
+        merged[0].extend([result.name] * len(result.rows))
+        for values, column_values in zip(merged[1:], zip(*result.rows)):
+            values.extend(column_values)
+    # 各数据库的原始行已拼接，释放
+    node_results = first = None
+    for node in nodes:
+        node.rows = ()
+    total_count = len(merged[0])
+    full_results = ColumnarResult([ResultColumn.build(values) for values in merged], total_count)
+    merged_columns = [FANOUT_SOURCE_COLUMN, *columns]
+    
+    start = (page - 1) * page_size
+    results = full_results.rows(start, start + page_size, 'json')
+    query_id = str(uuid.uuid4())
+    # 合并结果无法重新执行，只能从缓存导出
+    QUERY_RESULTS.put(query_id, merged_columns, full_results,
+                      column_types=[['str', None, None], *column_types])
+    return {
+        "status": "success",
+        "columns": merged_columns,
+        "results": results,
+        "count": len(results),
+        "total_count": total_count,
+        "page": page,
+        "page_size": page_size,
+        "total_page": (total_count + page_size - 1) // page_size,
+        "query_id": query_id,
+        "fanout": True,
+        "nodes": summaries,
+        "failed_count": failed_count,
+    }
+
+
+# ===================== 后台维护 =====================
+# 导出临时文件的最长保留时间（秒），正常情况下下载结束即删除，此处兜底清理未完成的下载
+EXPORT_TEMP_FILE_TTL = 7200
+
+
+def create_export_temp_file(suffix, prefix='SQL查询结果_'):
+    """在应用专用临时目录中创建导出（或导入上传）临时文件，并登记到后台维护的过期队列"""
+    ensure_private_dir(EXPORT_TEMP_DIR)
+    fd, file_path = tempfile.mkstemp(prefix=prefix, suffix=suffix, dir=EXPORT_TEMP_DIR)
+    os.close(fd)
+    MAINTENANCE.track_file(file_path, time.time() + EXPORT_TEMP_FILE_TTL)
+    return file_path
+
+
+class MaintenanceJanitor:
+    """后台维护线程：按 app_cleanup_interval 间隔清理过期查询结果、游标、任务、空闲连接和临时文件；
+    临时文件按过期时间放入最小堆，每次只处理已到期的文件，不扫描目录"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._file_heap = []  # (过期时间, 文件路径)
+        self._pid = None
+        self._wakeup = threading.Event()
+        self.stats = defaultdict(int)
+        self.last_run = None
+        self.last_duration = None
+        self.last_error = None
+
+    @property
+    def interval(self):
+        try:
+            return max(1, int(APP_CONFIG.get('app_cleanup_interval', DEFAULT_APP_CONFIG['app_cleanup_interval'])))
+        except (TypeError, ValueError):
+            return DEFAULT_APP_CONFIG['app_cleanup_interval']
+
+    def track_file(self, file_path, expire_at):
+        with self._lock:
+            heapq.heappush(self._file_heap, (expire_at, file_path))
+
+    def ensure_started(self):
+        """首次请求时启动维护线程（按进程启动，多进程部署时每个工作进程各有一个）"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._file_heap = []
+        self._track_leftover_files()
+        threading.Thread(target=self._loop, name='maintenance', daemon=True).start()
+
+    def _track_leftover_files(self):
+        """登记进程启动前遗留在应用临时目录中的文件（只在启动时扫描一次应用专用目录）"""
+        for directory, ttl in ((EXPORT_TEMP_DIR, EXPORT_TEMP_FILE_TTL), (RESULT_SPILL_DIR, RESULT_EXPIRE_TIME)):
+            try:
+                with os.scandir(directory) as it:
+                    for item in it:
+                        if item.is_file():
+                            self.track_file(item.path, item.stat().st_mtime + ttl)
+            except FileNotFoundError:
+                continue
+            except Exception as e:
+                logging.warning(f"登记遗留临时文件失败：{directory} | {str(e)}")
+
+    def _loop(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.run_once()
+
+    def run_once(self):
+        """执行一轮清理，返回本轮各项清理数量"""
+        start = time.monotonic()
+        counts = {}
+        tasks = (
+            ('query_results', lambda: len(QUERY_RESULTS.expire())),
+            ('result_cache', RESULT_CACHE.expire),
+            ('held_cursors', HELD_CURSORS.close_expired),
+            ('query_jobs', QUERY_JOBS.expire),
+            ('idle_connections', CONNECTION_POOLS.evict_idle),
+            ('temp_files', self._remove_expired_files),
+        )
+        for name, task in tasks:
+            try:
+                counts[name] = task() or 0
+            except Exception as e:
+                self.stats['errors'] += 1
+                self.last_error = f"{name}: {str(e)}"
+                logging.error(f"后台清理失败：{name} | {str(e)}")
+                continue
+            self.stats[name] += counts[name]
+        self.stats['runs'] += 1
+        self.last_run = time.time()
+        self.last_duration = time.monotonic() - start
+        if any(counts.values()):
+            logging.info(f"后台清理完成：{counts} | 耗时：{self.last_duration:.3f}秒")
+        return counts
+
+    def _remove_expired_files(self):
+        now = time.time()
+        expired = []
+        with self._lock:
+            while self._file_heap and self._file_heap[0][0] <= now:
+                expired.append(heapq.heappop(self._file_heap)[1])
+        removed = 0
+        for file_path in expired:
+            if os.path.exists(file_path):
+                remove_temp_file(file_path)
+                removed += 1
+        return removed
+
+    def snapshot(self):
+        with self._lock:
+            tracked_files = len(self._file_heap)
+        return {
+            "interval": self.interval,
+            "running": self._pid == os.getpid(),
+            "last_run": datetime.fromtimestamp(self.last_run).strftime('%Y-%m-%d %H:%M:%S') if self.last_run else None,
+            "last_duration": round(self.last_duration, 3) if self.last_duration is not None else None,
+            "last_error": self.last_error,
+            "tracked_files": tracked_files,
+            **dict(self.stats),
+        }
+
+
+MAINTENANCE = MaintenanceJanitor()
+app.before_request(MAINTENANCE.ensure_started)
+
+
+# 应用配置文件状态：多进程部署时其他工作进程保存配置后，本进程据此重新加载
+APP_CONFIG_SIGNATURE = get_file_signature(APP_CONFIG_FILE)
+APP_CONFIG_CHECKED_AT = time.monotonic()
+
+
+def sync_app_config():
+    """按 DB_CONFIG_CHECK_INTERVAL 间隔检查应用配置文件，被修改时重新加载"""
+    global APP_CONFIG, DB_TIMEOUT_CONFIG, APP_CONFIG_SIGNATURE, APP_CONFIG_CHECKED_AT
+    now = time.monotonic()
+    if now - APP_CONFIG_CHECKED_AT < DB_CONFIG_CHECK_INTERVAL:
+        return
+    APP_CONFIG_CHECKED_AT = now
+    signature = get_file_signature(APP_CONFIG_FILE)
+    if signature != APP_CONFIG_SIGNATURE:
+        APP_CONFIG_SIGNATURE = signature
+        APP_CONFIG = load_app_config()
+        DB_TIMEOUT_CONFIG = get_db_timeout_config()
+        logging.info("检测到应用配置文件变更，已重新加载")
+
+
+app.before_request(sync_app_config)
+
+
+# 按 Accept-Encoding 协商gzip压缩的JSON接口（返回查询结果分页，响应较大）
+GZIP_RESPONSE_ENDPOINTS = {'execute_sql', 'query_job_result'}
+# 小于该字节数的响应不压缩
+GZIP_MIN_RESPONSE_SIZE = 1024
+
+
+def gzip_json_response(response):
+    """查询结果分页等JSON响应在客户端接受gzip时压缩后返回（Content-Encoding: gzip）"""
+    if (request.endpoint not in GZIP_RESPONSE_ENDPOINTS or response.direct_passthrough
+            or response.mimetype != 'application/json' or 'Content-Encoding' in response.headers):
+        return response
+    response.vary.add('Accept-Encoding')
+    if not request.accept_encodings['gzip']:
+        return response
+    data = response.get_data()
+    if len(data) < GZIP_MIN_RESPONSE_SIZE:
+        return response
+    response.set_data(gzip.compress(data, EXPORT_GZIP_LEVEL))
+    response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+app.after_request(gzip_json_response)
+
+# ===================== 路由 =====================
+@app.route('/')
 def index():
     """首页"""
-    # 每次访问首页清理一次过期数据
-    clean_expired_data()
     # 传递数据库配置和列表到前端
     config = load_multi_db_config()
     return render_template('index.html', 
@@ -1157,8 +4909,7 @@ def save_db_config():
                             # 如果已经加密，则保持原样
                             db_config['password'] = raw_password
                 
-                with open(DB_CONFIG_FILE, 'w', encoding='utf-8') as f:
-                    json.dump(config, f, ensure_ascii=False, indent=2)
+                write_db_config_file(config)
                 
                 logging.info("多数据库配置已更新")
                 return jsonify({"status": "success", "message": "多数据库配置保存成功！"})
@@ -1242,8 +4993,7 @@ def save_db_config():
                         if not db.get('password'):
                             db['password'] = existing_passwords[db['id']]
                 
-                with open(DB_CONFIG_FILE, 'w', encoding='utf-8') as f:
-                    json.dump(existing_config, f, ensure_ascii=False, indent=2)
+                write_db_config_file(existing_config)
                         
                 logging.info(f"数据库配置已更新：{db_type}://{config['host']}:{config['port']}/{config['database']}")
                 return jsonify({"status": "success", "message": "配置保存成功！"})
@@ -1263,152 +5013,15 @@ def test_db_connection():
             return jsonify({"status": "error", "message": "缺少必要的数据库配置项！"})
         
         db_type = config.get('type', 'postgresql').lower()
-        
-        # 数据库驱动映射表
-        DRIVER_INFO = {
-            'postgresql': 'PostgreSQL (psycopg2)',
-            'mysql': 'MySQL (PyMySQL)',
-            'oracle': 'Oracle (cx_Oracle)',
-            'kingbase': '人大金仓 (psycopg2)',
-            'tidb': 'TiDB (PyMySQL)',
-            'oceanbase': 'OceanBase (PyMySQL)',
-            'highgo': '瀚高数据库 (psycopg2)',
-            'gauss': '华为高斯数据库 (psycopg2)',
-            'uxdb': '优图数据库 (psycopg2)',
-            'vastbase': '海量数据库 (psycopg2)',
-            'yashandb': '崖山数据库 (yasdb)',
-            'shentong': '神通数据库 (cx_Oracle)',
-            'greatdb': '巨杉数据库 (PyMySQL)',
-            'dm': '达梦数据库 (dm_python)',
-            'gbase': '南大通用数据库 (psycopg2)',
-            'vanward': '万里数据库 (psycopg2)'
-        }
-        
-        driver_info = DRIVER_INFO.get(db_type, f'未知驱动 ({db_type})')
+        if db_type not in DB_DRIVERS:
+            return jsonify({"status": "error", "message": f"不支持的数据库类型：{db_type}"})
+        driver = DB_DRIVERS[db_type]
+        driver_info = driver.driver_info
         logging.info(f"测试数据库连接 [{config.get('database')}] 使用驱动: {driver_info}")
         
-        if db_type == 'postgresql':
-            # 修复：connect_timeout 作为独立参数传入，而非options
-            # 注意：port需要转为整数，connect_timeout单位是秒
-            import psycopg2
-            # 解密密码
-            decrypted_password = decrypt_password(config.get('password', ''))
-            conn = psycopg2.connect(
-                host=config['host'],
-                port=int(config['port']),  # 关键：端口必须是整数
-                user=config['user'],
-                password=decrypted_password,
-                database=config['database'],
-                connect_timeout=5  # 独立参数设置5秒连接超时
-            )
-            conn.close()
-        elif db_type == 'mysql':
-            import pymysql
-            # 解密密码
-            decrypted_password = decrypt_password(config.get('password', ''))
-            conn = pymysql.connect(
-                host=config['host'],
-                port=int(config['port']),
-                user=config['user'],
-                password=decrypted_password,
-                database=config['database'],
-                charset='utf8mb4',
-                connect_timeout=5
-            )
-            conn.close()
-        elif db_type == 'oracle':
-            import cx_Oracle
-            # 解密密码
-            decrypted_password = decrypt_password(config.get('password', ''))
-            dsn = cx_Oracle.makedsn(config['host'], int(config['port']), service_name=config['database'])
-            conn = cx_Oracle.connect(
-                user=config['user'],
-                password=decrypted_password,
-                dsn=dsn,
-                encoding="UTF-8",
-                timeout=5
-            )
-            conn.close()
-        elif db_type == 'kingbase':  # 人大金仓
-            import psycopg2 as kingbase_psycopg2
-            # 解密密码
-            decrypted_password = decrypt_password(config.get('password', ''))
-            conn = kingbase_psycopg2.connect(
-                host=config['host'],
-                port=int(config['port']),
-                user=config['user'],
-                password=decrypted_password,
-                database=config['database'],
-                connect_timeout=5
-            )
-            conn.close()
-        elif db_type in ['tidb', 'oceanbase', 'greatdb']:  # TiDB、OceanBase、GreatDB兼容MySQL协议
-            import pymysql
-            # 解密密码
-            decrypted_password = decrypt_password(config.get('password', ''))
-            conn = pymysql.connect(
-                host=config['host'],
-                port=int(config['port']),
-                user=config['user'],
-                password=decrypted_password,
-                database=config['database'],
-                charset='utf8mb4',
-                connect_timeout=5
-            )
-            conn.close()
-        elif db_type in ['highgo', 'gauss', 'uxdb', 'vastbase', 'gbase', 'vanward']:  # PostgreSQL兼容的国产数据库
-            import psycopg2
-            # 解密密码
-            decrypted_password = decrypt_password(config.get('password', ''))
-            conn = psycopg2.connect(
-                host=config['host'],
-                port=int(config['port']),
-                user=config['user'],
-                password=decrypted_password,
-                database=config['database'],
-                connect_timeout=5
-            )
-            conn.close()
-        elif db_type == 'yashandb':  # 崖山数据库使用专用yasdb驱动
-            import yasdb
-            # 解密密码
-            decrypted_password = decrypt_password(config.get('password', ''))
-            # 构造DSN连接字符串
-            dsn = f"{config['host']}:{config['port']}"
-            conn = yasdb.connect(
-                dsn=dsn,
-                user=config['user'],
-                password=decrypted_password,
-            )
-            conn.close()
-        elif db_type == 'shentong':  # 神通数据库兼容Oracle协议
-            import cx_Oracle
-            # 解密密码
-            decrypted_password = decrypt_password(config.get('password', ''))
-            dsn = cx_Oracle.makedsn(config['host'], int(config['port']), service_name=config['database'])
-            conn = cx_Oracle.connect(
-                user=config['user'],
-                password=decrypted_password,
-                dsn=dsn,
-                encoding="UTF-8",
-                timeout=5
-            )
-            conn.close()
-        elif db_type == 'dm':  # 达梦数据库
-            import dm_python as dm
-            # 解密密码
-            decrypted_password = decrypt_password(config.get('password', ''))
-            conn = dm.connect(
-                host=config['host'],
-                port=int(config['port']),
-                user=config['user'],
-                password=decrypted_password,
-                database=config['database'],
-                connect_timeout=5
-            )
-            conn.close()
-        else:
-            return jsonify({"status": "error", "message": f"不支持的数据库类型：{db_type}"})
+        # 与连接池使用同一驱动适配器建立连接（不入池），同时验证会话超时设置
+        conn = create_db_connection(config)
+        conn.close()
         
         logging.info(f"数据库连接测试成功：{db_type}://{config['host']}:{config['port']}/{config['database']} (使用 {driver_info})")
         return jsonify({"status": "success", "message": f"数据库连接成功！使用驱动: {driver_info}"})
@@ -1538,78 +5151,40 @@ def execute_sql():
         page = int(request.form.get('page', 1))
         page_size = int(request.form.get('page_size', 50))
         db_id = request.form.get('db_id', None)  # 新增：数据库ID
+        # 分页模式：memory（全量读取后内存分页，默认）或 cursor（服务端游标按页读取）
+        paging_mode = request.form.get('paging_mode', 'memory').lower()
+        query_id = request.form.get('query_id') or None  # 游标分页模式下继续读取的查询ID
+        # 多语句脚本选项：是否在一个事务中执行、出错时停止还是继续
+        transaction, on_error = parse_script_options(request.form)
+        # 只读查询是否使用语句结果缓存
+        use_cache = request.form.get('use_cache', 'false').lower() == 'true'
+        # 多数据库并发查询：db_ids（逗号分隔或多个同名参数）或 db_tag（带有该标签的全部数据库）
+        fanout_ids = [db for value in request.form.getlist('db_ids') for db in value.split(',') if db.strip()]
+        fanout_tag = request.form.get('db_tag', '').strip()
+        if fanout_ids or fanout_tag:
+            return execute_fanout_request(sql, page, page_size, [db.strip() for db in fanout_ids], fanout_tag)
         
-        # 输入验证
-        is_valid, message = validate_input(sql, "SQL语句", max_length=10000)
-        if not is_valid:
-            return jsonify({"status": "error", "message": message})
-        
-        # 额外验证SQL语句的安全性 - 仅检查明确的危险操作
-        # 注意：SELECT, INSERT, UPDATE, DELETE 是正常操作，不应阻止
-        dangerous_keywords = [
-            # 数据库/表结构删除操作
-            r"(?i)\b(drop\s+table|truncate\s+table)\b",
-            r"(?i)\b(drop\s+(?!index|procedure|view|trigger|function)\w+)\b",  # 排除合法的drop操作如drop index
-            r"(?i)\b(shutdown|backup\s+database|restore\s+database)\b",
-            # 系统级危险操作
-            r"(?i)(exec\s*\(|execute\s+\(|sp_|xp_)[^']*;",  # exec等危险函数，但允许在字符串中出现
-            # 权限管理操作
-            r"(?i)\b(grant\s+\w+\s+to|revoke\s+\w+\s+from)\b",
-        ]
-        
-        for pattern in dangerous_keywords:
-            if re.search(pattern, sql):
-                logging.warning(f"检测到潜在危险SQL操作: {sql[:100]}...")
-                return jsonify({"status": "error", "message": "SQL语句包含被禁止的操作！"})
+        dialect = get_sql_dialect(db_id)
+        error = validate_sql_request(sql, page, page_size, dialect)
+        if error:
+            return jsonify({"status": "error", "message": error})
         
-        # 参数校验
-        if not sql:
-            return jsonify({"status": "error", "message": "请输入SQL语句！"})
-        if page < 1 or page_size < 1 or page_size > 1000:
-            return jsonify({"status": "error", "message": "页码需≥1，每页条数需1-1000之间！"})
+        # 按数据库方言分割SQL语句
+        sql_statements = split_sql_script(sql, dialect)
+        if not sql_statements:
+            return jsonify({"status": "error", "message": "SQL语句不能为空！"})
         
-        # 分割SQL语句
-        sql_statements = split_sql_statements(sql)
-        
-        if len(sql_statements) == 1:
-            # 单条语句执行（原有逻辑）
-            return execute_single_statement(sql_statements[0], page, page_size, db_id)
-        else:
-            # 多条语句执行
-            results = []
-            for i, stmt in enumerate(sql_statements):
-                stmt = stmt.strip()
-                if stmt:  # 忽略空语句
-                    try:
-                        result = execute_single_statement(stmt, page, page_size, db_id)
-                        if result.get('status') == 'success':
-                            result['statement_index'] = i + 1
-                            result['original_sql'] = stmt[:100] + "..." if len(stmt) > 100 else stmt
-                            results.append(result)
-                        else:
-                            result['statement_index'] = i + 1
-                            result['original_sql'] = stmt[:100] + "..." if len(stmt) > 100 else stmt
-                            results.append(result)
-                            # 如果是查询语句出错，继续执行下一条
-                            if 'SELECT' in stmt.upper() or 'EXPLAIN' in stmt.upper():
-                                continue
-                            else:
-                                break  # 非查询语句出错则停止
-                    except Exception as e:
-                        results.append({
-                            "status": "error",
-                            "message": f"第{i+1}条语句执行失败: {str(e)}",
-                            "original_sql": stmt[:100] + "..." if len(stmt) > 100 else stmt,
-                            "statement_index": i + 1
-                        })
-            
-            return jsonify({
-                "status": "success",
-                "message": f"共执行{len(results)}条语句",
-                "results": results,
-                "is_batch": True
-            })
+        # 准入控制：超出并发上限时排队，排队已满或等待超时则拒绝
+        with QUERY_ADMISSION.admit(db_id):
+            if len(sql_statements) == 1 and paging_mode == 'cursor':
+                # 游标分页：只读取请求的页，后续页从持有的游标继续读取
+                return execute_paged_statement(sql_statements[0].text, page, page_size, db_id, query_id)
+            return jsonify(execute_sql_statements(sql_statements, page, page_size, db_id,
+                                                  transaction=transaction, on_error=on_error, use_cache=use_cache))
     
+    except QueryAdmissionRejected as e:
+        logging.warning(f"SQL执行被拒绝：{str(e)} | 数据库：{db_id or 'default'}")
+        return jsonify({"status": "error", "message": str(e)}), e.status_code
     except ValueError as e:
         logging.error(f"参数转换失败：{str(e)}")
         return jsonify({"status": "error", "message": f"参数格式错误：{str(e)}"})
@@ -1618,6 +5193,35 @@ def execute_sql():
         return jsonify({"status": "error", "message": f"执行失败：{str(e)}"})
 
 
+def execute_fanout_request(sql, page, page_size, db_ids, db_tag):
+    """/execute_sql 的并发查询模式：只允许单条只读查询，按各数据库的方言分别做安全校验"""
+    databases, error = resolve_fanout_databases(db_ids, db_tag)
+    if error:
+        return jsonify({"status": "error", "message": error})
+    try:
+        timeout = int(request.form.get('node_timeout', DB_TIMEOUT_CONFIG['statement_timeout']))
+    except ValueError:
+        return jsonify({"status": "error", "message": "单库超时时间必须是整数！"})
+    # 单库超时不超过语句超时配置
+    timeout = max(1, min(timeout, DB_TIMEOUT_CONFIG['statement_timeout']))
+    
+    # 同一语句文本发往所有数据库：各方言都必须分割出同一条语句
+    texts = set()
+    for dialect in dict.fromkeys(get_db_driver(db.get('type', 'postgresql')).sql_dialect for db in databases):
+        error = validate_sql_request(sql, page, page_size, dialect)
+        if error:
+            return jsonify({"status": "error", "message": error})
+        statements = split_sql_script(sql, dialect)
+        if len(statements) != 1 or not is_row_query(statements[0].text, dialect):
+            return jsonify({"status": "error", "message": "并发查询只支持单条只读查询语句！"})
+        texts.add(statements[0].text)
+    if len(texts) != 1:
+        return jsonify({"status": "error", "message": "SQL语句在不同类型的数据库中分割结果不一致，请分别执行！"})
+    statement = texts.pop()
+    
+    return jsonify(execute_fanout_query(statement, databases, page, page_size, timeout))
+
+
 @app.route('/analyze_query_plan', methods=['POST'])
 @require_auth
 def analyze_query_plan():
@@ -1635,17 +5239,15 @@ def analyze_query_plan():
         if not sql:
             return jsonify({"status": "error", "message": "请输入SQL语句！"})
             
-        # 验证SQL是否为SELECT语句 - 改进的验证逻辑
-        # 移除注释后再检查是否以SELECT开头
-        clean_sql = re.sub(r'/\*.*?\*/|--.*?$', '', sql, flags=re.DOTALL | re.MULTILINE).strip()
-        clean_sql_upper = clean_sql.upper()
-        
-        # 支持多种SELECT语句格式
+        # 只分析单条查询语句（WITH按其后的主语句判断，EXPLAIN ANALYZE 会真正执行，不能修改数据）
+        dialect = get_sql_dialect(db_id)
+        verdict = classify_sql(sql, dialect)
+        if not verdict.safe:
+            logging.warning(f"SQL安全校验失败：{sql[:100]}... | 原因：{verdict.message}")
+            return jsonify({"status": "error", "message": verdict.message})
         is_select_query = (
-            clean_sql_upper.startswith('SELECT') or 
-            clean_sql_upper.startswith('EXPLAIN') or
-            (clean_sql_upper.startswith('WITH') and 'SELECT' in clean_sql_upper)
-        )
+            verdict.command in SQL_ROW_QUERY_COMMANDS or verdict.command == 'EXPLAIN'
+        ) and not verdict.writes and len(split_sql_script(sql, dialect)) == 1
         
         if not is_select_query:
             return jsonify({"status": "error", "message": "查询计划分析仅支持SELECT/EXPLAIN/WITH查询语句！"})
@@ -1654,23 +5256,12 @@ def analyze_query_plan():
         get_connection_func, db_config = get_db_connection(db_id)
         db_type = db_config.get('type', 'postgresql').lower()
         
-        # 构建EXPLAIN语句
-        explain_sql = ""
-        if db_type in ['postgresql', 'kingbase', 'highgo', 'gauss', 'uxdb', 'vastbase', 'yashandb', 'gbase', 'vanward']:
-            explain_sql = f"EXPLAIN ANALYZE {sql}"
-        elif db_type in ['mysql', 'tidb', 'oceanbase', 'greatdb']:
-            explain_sql = f"EXPLAIN FORMAT=JSON {sql}"
-        elif db_type == 'oracle':
-            explain_sql = f"EXPLAIN PLAN FOR {sql}"
-        elif db_type == 'shentong':  # 神通数据库兼容Oracle
-            explain_sql = f"EXPLAIN PLAN FOR {sql}"
-        elif db_type == 'dm':  # 达梦数据库
-            explain_sql = f"EXPLAIN {sql}"
-        else:
-            return jsonify({"status": "error", "message": f"不支持的数据库类型：{db_type}"})
+        # 构建EXPLAIN语句（执行计划语法由驱动适配器决定）
+        driver = get_db_driver(db_type)
+        explain_sql = driver.explain_sql(sql)
             
-        # 执行EXPLAIN语句
-        with get_connection_func(db_config) as conn:
+        # 执行EXPLAIN语句（EXPLAIN ANALYZE会真正执行查询，同样受准入控制）
+        with QUERY_ADMISSION.admit(db_id), get_connection_func(db_config) as conn:
             cursor = conn.cursor()
             cursor.execute(explain_sql)
             rows = cursor.fetchall()
@@ -1680,7 +5271,7 @@ def analyze_query_plan():
             
             # 根据数据库类型处理结果
             plan_data = []
-            if db_type == 'oracle' or db_type == 'shentong':
+            if driver.plan_style == 'oracle':
                 # Oracle的执行计划需要查询PLAN_TABLE获取详细信息
                 # 首先需要确保执行了EXPLAIN PLAN语句，它已经在上面的cursor.execute(explain_sql)中执行
                 try:
@@ -1694,7 +5285,7 @@ def analyze_query_plan():
                 except Exception as e:
                     # 如果PLAN_TABLE查询失败，返回原始EXPLAIN PLAN的结果
                     plan_data = [dict(zip(columns, row)) for row in rows]
-            elif db_type in ['postgresql', 'kingbase', 'highgo', 'gauss', 'uxdb', 'vastbase', 'yashandb', 'gbase', 'vanward']:
+            elif driver.plan_style == 'postgresql':
                 # PostgreSQL的EXPLAIN ANALYZE结果通常包含执行顺序信息，确保以适当格式返回
                 # 对于PostgreSQL，结果通常是单列或多列，取决于EXPLAIN选项
                 if len(rows) > 0 and len(columns) == 1 and 'QUERY PLAN' in [col.upper() for col in columns]:
@@ -1720,7 +5311,7 @@ def analyze_query_plan():
                     # 如果已有多个列，包含执行顺序信息，则添加统一的步骤编号
                     plan_data = [dict(zip(['Step'] + columns, [idx+1] + list(row))) for idx, row in enumerate(rows)]
                     columns = ['Step'] + columns
-            elif db_type in ['mysql', 'tidb', 'oceanbase', 'greatdb']:
+            elif driver.plan_style == 'mysql':
                 # MySQL的EXPLAIN FORMAT=JSON结果可能需要特殊处理
                 # 添加统一的步骤编号
                 plan_data = []
@@ -1747,15 +5338,160 @@ def analyze_query_plan():
                 "message": "查询计划分析完成！"
             })
             
+    except QueryAdmissionRejected as e:
+        logging.warning(f"查询计划分析被拒绝：{str(e)} | 数据库：{db_id or 'default'}")
+        return jsonify({"status": "error", "message": str(e)}), e.status_code
     except Exception as e:
         logging.error(f"查询计划分析失败：{str(e)} | SQL：{sql[:100]}...")
         return jsonify({"status": "error", "message": f"查询计划分析失败：{str(e)}"})
 
 
-def execute_single_statement(sql, page, page_size, db_id):
-    """执行单条SQL语句"""
+# 语句结果缓存可引用的结果总大小占 app_memory_limit_mb 的比例
+RESULT_CACHE_MEMORY_RATIO = 0.25
+# 语句结果缓存最多保存的查询数
+RESULT_CACHE_MAX_ENTRIES = 256
+# 出现即不缓存的关键字：修改数据（含 SELECT ... INTO 建表/写变量）和行锁（FOR UPDATE、LOCK IN SHARE MODE）
+RESULT_CACHE_EXCLUDED_WORDS = SQL_DML_COMMANDS | {'INTO', 'LOCK'}
+
+
+def is_cacheable_query(sql, dialect='generic'):
+    """能否使用语句结果缓存：只读查询（见 is_row_query），且记号中没有写操作和行锁关键字
+    （FOR UPDATE/FOR [KEY] SHARE 等）——命中缓存时不会执行语句，其副作用会被跳过"""
+    if not is_row_query(sql, dialect):
+        return False
+    previous = None
+    for kind, value in lex_sql(sql, dialect):
+        if kind == 'word' and (value in RESULT_CACHE_EXCLUDED_WORDS
+                               or (value == 'SHARE' and previous in ('FOR', 'KEY'))):
+            return False
+        previous = value
+    return True
+
+
+class StatementResultCache:
+    """只读查询的结果缓存（请求参数 use_cache=true 时启用）：按规范化SQL、数据库和数据库用户计算指纹，
+    指向 QUERY_RESULTS 中已保存的结果，app_result_cache_time 内重复执行同一查询时直接分页返回，不再访问数据库"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # 指纹 -> (查询ID, 数据库ID, 缓存时间, 结果大小)，左端最久未访问
+        self._bytes = 0
+        self.stats = defaultdict(int)
+
+    @property
+    def ttl(self):
+        return APP_CONFIG.get('app_result_cache_time', DEFAULT_APP_CONFIG['app_result_cache_time'])
+
+    @property
+    def budget_bytes(self):
+        memory_limit_mb = APP_CONFIG.get('app_memory_limit_mb', DEFAULT_APP_CONFIG['app_memory_limit_mb'])
+        return int(memory_limit_mb * 1024 * 1024 * RESULT_CACHE_MEMORY_RATIO)
+
+    def fingerprint(self, sql, dialect, db_id, db_config):
+        key = '\0'.join((db_id or 'default', str(db_config.get('user', '')), normalize_sql(sql, dialect)))
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def get_page(self, key, page, page_size):
+        """命中时返回请求页（格式同 fetch_query_result，附加 cache_hit），未命中或已过期返回None"""
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and time.time() - item[2] > self.ttl:
+                self._remove_locked(key)
+                item = None
+            if item is None:
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+        query_id, db_id, cached_at, _ = item
+        start = (page - 1) * page_size
+        entry = QUERY_RESULTS.lookup(query_id)
+        results = QUERY_RESULTS.read_page(query_id, start, start + page_size) if entry is not None else None
+        if results is None:
+            # 结果已被结果缓存淘汰或过期
+            with self._lock:
+                if self._entries.get(key) is item:
+                    self._remove_locked(key)
+                self.stats['misses'] += 1
+            return None
+        
+        total_count = entry.row_count
+        with self._lock:
+            self.stats['hits'] += 1
+        logging.info(f"SQL结果缓存命中：查询ID={query_id} | 总记录数：{total_count} | 数据库：{db_id or 'default'}")
+        return {
+            "status": "success",
+            "columns": entry.columns,
+            "results": results,
+            "count": len(results),
+            "total_count": total_count,
+            "page": page,
+            "page_size": page_size,
+            "total_page": (total_count + page_size - 1) // page_size,
+            "query_id": query_id,
+            "cache_hit": True,
+            "cached_at": datetime.fromtimestamp(cached_at).strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+    def put(self, key, query_id, db_id):
+        """缓存查询结果，超出大小预算时淘汰最久未访问的查询"""
+        entry = QUERY_RESULTS.lookup(query_id)
+        if entry is None or entry.row_count is None:
+            return
+        budget = self.budget_bytes
+        with self._lock:
+            if entry.size > budget:
+                self.stats['too_large'] += 1
+                return
+            self._remove_locked(key)
+            self._entries[key] = (query_id, db_id, time.time(), entry.size)
+            self._bytes += entry.size
+            while self._bytes > budget or len(self._entries) > RESULT_CACHE_MAX_ENTRIES:
+                self._remove_locked(next(iter(self._entries)))
+                self.stats['evictions'] += 1
+
+    def invalidate(self, db_id=None):
+        """清除指定数据库（未指定时为全部）的缓存结果，返回清除的数量"""
+        with self._lock:
+            keys = [key for key, item in self._entries.items() if db_id is None or item[1] == db_id]
+            for key in keys:
+                self._remove_locked(key)
+            self.stats['invalidated'] += len(keys)
+        return len(keys)
+
+    def expire(self):
+        """清理超过 app_result_cache_time 的缓存，返回清理数量"""
+        deadline = time.time() - self.ttl
+        with self._lock:
+            keys = [key for key, item in self._entries.items() if item[2] < deadline]
+            for key in keys:
+                self._remove_locked(key)
+        return len(keys)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "budget_bytes": self.budget_bytes,
+                "ttl": self.ttl,
+                **dict(self.stats),
+            }
+
+    def _remove_locked(self, key):
+        item = self._entries.pop(key, None)
+        if item is not None:
+            self._bytes -= item[3]
+
+
+RESULT_CACHE = StatementResultCache()
+
+
+def execute_single_statement(sql, page, page_size, db_id, job=None, use_cache=False):
+    """执行单条SQL语句（job为异步查询任务时，登记执行中的连接以便取消，并按批读取结果更新进度；
+    use_cache为True时只读查询优先从语句结果缓存返回）"""
     # 安全校验
-    is_safe, msg = check_sql_safety(sql)
+    dialect = get_sql_dialect(db_id)
+    is_safe, msg = check_sql_safety(sql, dialect)
     if not is_safe:
         logging.warning(f"SQL安全校验失败：{sql[:100]}... | 原因：{msg}")
         return {"status": "error", "message": msg}
@@ -1770,142 +5506,36 @@ def execute_single_statement(sql, page, page_size, db_id):
     if not db_config:
         return {"status": "error", "message": "未找到有效的数据库配置"}
     
-    db_type = db_config.get('type', 'postgresql').lower()
+    cache_key = None
+    if use_cache and is_cacheable_query(sql, dialect):
+        cache_key = RESULT_CACHE.fingerprint(sql, dialect, db_id, db_config)
+        data = RESULT_CACHE.get_page(cache_key, page, page_size)
+        if data is not None:
+            return data
     
-    # 根据数据库类型建立连接并执行SQL
-    if db_type == 'postgresql':
-        import psycopg2
-        from psycopg2 import OperationalError, ProgrammingError
-        # 解密密码
-        decrypted_password = decrypt_password(db_config.get('password', ''))
-        conn = psycopg2.connect(
-            host=db_config['host'],
-            port=int(db_config['port']),
-            user=db_config['user'],
-            password=decrypted_password,
-            database=db_config['database'],
-            connect_timeout=DB_TIMEOUT_CONFIG['connect_timeout']
-        )
-        # 设置语句超时
-        with conn.cursor() as cur:
-            cur.execute(f"SET statement_timeout = {DB_TIMEOUT_CONFIG['statement_timeout']}000;")  # 转换为毫秒
-    elif db_type == 'mysql':
-        import pymysql
-        # 解密密码
-        decrypted_password = decrypt_password(db_config.get('password', ''))
-        conn = pymysql.connect(
-            host=db_config['host'],
-            port=int(db_config['port']),
-            user=db_config['user'],
-            password=decrypted_password,
-            database=db_config['database'],
-            charset='utf8mb4',
-            connect_timeout=DB_TIMEOUT_CONFIG['connect_timeout']
-        )
-        # 设置语句超时
-        with conn.cursor() as cur:
-            cur.execute(f"SET SESSION MAX_EXECUTION_TIME = {DB_TIMEOUT_CONFIG['statement_timeout']}000;")  # 转换为毫秒
-    elif db_type == 'oracle':
-        import cx_Oracle
-        # 解密密码
-        decrypted_password = decrypt_password(db_config.get('password', ''))
-        dsn = cx_Oracle.makedsn(db_config['host'], int(db_config['port']), service_name=db_config['database'])
-        conn = cx_Oracle.connect(
-            user=db_config['user'],
-            password=decrypted_password,
-            dsn=dsn,
-            encoding="UTF-8",
-            timeout=DB_TIMEOUT_CONFIG['connect_timeout']
-        )
-        # 设置语句超时
-        with conn.cursor() as cur:
-            # Oracle的超时设置在连接级别，通过timeout参数实现
-            pass  # Oracle连接级别的timeout参数已经设置
-    elif db_type == 'kingbase':  # 人大金仓数据库
-        import psycopg2 as kingbase_psycopg2
-        # 解密密码
-        decrypted_password = decrypt_password(db_config.get('password', ''))
-        conn = kingbase_psycopg2.connect(
-            host=db_config['host'],
-            port=int(db_config['port']),
-            user=db_config['user'],
-            password=decrypted_password,
-            database=db_config['database'],
-            connect_timeout=DB_TIMEOUT_CONFIG['connect_timeout']
-        )
-        # 设置语句超时
-        with conn.cursor() as cur:
-            cur.execute(f"SET statement_timeout = {DB_TIMEOUT_CONFIG['statement_timeout']}000;")  # 转换为毫秒
-    elif db_type in ['tidb', 'oceanbase']:  # TiDB和OceanBase兼容MySQL协议
-        import pymysql
-        # 解密密码
-        decrypted_password = decrypt_password(db_config.get('password', ''))
-        conn = pymysql.connect(
-            host=db_config['host'],
-            port=int(db_config['port']),
-            user=db_config['user'],
-            password=decrypted_password,
-            database=db_config['database'],
-            charset='utf8mb4',
-            connect_timeout=DB_TIMEOUT_CONFIG['connect_timeout']
-        )
-        # 设置语句超时
-        with conn.cursor() as cur:
-            cur.execute(f"SET SESSION MAX_EXECUTION_TIME = {DB_TIMEOUT_CONFIG['statement_timeout']}000;")  # 转换为毫秒
-    elif db_type == 'yashandb':  # 崖山数据库使用专用yasdb驱动
-        import yasdb
-        # 解密密码
-        decrypted_password = decrypt_password(db_config.get('password', ''))
-        # 构造DSN连接字符串
-        dsn = f"{db_config['host']}:{db_config['port']}"
-        conn = yasdb.connect(
-            dsn=dsn,
-            user=db_config['user'],
-            password=decrypted_password,
-        )
-        # 崖山数据库不需要设置语句超时
-        pass
-    else:
-        return {"status": "error", "message": f"不支持的数据库类型：{db_type}"}
+    # 从连接池借出连接（同一数据库配置复用物理连接，避免每条语句重复建连）
+    try:
+        pool = CONNECTION_POOLS.get_pool(db_config)
+        conn = pool.acquire()
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
     
     try:
+        if job is not None:
+            job.attach(conn, db_config)
         cursor = conn.cursor()
         cursor.execute(sql)
         
         # 处理查询结果
         if cursor.description:
-            columns = [desc[0] for desc in cursor.description]
-            # 先获取全量结果（内存分页）
-            full_results = cursor.fetchall()
-            total_count = len(full_results)
-            
-            # 分页处理
-            start = (page - 1) * page_size
-            end = start + page_size
-            results = full_results[start:end]
-            
-            # 生成唯一标识，存储查询结果（解决并发问题）
-            query_id = str(uuid.uuid4())
-            QUERY_RESULTS[query_id] = {
-                'columns': columns,
-                'results': full_results,
-                'create_time': time.time()
-            }
-            
-            data = {
-                "status": "success",
-                "columns": columns,
-                "results": results,
-                "count": len(results),
-                "total_count": total_count,
-                "page": page,
-                "page_size": page_size,
-                "total_page": (total_count + page_size - 1) // page_size,
-                "query_id": query_id  # 返回查询ID用于导出
-            }
-            logging.info(f"SQL执行成功：{sql[:100]}... | 总记录数：{total_count} | 查询ID：{query_id} | 数据库：{db_id or 'default'}")
+            data = fetch_query_result(cursor, sql, page, page_size, db_id, job)
+            if cache_key is not None:
+                RESULT_CACHE.put(cache_key, data['query_id'], db_id)
+                data['cache_hit'] = False
         else:
             conn.commit()
+            # 本应用执行的写操作使该数据库的缓存结果失效
+            RESULT_CACHE.invalidate(db_id)
             data = {
                 "status": "success",
                 "message": f"SQL执行成功！影响行数：{cursor.rowcount}"
@@ -1915,34 +5545,236 @@ def execute_single_statement(sql, page, page_size, db_id):
         cursor.close()
         return data
     except Exception as e:
+        if job is not None and job.cancel_requested:
+            logging.info(f"SQL执行已取消：{sql[:100]}... | 任务ID：{job.job_id} | 数据库：{db_id or 'default'}")
+            return {"status": "error", "message": "查询已取消", "cancelled": True}
         # 详细记录错误信息，包括SQL语句和错误详情
-        error_msg = str(e)
-        logging.error(f"SQL执行错误 - 时间: {time.strftime('%Y-%m-%d %H:%M:%S')}, DB: {db_id or 'default'}, SQL: {sql}, 错误: {error_msg}", exc_info=True)
-        
-        # 根据错误类型返回不同的错误信息
-        if 'syntax error' in error_msg.lower() or 'parser' in error_msg.lower():
-            return {"status": "error", "message": f"SQL语法错误: {str(e)[:200]}..."}
-        elif 'permission denied' in error_msg.lower() or 'access denied' in error_msg.lower():
-            return {"status": "error", "message": "数据库权限不足，无法执行该操作！"}
-        elif 'timeout' in error_msg.lower():
-            return {"status": "error", "message": "SQL执行超时，请检查查询语句或联系管理员！"}
+        logging.error(f"SQL执行错误 - 时间: {time.strftime('%Y-%m-%d %H:%M:%S')}, DB: {db_id or 'default'}, SQL: {sql}, 错误: {str(e)}", exc_info=True)
+        return {"status": "error", "message": describe_sql_error(e)}
+    finally:
+        if job is not None:
+            job.detach()
+        # 归还连接（归还时会回滚未提交事务，失效连接直接丢弃）
+        pool.release(conn)
+
+
+def fetch_query_result(cursor, sql, page, page_size, db_id, job=None):
+    """读取查询的全量结果，转为列式结果存入结果缓存（内存分页），返回请求页"""
+    columns = [desc[0] for desc in cursor.description]
+    # 先获取全量结果（内存分页），转为列式存储后释放原始行
+    if job is None:
+        full_results = ColumnarResult.from_rows(cursor.fetchall(), len(columns))
+    else:
+        full_results = ColumnarResult.from_rows(fetch_all_with_progress(cursor, job), len(columns))
+    total_count = len(full_results)
+    
+    # 分页处理（按列批量转换为JSON可序列化的值）
+    start = (page - 1) * page_size
+    end = start + page_size
+    results = full_results.rows(start, end, 'json')
+    
+    # 生成唯一标识，存储查询结果（解决并发问题），同时记录列类型供Arrow/Parquet导出使用
+    query_id = str(uuid.uuid4())
+    driver = get_db_driver_for(db_id)
+    column_types = driver.column_types(cursor.description) if driver is not None else None
+    # 只有只读查询记录SQL（导出时结果未缓存可重新执行，多进程部署时发布到共享状态）；
+    # INSERT ... RETURNING、CALL 等语句也有结果集，但重新执行会重复修改数据，只能从缓存导出
+    dialect = driver.sql_dialect if driver is not None else 'generic'
+    source_sql = sql if is_row_query(sql, dialect) else None
+    QUERY_RESULTS.put(query_id, columns, full_results, sql=source_sql, db_id=db_id, column_types=column_types)
+    
+    logging.info(f"SQL执行成功：{sql[:100]}... | 总记录数：{total_count} | 查询ID：{query_id} | 数据库：{db_id or 'default'}")
+    return {
+        "status": "success",
+        "columns": columns,
+        "results": results,
+        "count": len(results),
+        "total_count": total_count,
+        "page": page,
+        "page_size": page_size,
+        "total_page": (total_count + page_size - 1) // page_size,
+        "query_id": query_id  # 返回查询ID用于导出
+    }
+
+
+def describe_sql_error(e):
+    """根据错误类型返回给用户的错误信息"""
+    error_msg = str(e).lower()
+    if 'syntax error' in error_msg or 'parser' in error_msg:
+        return f"SQL语法错误: {str(e)[:200]}..."
+    elif 'permission denied' in error_msg or 'access denied' in error_msg:
+        return "数据库权限不足，无法执行该操作！"
+    elif 'timeout' in error_msg:
+        return "SQL执行超时，请检查查询语句或联系管理员！"
+    else:
+        return f"SQL执行失败: {str(e)[:200]}..."
+
+
+# 多语句脚本遇到错误时的处理方式：
+# auto - 查询语句出错继续执行，其他语句出错停止；stop - 任何语句出错即停止；continue - 出错后继续执行
+SCRIPT_ON_ERROR_MODES = ('auto', 'stop', 'continue')
+# 事务模式下每条语句执行前设置的保存点名称
+SCRIPT_SAVEPOINT = 'hina_stmt'
+
+
+def parse_script_options(form):
+    """读取多语句脚本的执行选项：transaction（是否在一个事务中执行）、on_error（出错处理方式）"""
+    transaction = form.get('transaction', 'false').lower() == 'true'
+    on_error = form.get('on_error', 'auto').lower()
+    if on_error not in SCRIPT_ON_ERROR_MODES:
+        raise ValueError(f"on_error 只能为 {'、'.join(SCRIPT_ON_ERROR_MODES)}")
+    return transaction, on_error
+
+
+def script_should_stop(on_error, sql, dialect='generic'):
+    """语句出错后是否停止执行脚本：auto 模式下只有查询语句（见 is_row_query，以及EXPLAIN）出错继续执行，
+    INSERT ... SELECT、含DELETE的WITH等写操作出错即停止"""
+    if on_error == 'stop':
+        return True
+    if on_error == 'continue':
+        return False
+    return not (is_row_query(sql, dialect) or classify_sql(sql, dialect).command == 'EXPLAIN')
+
+
+def execute_script_statement(conn, driver, sql, page, page_size, db_id, job, transaction):
+    """在脚本会话中执行一条语句：事务模式下先设保存点，出错时只回滚到保存点；
+    非事务模式下非查询语句执行后立即提交，出错时回滚该语句"""
+    cursor = conn.cursor()
+    try:
+        if transaction:
+            cursor.execute(f"SAVEPOINT {SCRIPT_SAVEPOINT}")
+        cursor.execute(sql)
+        if cursor.description:
+            data = fetch_query_result(cursor, sql, page, page_size, db_id, job)
+        else:
+            if not transaction:
+                conn.commit()
+            RESULT_CACHE.invalidate(db_id)
+            data = {
+                "status": "success",
+                "message": f"SQL执行成功！影响行数：{cursor.rowcount}",
+                "rowcount": cursor.rowcount
+            }
+        if transaction and driver.release_savepoint:
+            cursor.execute(f"RELEASE SAVEPOINT {SCRIPT_SAVEPOINT}")
+        return data
+    except Exception as e:
+        if job is not None and job.cancel_requested:
+            return {"status": "error", "message": "查询已取消", "cancelled": True}
+        logging.error(f"脚本语句执行错误 - DB: {db_id or 'default'}, SQL: {sql[:200]}, 错误: {str(e)}")
+        # 回滚失败时连接状态未知，抛出异常中止整个脚本
+        if transaction:
+            rollback_cursor = conn.cursor()
+            try:
+                rollback_cursor.execute(f"ROLLBACK TO SAVEPOINT {SCRIPT_SAVEPOINT}")
+            finally:
+                rollback_cursor.close()
         else:
-            return {"status": "error", "message": f"SQL执行失败: {str(e)[:200]}..."}
+            conn.rollback()
+        return {"status": "error", "message": describe_sql_error(e)}
     finally:
-        conn.close()
+        cursor.close()
+
+
+def execute_sql_script(sql_statements, page, page_size, db_id, job=None, transaction=False, on_error='auto'):
+    """在同一个数据库会话中依次执行多条语句，记录每条语句的耗时：
+    transaction 为True时全部语句在一个事务中执行（每条语句前设保存点），
+    因出错停止时整体回滚，继续执行时只回滚出错的语句，最后提交其余语句"""
+    db_config = get_database_by_id(db_id) if db_id else get_default_database()
+    if not db_config:
+        return {"status": "error", "message": "未找到有效的数据库配置"}
+    try:
+        driver = get_db_driver(db_config.get('type', 'postgresql'))
+        pool = CONNECTION_POOLS.get_pool(db_config)
+        conn = pool.acquire()
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    
+    transaction_timeout = APP_CONFIG.get('app_transaction_timeout', DEFAULT_APP_CONFIG['app_transaction_timeout'])
+    script_start = time.monotonic()
+    results = []
+    stopped = False
+    rolled_back = False
+    try:
+        if job is not None:
+            job.attach(conn, db_config)
+        for i, statement in enumerate(sql_statements, start=1):
+            stmt = statement.text
+            if job is not None and job.cancel_requested:
+                stopped = True
+                break
+            original_sql = stmt[:100] + "..." if len(stmt) > 100 else stmt
+            if transaction and time.monotonic() - script_start > transaction_timeout:
+                results.append({"status": "error", "message": f"事务超过 {transaction_timeout} 秒未完成",
+                                "statement_index": i, "line": statement.line, "original_sql": original_sql})
+                stopped = True
+                break
+            
+            start = time.monotonic()
+            is_safe, msg = check_sql_safety(stmt, driver.sql_dialect)
+            if is_safe:
+                result = execute_script_statement(conn, driver, stmt, page, page_size, db_id, job, transaction)
+            else:
+                logging.warning(f"SQL安全校验失败：{stmt[:100]}... | 原因：{msg}")
+                result = {"status": "error", "message": msg}
+            result['statement_index'] = i
+            result['line'] = statement.line
+            result['original_sql'] = original_sql
+            result['elapsed_ms'] = round((time.monotonic() - start) * 1000, 1)
+            results.append(result)
+            
+            if result.get('status') != 'success' and (result.get('cancelled') or script_should_stop(on_error, stmt, driver.sql_dialect)):
+                stopped = True
+                break
+        
+        if transaction:
+            if stopped:
+                conn.rollback()
+                rolled_back = True
+            else:
+                conn.commit()
+    except Exception as e:
+        logging.error(f"SQL脚本执行中止：{str(e)} | 数据库：{db_id or 'default'}")
+        results.append({"status": "error", "message": f"脚本执行中止：{describe_sql_error(e)}"})
+        rolled_back = transaction
+    finally:
+        if job is not None:
+            job.detach()
+        # 归还连接（归还时会回滚未提交事务，失效连接直接丢弃）
+        pool.release(conn)
+    
+    elapsed_ms = round((time.monotonic() - script_start) * 1000, 1)
+    failed = sum(1 for r in results if r.get('status') != 'success')
+    message = f"共执行{len(results)}条语句"
+    if failed:
+        message += f"，{failed}条失败"
+    if rolled_back:
+        message += "，事务已回滚"
+    logging.info(f"SQL脚本执行完成：{message} | 事务：{transaction} | 耗时：{elapsed_ms}ms | 数据库：{db_id or 'default'}")
+    return {
+        "status": "success",
+        "message": message,
+        "results": results,
+        "is_batch": True,
+        "transaction": transaction,
+        "rolled_back": rolled_back,
+        "elapsed_ms": elapsed_ms
+    }
 
 @app.route('/export_excel')
+@rate_limited
 def export_excel():
-    """导出Excel（支持自定义表头颜色和是否导出列名）"""
+    """导出Excel（只写模式流式生成，支持自定义表头颜色和是否导出列名）"""
     try:
-        # 获取查询ID
+        # 获取查询ID和数据来源（auto/cache/database）
         query_id = request.args.get('query_id')
-        if not query_id or query_id not in QUERY_RESULTS:
-            return jsonify({"status": "error", "message": "查询结果不存在或已过期！请重新执行查询。"})
+        source = request.args.get('source', 'auto').lower()
         
         # 获取Excel配置参数
         header_color = request.args.get('header_color', '4472C4')
         include_header = request.args.get('include_header', 'true').lower() == 'true'
+        if not re.fullmatch(r'[0-9A-Fa-f]{6}', header_color):
+            return jsonify({"status": "error", "message": "表头颜色格式错误！"})
         
         # 获取自定义文件名（如果提供）
         custom_filename = request.args.get('filename', '')
@@ -1951,213 +5783,365 @@ def export_excel():
         else:
             filename = f"SQL查询结果_{datetime.now().strftime('%Y%m%d%H%M%S')}.xlsx"
         
-        # 获取全量结果
-        last_result = QUERY_RESULTS[query_id]
-        columns = last_result['columns']
-        results = last_result['results']
+        export_source = open_export_source(query_id, source, 'excel')
+        if export_source is None:
+            return jsonify({"status": "error", "message": "查询结果不存在或已过期！请重新执行查询。"})
         
-        # 创建Excel
-        wb = Workbook()
-        ws = wb.active
-        ws.title = f"查询结果_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        # 写入临时文件（xlsx为zip格式，需完整生成后再下载）
+        file_path = create_export_temp_file('.xlsx')
+        try:
+            row_count, sheet_count = write_excel_workbook(
+                file_path, export_source.columns, export_source, header_color, include_header
+            )
+        except Exception:
+            os.remove(file_path)
+            raise
+        finally:
+            export_source.close()
         
-        # 写入表头（如果需要）
-        if include_header and columns:
-            ws.append(columns)
+        logging.info(f"Excel导出成功：查询ID={query_id} | 记录数：{row_count} | 工作表数：{sheet_count} | 表头颜色：{header_color} | 包含表头：{include_header} | 文件名：{filename}")
         
-        # 写入数据
-        for row in results:
-            ws.append(row)
+        # 分块下载文件，响应结束（含客户端中断）后删除临时文件
+        return build_download_response(
+            iter_file_chunks(file_path),
+            filename,
+            'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            lambda: remove_temp_file(file_path),
+            os.path.getsize(file_path)
+        )
+    
+    except Exception as e:
+        logging.error(f"Excel导出失败：{str(e)}")
+        return jsonify({"status": "error", "message": f"导出Excel失败：{str(e)}"})
+
+@app.route('/export_csv')
+@rate_limited
+def export_csv():
+    """导出CSV（流式分块输出，支持自定义分隔符和是否导出列名）"""
+    try:
+        # 获取查询ID和数据来源（auto/cache/database）
+        query_id = request.args.get('query_id')
+        source = request.args.get('source', 'auto').lower()
+        
+        # 获取CSV配置参数
+        separator_type = request.args.get('separator', 'comma')
+        include_header = request.args.get('include_header', 'true').lower() == 'true'
+        
+        # 获取分隔符
+        separator = SUPPORTED_CSV_SEPARATORS.get(separator_type, ',')
+        
+        # 下载压缩方式（none/gzip/zip/zstd）
+        compression = request.args.get('compression', 'none').lower()
+        if compression != 'none' and compression not in EXPORT_COMPRESSIONS:
+            return jsonify({"status": "error", "message": f"不支持的压缩方式！可选：none, {', '.join(EXPORT_COMPRESSIONS)}"})
+        
+        # 获取自定义文件名（如果提供）
+        custom_filename = request.args.get('filename', '')
+        if custom_filename:
+            filename = custom_filename if custom_filename.endswith('.csv') else f"{custom_filename}.csv"
+        else:
+            timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+            filename = f"SQL查询结果_{query_id}_{timestamp}.csv"
+        
+        export_source = open_export_source(query_id, source, 'csv')
+        if export_source is None:
+            return jsonify({"status": "error", "message": "查询结果不存在或已过期！请重新执行查询。"})
+        
+        # 边读取边编码输出CSV，需要时边输出边压缩
+        try:
+            chunks, filename, mimetype = compress_export_stream(
+                generate_csv_stream(export_source.columns, export_source, separator, include_header),
+                filename, 'text/csv; charset=utf-8-sig', compression
+            )
+        except Exception:
+            export_source.close()
+            raise
+        
+        def on_close():
+            export_source.close()
+            logging.info(f"CSV导出完成：{filename} | 记录数：{export_source.rows_read} | 分隔符：{repr(separator)} | 包含表头：{include_header} | 压缩方式：{compression}")
+        
+        return build_download_response(chunks, filename, mimetype, on_close)
+    
+    except Exception as e:
+        logging.error(f"CSV导出失败：{str(e)}")
+        return jsonify({"status": "error", "message": f"导出CSV失败：{str(e)}"})
+
+
+@app.route('/export_html')
+@rate_limited
+def export_html():
+    """导出HTML（类似Oracle AWR报告样式，流式分块输出；指定page_rows时拆分为多个互相链接的HTML文件并打包为zip）"""
+    try:
+        # 获取查询ID和数据来源（auto/cache/database）
+        query_id = request.args.get('query_id')
+        source = request.args.get('source', 'auto').lower()
         
-        # 设置样式（只有存在表头时才设置表头样式）
-        if include_header and columns:
-            set_excel_style(ws, header_color)
+        # 每页行数（0表示不分页）
+        try:
+            page_rows = int(request.args.get('page_rows', 0))
+        except ValueError:
+            return jsonify({"status": "error", "message": "每页行数必须是整数！"})
+        if page_rows < 0:
+            return jsonify({"status": "error", "message": "每页行数不能为负数！"})
+        
+        # 下载压缩方式（none/gzip/zip/zstd），分页导出本身已打包为zip，不再压缩
+        compression = request.args.get('compression', 'none').lower()
+        if compression != 'none' and compression not in EXPORT_COMPRESSIONS:
+            return jsonify({"status": "error", "message": f"不支持的压缩方式！可选：none, {', '.join(EXPORT_COMPRESSIONS)}"})
+        
+        # 获取自定义文件名（如果提供）
+        custom_filename = request.args.get('filename', '')
+        if custom_filename:
+            filename = custom_filename if custom_filename.endswith('.html') else f"{custom_filename}.html"
+        else:
+            filename = f"SQL查询结果_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
+        
+        export_source = open_export_source(query_id, source, 'html')
+        if export_source is None:
+            return jsonify({"status": "error", "message": "查询结果不存在或已过期！请重新执行查询。"})
+        
+        if page_rows:
+            # 分页导出：各页写入同一个zip临时文件，完整生成后再下载
+            zip_filename = f"{os.path.splitext(filename)[0]}.zip"
+            file_path = create_export_temp_file('.zip')
+            try:
+                page_count = write_paged_html_zip(
+                    file_path, export_source.columns, export_source, page_rows, export_source.row_count
+                )
+            except Exception:
+                os.remove(file_path)
+                raise
+            finally:
+                export_source.close()
+            
+            logging.info(f"HTML分页导出成功：查询ID={query_id} | 记录数：{export_source.rows_read} | 页数：{page_count} | 每页行数：{page_rows} | 文件名：{zip_filename}")
+            
+            return build_download_response(
+                iter_file_chunks(file_path),
+                zip_filename,
+                'application/zip',
+                lambda: remove_temp_file(file_path),
+                os.path.getsize(file_path)
+            )
         
-        # 保存到BytesIO
-        excel_bytes = BytesIO()
-        wb.save(excel_bytes)
-        excel_bytes.seek(0)
+        # 边读取边转义输出HTML，需要时边输出边压缩
+        try:
+            chunks, filename, mimetype = compress_export_stream(
+                encode_html_stream(generate_awr_html_stream(export_source.columns, export_source, export_source.row_count)),
+                filename, 'text/html; charset=utf-8', compression
+            )
+        except Exception:
+            export_source.close()
+            raise
         
-        logging.info(f"Excel导出成功：查询ID={query_id} | 记录数：{len(results)} | 表头颜色：{header_color} | 包含表头：{include_header} | 文件名：{filename}")
+        def on_close():
+            export_source.close()
+            logging.info(f"HTML导出完成：{filename} | 记录数：{export_source.rows_read} | 压缩方式：{compression}")
         
-        # 下载文件
-        return send_file(
-            excel_bytes,
-            as_attachment=True,
-            download_name=filename,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
+        return build_download_response(chunks, filename, mimetype, on_close)
     
     except Exception as e:
-        logging.error(f"Excel导出失败：{str(e)}")
-        return jsonify({"status": "error", "message": f"导出Excel失败：{str(e)}"})
+        logging.error(f"HTML导出失败：{str(e)}")
+        return jsonify({"status": "error", "message": f"导出HTML失败：{str(e)}"})
 
-@app.route('/export_csv')
-def export_csv():
-    """导出CSV（支持自定义分隔符和是否导出列名）"""
+
+def export_columnar_file(file_format):
+    """导出Parquet/Arrow文件：按记录批次写入临时文件后分块下载（列类型取自查询时的 cursor.description）"""
+    extension, mimetype, display_name = ARROW_FILE_TYPES[file_format]
     try:
-        # 获取查询ID
+        # 获取查询ID和数据来源（auto/cache/database）
         query_id = request.args.get('query_id')
-        if not query_id or query_id not in QUERY_RESULTS:
-            return jsonify({"status": "error", "message": "查询结果不存在或已过期！请重新执行查询。"})
-        
-        # 获取CSV配置参数
-        separator_type = request.args.get('separator', 'comma')
-        include_header = request.args.get('include_header', 'true').lower() == 'true'
+        source = request.args.get('source', 'auto').lower()
         
-        # 获取分隔符
-        separator = SUPPORTED_CSV_SEPARATORS.get(separator_type, ',')
+        # 压缩算法（默认为各格式的第一个）
+        compressions = ARROW_COMPRESSIONS[file_format]
+        compression = request.args.get('compression', compressions[0]).lower()
+        if compression not in compressions:
+            return jsonify({"status": "error", "message": f"不支持的压缩算法！可选：{', '.join(compressions)}"})
         
         # 获取自定义文件名（如果提供）
         custom_filename = request.args.get('filename', '')
         if custom_filename:
-            filename = custom_filename if custom_filename.endswith('.csv') else f"{custom_filename}.csv"
+            filename = custom_filename if custom_filename.endswith(extension) else f"{custom_filename}{extension}"
         else:
-            timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-            filename = f"SQL查询结果_{query_id}_{timestamp}.csv"
+            filename = f"SQL查询结果_{datetime.now().strftime('%Y%m%d%H%M%S')}{extension}"
         
-        # 获取全量结果
-        last_result = QUERY_RESULTS[query_id]
-        columns = last_result['columns']
-        results = last_result['results']
+        export_source = open_export_source(query_id, source, 'python')
+        if export_source is None:
+            return jsonify({"status": "error", "message": "查询结果不存在或已过期！请重新执行查询。"})
         
-        # 生成CSV内容
-        csv_content = generate_csv_content(columns, results, separator, include_header)
+        # 写入临时文件（文件尾部包含元数据，需完整生成后再下载）
+        file_path = create_export_temp_file(extension)
+        try:
+            row_count = write_arrow_file(
+                file_path, file_format, export_source.columns, export_source,
+                export_source.column_types, compression
+            )
+        except Exception:
+            os.remove(file_path)
+            raise
+        finally:
+            export_source.close()
         
-        logging.info(f"CSV导出成功：{filename} | 记录数：{len(results)} | 分隔符：{repr(separator)} | 包含表头：{include_header}")
+        logging.info(f"{display_name}导出成功：查询ID={query_id} | 记录数：{row_count} | 压缩算法：{compression} | 文件名：{filename}")
         
-        # 返回CSV文件
-        return send_file(
-            csv_content,
-            as_attachment=True,
-            download_name=filename,
-            mimetype='text/csv; charset=utf-8-sig'
+        return build_download_response(
+            iter_file_chunks(file_path),
+            filename,
+            mimetype,
+            lambda: remove_temp_file(file_path),
+            os.path.getsize(file_path)
         )
     
     except Exception as e:
-        logging.error(f"CSV导出失败：{str(e)}")
-        return jsonify({"status": "error", "message": f"导出CSV失败：{str(e)}"})
+        logging.error(f"{display_name}导出失败：{str(e)}")
+        return jsonify({"status": "error", "message": f"导出{display_name}失败：{str(e)}"})
 
 
-@app.route('/export_html')
-def export_html():
-    """导出HTML（类似Oracle AWR报告样式）"""
+@app.route('/export_parquet')
+@rate_limited
+def export_parquet():
+    """导出Parquet（按记录批次写入行组，支持选择压缩算法）"""
+    return export_columnar_file('parquet')
+
+
+@app.route('/export_arrow')
+@rate_limited
+def export_arrow():
+    """导出Arrow IPC文件（按记录批次写入，支持选择压缩算法）"""
+    return export_columnar_file('arrow')
+
+
+# 直接从数据库流式导出支持的格式 -> (文件扩展名, MIME类型)
+STREAM_EXPORT_FORMATS = {
+    'csv': ('.csv', 'text/csv; charset=utf-8-sig'),
+    'html': ('.html', 'text/html; charset=utf-8'),
+    'excel': ('.xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'parquet': ARROW_FILE_TYPES['parquet'][:2],
+    'arrow': ARROW_FILE_TYPES['arrow'][:2],
+}
+
+
+@app.route('/stream_export', methods=['POST'])
+@require_auth
+def stream_export():
+    """直接从数据库流式导出查询结果（不执行分页查询、不缓存到 QUERY_RESULTS）：
+    PostgreSQL系列导出CSV时由数据库 COPY ... TO STDOUT 生成CSV字节直接输出，其他情况通过服务端游标逐批读取"""
+    sql = request.form.get('sql', '').strip()
+    db_id = request.form.get('db_id') or None
+    # 准入名额在整个导出期间占用，流式输出时在响应结束后释放
+    admission = ExitStack()
     try:
-        # 获取查询ID
-        query_id = request.args.get('query_id')
-        if not query_id or query_id not in QUERY_RESULTS:
-            return jsonify({"status": "error", "message": "查询结果不存在或已过期！请重新执行查询。"})
+        export_format = request.form.get('format', 'csv').lower()
+        if export_format not in STREAM_EXPORT_FORMATS:
+            return jsonify({"status": "error", "message": f"不支持的导出格式！可选：{', '.join(STREAM_EXPORT_FORMATS)}"})
+        extension, mimetype = STREAM_EXPORT_FORMATS[export_format]
         
-        # 获取自定义文件名（如果提供）
-        custom_filename = request.args.get('filename', '')
+        # 格式参数：CSV分隔符/表头，压缩方式（CSV/HTML为下载压缩，Parquet/Arrow为文件内部压缩，Excel不压缩）
+        separator = SUPPORTED_CSV_SEPARATORS.get(request.form.get('separator', 'comma'), ',')
+        include_header = request.form.get('include_header', 'true').lower() == 'true'
+        if export_format in ARROW_COMPRESSIONS:
+            compressions = ARROW_COMPRESSIONS[export_format]
+        elif export_format == 'excel':
+            compressions = ('none',)
+        else:
+            compressions = ('none', *EXPORT_COMPRESSIONS)
+        compression = request.form.get('compression', compressions[0]).lower()
+        if compression not in compressions:
+            return jsonify({"status": "error", "message": f"不支持的压缩方式！可选：{', '.join(compressions)}"})
+        
+        custom_filename = request.form.get('filename', '')
         if custom_filename:
-            filename = custom_filename if custom_filename.endswith('.html') else f"{custom_filename}.html"
+            filename = custom_filename if custom_filename.endswith(extension) else f"{custom_filename}{extension}"
         else:
-            filename = f"SQL查询结果_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
+            filename = f"SQL查询结果_{datetime.now().strftime('%Y%m%d%H%M%S')}{extension}"
+        
+        # 与执行SQL相同的输入和安全校验（不分页），只允许单条返回结果集的查询
+        dialect = get_sql_dialect(db_id)
+        error = validate_sql_request(sql, 1, 1, dialect)
+        if error:
+            return jsonify({"status": "error", "message": error})
+        statements = split_sql_script(sql, dialect)
+        if not statements:
+            return jsonify({"status": "error", "message": "SQL语句不能为空！"})
+        if len(statements) > 1 or not is_row_query(statements[0].text, dialect):
+            return jsonify({"status": "error", "message": "流式导出只支持单条查询语句！"})
+        statement = statements[0].text
         
-        # 获取全量结果
-        last_result = QUERY_RESULTS[query_id]
-        columns = last_result['columns']
-        results = last_result['results']
+        db_config = get_database_by_id(db_id) if db_id else get_default_database()
+        if not db_config:
+            return jsonify({"status": "error", "message": "未找到有效的数据库配置"})
+        driver = get_db_driver(db_config.get('type', 'postgresql').lower())
         
-        # 生成HTML内容
-        html_content = generate_awr_style_html(columns, results)
+        admission.enter_context(QUERY_ADMISSION.admit(db_id))
         
-        # 创建临时文件并返回
-        from io import StringIO
-        import tempfile
-        import os
+        if export_format == 'csv' and driver.copy_csv_export and is_copy_export_query(statement, dialect):
+            # 数据库生成CSV字节，先写BOM（与 generate_csv_stream 一致），需要时边输出边压缩
+            copy_stream = CopyExportStream(statement, db_config, separator, include_header)
+            admission.callback(copy_stream.close)
+            chunks, filename, mimetype = compress_export_stream(
+                chain([b'\xef\xbb\xbf'], copy_stream), filename, mimetype, compression
+            )
+            
+            def on_close():
+                admission.close()
+                logging.info(f"流式导出完成（COPY）：{filename} | 字节数：{copy_stream.bytes_written} | 压缩方式：{compression}")
+            
+            return build_download_response(chunks, filename, mimetype, on_close)
         
-        # 创建临时文件
-        temp_file = StringIO(html_content)
+        # 服务端游标逐批读取，按导出格式批量转换
+        stream = DatabaseRowStream(statement, db_config)
+        admission.callback(stream.close)
+        row_format = 'python' if export_format in ARROW_FILE_TYPES else export_format
+        rows = iter(stream) if row_format == 'python' else format_row_batches(stream, len(stream.columns), row_format)
+        export_source = ExportSource(stream.columns, rows, None, admission.close, stream.column_types)
         
-        from flask import send_file
-        import io
+        if export_format in ('csv', 'html'):
+            if export_format == 'csv':
+                chunks = generate_csv_stream(export_source.columns, export_source, separator, include_header)
+            else:
+                chunks = encode_html_stream(generate_awr_html_stream(export_source.columns, export_source))
+            chunks, filename, mimetype = compress_export_stream(chunks, filename, mimetype, compression)
+            
+            def on_close():
+                export_source.close()
+                logging.info(f"流式导出完成：{filename} | 记录数：{export_source.rows_read} | 压缩方式：{compression}")
+            
+            return build_download_response(chunks, filename, mimetype, on_close)
         
-        # 将HTML内容转换为字节流
-        html_bytes = html_content.encode('utf-8')
-        byte_io = io.BytesIO(html_bytes)
+        # Excel/Parquet/Arrow写入临时文件，完整生成后再下载
+        file_path = create_export_temp_file(extension)
+        try:
+            if export_format == 'excel':
+                row_count, _ = write_excel_workbook(file_path, export_source.columns, export_source,
+                                                    include_header=include_header)
+            else:
+                row_count = write_arrow_file(file_path, export_format, export_source.columns, export_source,
+                                             export_source.column_types, compression)
+        except Exception:
+            os.remove(file_path)
+            raise
+        finally:
+            export_source.close()
         
-        return send_file(
-            byte_io,
-            as_attachment=True,
-            download_name=filename,
-            mimetype='text/html; charset=utf-8'
+        logging.info(f"流式导出成功：{filename} | 记录数：{row_count} | 数据库：{db_id or 'default'}")
+        return build_download_response(
+            iter_file_chunks(file_path),
+            filename,
+            mimetype,
+            lambda: remove_temp_file(file_path),
+            os.path.getsize(file_path)
         )
     
+    except QueryAdmissionRejected as e:
+        admission.close()
+        logging.warning(f"流式导出被拒绝：{str(e)} | 数据库：{db_id or 'default'}")
+        return jsonify({"status": "error", "message": str(e)}), e.status_code
     except Exception as e:
-        logging.error(f"HTML导出失败：{str(e)}")
-        return jsonify({"status": "error", "message": f"导出HTML失败：{str(e)}"})
-
-def generate_awr_style_html(columns, results):
-    """生成类似Oracle AWR报告样式的HTML"""
-    # HTML头部，包含CSS样式
-    html_head = '''<!DOCTYPE HTML PUBLIC "-//W3C//DTD HTML 4.01 Transitional//EN" "http://www.w3.org/TR/html4/loose.dtd">
-<html>
-<head>
-    <meta http-equiv="Content-Type" content="text/html; charset=UTF-8">
-    <title>SQL查询结果报告 - Oracle AWR风格</title>
-    <style type="text/css">
-        body {font:9pt Arial,Helvetica,sans-serif; color:black; background:White;}
-        p {font:9pt Arial,Helvetica,sans-serif; color:black; background:White;}
-        table,tr,td {font:9pt Arial,Helvetica,sans-serif; color:Black; background:#FFFFCC; padding:0px 0px 0px 0px; margin:0px 0px 0px 0px;}
-        th {font:bold 9pt Arial,Helvetica,sans-serif; color:White; background:#0066CC; padding:0px 0px 0px 0px;}
-        h1 {font:bold 12pt Arial,Helvetica,Geneva,sans-serif; color:#336699; background-color:White; border-bottom:1px solid #cccc99; margin-top:0pt; margin-bottom:0pt; padding:0px 0px 0px 0px;}
-        a {font:10pt Arial,Helvetica,sans-serif; color:#0066CC; margin-top:0pt; margin-bottom:0pt; vertical-align:top;text-decoration: none;}
-        a.link {font:10pt Arial,Helvetica,sans-serif; color:#0066CC; margin-top:0pt; margin-bottom:0pt; vertical-align:top;text-decoration: none;}
-        .awr-report { background:white; padding:0px; margin:0px;}
-        .report-header { font:bold 14pt Arial,Helvetica,Geneva,sans-serif; color:#336699; background-color:White; border-bottom:1px solid #cccc99; margin-top:0pt; margin-bottom:0pt; padding:10px 0px 10px 0px; text-align:center;}
-        .section-title { font:bold 10pt Arial,Helvetica,Geneva,sans-serif; color:white; background:#0066CC; margin:15px 0px 5px 0px; padding:5px;}
-        .summary-info { font:9pt Arial,Helvetica,sans-serif; margin:10px 0px 10px 0px;}
-        .summary-item { margin:5px 0px 5px 0px;}
-        .report-footer { font:8pt Arial,Helvetica,sans-serif; color:#666666; text-align:center; margin-top:20px; padding-top:5px; border-top:1px solid #cccc99;}
-    </style>
-</head>
-<body BGCOLOR="#C0C0C0">
-    <div class="awr-report">
-        <h1 class="report-header">SQL查询结果报告</h1>
-        <p class="summary-info">
-            <span class="summary-item"><b>报告生成时间:</b> ''' + datetime.now().strftime('%Y-%m-%d %H:%M:%S') + '''</span><br>
-            <span class="summary-item"><b>总记录数:</b> ''' + str(len(results)) + '''</span><br>
-            <span class="summary-item"><b>总列数:</b> ''' + str(len(columns)) + '''</span><br>
-        </p>
-        <div class="section-title">查询结果</div>
-        <table WIDTH="100%" CELLPADDING="2" CELLSPACING="0" BORDER="1" BORDERCOLOR="#0066CC" BGCOLOR="#FFFFCC">
-            <thead>
-                <tr>'''
-    
-    # 表头
-    html_body_start = ''
-    for col in columns:
-        html_body_start += f'<th>{col}</th>'
-    
-    # 表头结束和表体开始
-    html_body_middle = '''</tr>
-            </thead>
-            <tbody>'''
-    
-    # 表格内容
-    html_body_end = ''
-    for i, row in enumerate(results):
-        html_body_end += '<tr>' 
-        for cell in row:
-            cell_value = str(cell) if cell is not None else '&nbsp;'
-            html_body_end += f'<td>{cell_value}</td>'
-        html_body_end += '</tr>'
-    
-    # HTML底部
-    html_foot = '''</tbody>
-        </table>
-        <div class="report-footer">
-            Generated by 数据报表工具 | ''' + datetime.now().strftime('%Y-%m-%d %H:%M:%S') + '''
-        </div>
-    </div>
-</body>
-</html>'''
-
-    
-    # 合并所有部分
-    return html_head + html_body_start + html_body_middle + html_body_end + html_foot
+        admission.close()
+        logging.error(f"流式导出失败：{str(e)} | SQL：{sql[:100]}...")
+        return jsonify({"status": "error", "message": f"导出失败：{str(e)}"})
 
 @app.route('/set_default_db', methods=['POST'])
 def set_default_db():
@@ -2269,13 +6253,13 @@ def manage_databases():
                 "user": user,
                 "password": encrypt_password(password),
                 "database": database,
+                "tags": parse_db_tags(data.get('tags', [])),  # 标签（用于多数据库并发查询）
                 "is_default": False  # 新增时不设为默认
             }
             
             existing_config.setdefault('databases', []).append(new_db)
             
-            with open(DB_CONFIG_FILE, 'w', encoding='utf-8') as f:
-                json.dump(existing_config, f, ensure_ascii=False, indent=2)
+            write_db_config_file(existing_config)
             
             logging.info(f"新增数据库配置：{name}")
             return jsonify({"status": "success", "message": "数据库配置新增成功！"})
@@ -2343,6 +6327,8 @@ def manage_databases():
                             "user": user,
                             "password": updated_password,
                             "database": database,
+                            # 未提供标签时保留原标签
+                            "tags": parse_db_tags(data['tags']) if 'tags' in data else db.get('tags', []),
                             "is_default": is_default
                         }
                         databases[i] = updated_db
@@ -2352,8 +6338,7 @@ def manage_databases():
                 if not db_found:
                     return jsonify({"status": "error", "message": "未找到对应的数据库配置！"})
             
-            with open(DB_CONFIG_FILE, 'w', encoding='utf-8') as f:
-                json.dump(existing_config, f, ensure_ascii=False, indent=2)
+            write_db_config_file(existing_config)
             
             logging.info(f"更新数据库配置：{name}")
             return jsonify({"status": "success", "message": "数据库配置更新成功！"})
@@ -2383,8 +6368,10 @@ def manage_databases():
                 
                 existing_config['databases'] = new_databases
                 
-                with open(DB_CONFIG_FILE, 'w', encoding='utf-8') as f:
-                    json.dump(existing_config, f, ensure_ascii=False, indent=2)
+                write_db_config_file(existing_config)
+                
+                # 关闭已删除数据库的连接池
+                CONNECTION_POOLS.close_pool(db_id)
                 
                 logging.info(f"删除数据库配置：{db_id}")
                 return jsonify({"status": "success", "message": "数据库配置删除成功！"})
@@ -2394,6 +6381,331 @@ def manage_databases():
         return jsonify({"status": "error", "message": f"操作失败：{str(e)}"})
 
 
+@app.route('/close_query_cursor', methods=['POST'])
+@require_auth
+def close_query_cursor():
+    """关闭游标分页模式下持有的查询游标并归还连接"""
+    try:
+        query_id = request.form.get('query_id') or (request.get_json(silent=True) or {}).get('query_id')
+        if not query_id:
+            return jsonify({"status": "error", "message": "缺少query_id参数！"})
+        closed = HELD_CURSORS.discard(query_id)
+        return jsonify({"status": "success", "message": "查询游标已关闭" if closed else "查询游标不存在或已过期"})
+    except Exception as e:
+        logging.error(f"关闭查询游标失败：{str(e)}")
+        return jsonify({"status": "error", "message": f"关闭失败：{str(e)}"})
+
+
+@app.route('/submit_query_job', methods=['POST'])
+@require_auth
+def submit_query_job():
+    """提交异步查询任务：立即返回任务ID，查询在后台工作线程中执行"""
+    try:
+        sql = request.form.get('sql', '').strip()
+        page = int(request.form.get('page', 1))
+        page_size = int(request.form.get('page_size', 50))
+        db_id = request.form.get('db_id', None)
+        transaction, on_error = parse_script_options(request.form)
+        
+        dialect = get_sql_dialect(db_id)
+        error = validate_sql_request(sql, page, page_size, dialect)
+        if error:
+            return jsonify({"status": "error", "message": error})
+        
+        sql_statements = split_sql_script(sql, dialect)
+        if not sql_statements:
+            return jsonify({"status": "error", "message": "SQL语句不能为空！"})
+        
+        job = QUERY_JOBS.submit(sql_statements, page, page_size, db_id, transaction, on_error)
+        logging.info(f"异步查询任务已提交：任务ID={job.job_id} | SQL：{sql[:100]}... | 数据库：{db_id or 'default'}")
+        return jsonify({
+            "status": "success",
+            "job_id": job.job_id,
+            "job_status": job.status,
+            "queue_position": QUERY_JOBS.queue_position(job)
+        })
+    except QueryQueueFull as e:
+        logging.warning(f"异步查询任务被拒绝：{str(e)}")
+        return jsonify({"status": "error", "message": str(e)}), 429
+    except ValueError as e:
+        logging.error(f"参数转换失败：{str(e)}")
+        return jsonify({"status": "error", "message": f"参数格式错误：{str(e)}"})
+    except Exception as e:
+        logging.error(f"提交异步查询任务失败：{str(e)}")
+        return jsonify({"status": "error", "message": f"提交失败：{str(e)}"})
+
+
+@app.route('/import_data', methods=['POST'])
+@require_auth
+def import_data():
+    """批量导入CSV/XLSX文件到目标表：以异步任务执行，进度通过 /query_job_status 查询"""
+    try:
+        upload = request.files.get('file')
+        if upload is None or not upload.filename:
+            return jsonify({"status": "error", "message": "请选择要导入的文件"})
+        file_type = os.path.splitext(upload.filename)[1].lower()
+        if file_type not in IMPORT_FILE_TYPES:
+            return jsonify({"status": "error", "message": "只支持导入CSV或XLSX文件"})
+        
+        table = request.form.get('table', '').strip()
+        if not IMPORT_TABLE_RE.fullmatch(table):
+            return jsonify({"status": "error", "message": "目标表名不合法"})
+        columns = request.form.get('columns')
+        columns = json.loads(columns) if columns else None
+        commit_mode = request.form.get('commit_mode', 'all')
+        if commit_mode not in IMPORT_COMMIT_MODES:
+            return jsonify({"status": "error", "message": "提交方式只能为 all 或 batch"})
+        db_id = request.form.get('db_id', None)
+        if not (get_database_by_id(db_id) if db_id else get_default_database()):
+            return jsonify({"status": "error", "message": "未找到有效的数据库配置"})
+        
+        file_path = create_export_temp_file(file_type, prefix='数据导入_')
+        upload.save(file_path)
+        job = ImportJob(
+            file_path, file_type, table, columns, db_id,
+            has_header=request.form.get('has_header', 'true').lower() == 'true',
+            separator=SUPPORTED_CSV_SEPARATORS.get(request.form.get('separator', 'comma'), ','),
+            sheet=request.form.get('sheet') or None,
+            commit_mode=commit_mode
+        )
+        try:
+            QUERY_JOBS.submit_job(job)
+        except QueryQueueFull:
+            remove_temp_file(file_path)
+            raise
+        logging.info(f"数据导入任务已提交：任务ID={job.job_id} | 文件：{upload.filename} | 表：{table} | 数据库：{db_id or 'default'}")
+        return jsonify({
+            "status": "success",
+            "job_id": job.job_id,
+            "job_status": job.status,
+            "queue_position": QUERY_JOBS.queue_position(job)
+        })
+    except QueryQueueFull as e:
+        logging.warning(f"数据导入任务被拒绝：{str(e)}")
+        return jsonify({"status": "error", "message": str(e)}), 429
+    except ValueError as e:
+        logging.error(f"参数转换失败：{str(e)}")
+        return jsonify({"status": "error", "message": f"参数格式错误：{str(e)}"})
+    except Exception as e:
+        logging.error(f"提交数据导入任务失败：{str(e)}")
+        return jsonify({"status": "error", "message": f"提交失败：{str(e)}"})
+
+
+@app.route('/query_job_status')
+@require_auth
+def query_job_status():
+    """查询异步任务的状态与进度"""
+    job = QUERY_JOBS.get(request.args.get('job_id', ''))
+    if job is None:
+        return jsonify({"status": "error", "message": "查询任务不存在或已过期！"})
+    return jsonify({"status": "success", "queue_position": QUERY_JOBS.queue_position(job), **job.snapshot()})
+
+
+@app.route('/query_job_result')
+@require_auth
+def query_job_result():
+    """获取异步任务的执行结果（与 /execute_sql 的返回格式相同）"""
+    job = QUERY_JOBS.get(request.args.get('job_id', ''))
+    if job is None:
+        return jsonify({"status": "error", "message": "查询任务不存在或已过期！"})
+    if job.status not in JOB_FINISHED_STATES:
+        return jsonify({"status": "pending", "job_id": job.job_id, "job_status": job.status,
+                        "message": "查询尚未完成，请稍后再试"})
+    if job.status == JOB_CANCELLED:
+        return jsonify({"status": "error", "job_id": job.job_id, "job_status": job.status,
+                        "cancelled": True, "message": "查询已取消"})
+    if job.result is None:
+        return jsonify({"status": "error", "job_id": job.job_id, "job_status": job.status, "message": job.error})
+    return jsonify({**job.result, "job_id": job.job_id, "job_status": job.status})
+
+
+@app.route('/submit_export_job', methods=['POST'])
+@require_auth
+def submit_export_job():
+    """提交后台导出任务：立即返回任务ID，文件在后台工作线程中生成，进度通过 /query_job_status 查询"""
+    try:
+        # 获取查询ID、数据来源（auto/cache/database）和导出格式
+        query_id = request.form.get('query_id')
+        source = request.form.get('source', 'auto').lower()
+        export_format = request.form.get('format', 'excel').lower()
+        if export_format not in EXPORT_JOB_FORMATS:
+            return jsonify({"status": "error", "message": f"不支持的导出格式！可选：{', '.join(EXPORT_JOB_FORMATS)}"})
+        extension, mimetype, _ = EXPORT_JOB_FORMATS[export_format]
+        entry = QUERY_RESULTS.lookup(query_id) if query_id else None
+        if entry is None:
+            return jsonify({"status": "error", "message": "查询结果不存在或已过期！请重新执行查询。"})
+        
+        # 格式参数（与对应导出接口相同）
+        header_color = request.form.get('header_color', '4472C4')
+        if not re.fullmatch(r'[0-9A-Fa-f]{6}', header_color):
+            return jsonify({"status": "error", "message": "表头颜色格式错误！"})
+        if export_format in ARROW_COMPRESSIONS:
+            compressions = ARROW_COMPRESSIONS[export_format]
+        elif export_format == 'excel':
+            compressions = ('none',)
+        else:
+            compressions = ('none', *EXPORT_COMPRESSIONS)
+        compression = request.form.get('compression', compressions[0]).lower()
+        if compression not in compressions:
+            return jsonify({"status": "error", "message": f"不支持的压缩方式！可选：{', '.join(compressions)}"})
+        options = {
+            'header_color': header_color,
+            'include_header': request.form.get('include_header', 'true').lower() == 'true',
+            'separator': SUPPORTED_CSV_SEPARATORS.get(request.form.get('separator', 'comma'), ','),
+            'compression': compression,
+        }
+        
+        custom_filename = request.form.get('filename', '')
+        if custom_filename:
+            filename = custom_filename if custom_filename.endswith(extension) else f"{custom_filename}{extension}"
+        else:
+            filename = f"SQL查询结果_{datetime.now().strftime('%Y%m%d%H%M%S')}{extension}"
+        if export_format in ('csv', 'html'):
+            # 得到压缩后的文件名（zstd未安装时在提交前报错）
+            _, filename, _ = compress_export_stream(iter(()), filename, mimetype, compression)
+        
+        job = QUERY_JOBS.submit_job(ExportJob(query_id, source, export_format, filename, options, entry.meta.get('db_id')))
+        logging.info(f"后台导出任务已提交：任务ID={job.job_id} | 查询ID={query_id} | 格式：{export_format} | 文件名：{filename}")
+        return jsonify({
+            "status": "success",
+            "job_id": job.job_id,
+            "job_status": job.status,
+            "queue_position": QUERY_JOBS.queue_position(job)
+        })
+    except QueryQueueFull as e:
+        logging.warning(f"后台导出任务被拒绝：{str(e)}")
+        return jsonify({"status": "error", "message": str(e)}), 429
+    except Exception as e:
+        logging.error(f"提交后台导出任务失败：{str(e)}")
+        return jsonify({"status": "error", "message": f"提交失败：{str(e)}"})
+
+
+@app.route('/export_job_download')
+@require_auth
+def export_job_download():
+    """下载后台导出任务生成的文件（支持Range请求断点续传，If-Range/ETag校验文件未变化）"""
+    job = QUERY_JOBS.get(request.args.get('job_id', ''))
+    if not isinstance(job, ExportJob):
+        return jsonify({"status": "error", "message": "导出任务不存在或已过期！"})
+    if job.status not in JOB_FINISHED_STATES:
+        return jsonify({"status": "pending", "job_id": job.job_id, "job_status": job.status,
+                        "message": "导出尚未完成，请稍后再试"})
+    if job.status != JOB_SUCCEEDED:
+        return jsonify({"status": "error", "job_id": job.job_id, "job_status": job.status,
+                        "message": job.error or "导出已取消"})
+    if not os.path.exists(job.file_path):
+        return jsonify({"status": "error", "message": "导出文件已过期，请重新导出！"})
+    response = send_file(job.file_path, mimetype=job.mimetype, as_attachment=True, download_name=job.filename,
+                         conditional=True, max_age=0)
+    response.headers['Content-Disposition'] = build_content_disposition(job.filename)
+    return response
+
+
+@app.route('/cancel_query_job', methods=['POST'])
+@require_auth
+def cancel_query_job():
+    """取消异步查询任务：排队中的直接移出队列，执行中的通过驱动取消正在执行的语句"""
+    try:
+        job_id = request.form.get('job_id') or (request.get_json(silent=True) or {}).get('job_id')
+        if not job_id:
+            return jsonify({"status": "error", "message": "缺少job_id参数！"})
+        job = QUERY_JOBS.cancel(job_id)
+        if job is None:
+            return jsonify({"status": "error", "message": "查询任务不存在或已过期！"})
+        logging.info(f"取消异步查询任务：任务ID={job_id} | 状态：{job.status}")
+        if job.status == JOB_CANCELLED:
+            message = "查询已取消"
+        elif job.status == JOB_RUNNING:
+            message = "已请求取消查询"
+        else:
+            message = "查询已结束"
+        return jsonify({"status": "success", "job_id": job_id, "job_status": job.status, "message": message})
+    except Exception as e:
+        logging.error(f"取消异步查询任务失败：{str(e)}")
+        return jsonify({"status": "error", "message": f"取消失败：{str(e)}"})
+
+
+@app.route('/query_jobs')
+@require_auth
+def query_jobs():
+    """获取异步查询任务列表与工作线程、队列统计"""
+    try:
+        QUERY_JOBS.expire()
+        return jsonify({"status": "success", "data": QUERY_JOBS.snapshot()})
+    except Exception as e:
+        logging.error(f"获取异步查询任务列表失败：{str(e)}")
+        return jsonify({"status": "error", "message": f"获取失败：{str(e)}"})
+
+
+@app.route('/query_admission_stats')
+@require_auth
+def query_admission_stats():
+    """获取查询准入控制统计信息（执行中、排队深度、等待时间、拒绝次数）"""
+    try:
+        return jsonify({"status": "success", "data": QUERY_ADMISSION.snapshot()})
+    except Exception as e:
+        logging.error(f"获取查询准入统计失败：{str(e)}")
+        return jsonify({"status": "error", "message": f"获取失败：{str(e)}"})
+
+
+@app.route('/result_store_stats')
+@require_auth
+def result_store_stats():
+    """获取查询结果缓存统计信息（命中、未命中、淘汰、溢出到磁盘等）"""
+    try:
+        return jsonify({
+            "status": "success",
+            "data": QUERY_RESULTS.snapshot(),
+            "statement_cache": RESULT_CACHE.snapshot()
+        })
+    except Exception as e:
+        logging.error(f"获取查询结果缓存统计失败：{str(e)}")
+        return jsonify({"status": "error", "message": f"获取失败：{str(e)}"})
+
+
+@app.route('/invalidate_result_cache', methods=['POST'])
+@require_auth
+def invalidate_result_cache():
+    """清除语句结果缓存：指定 db_id 时只清除该数据库的缓存"""
+    try:
+        db_id = request.form.get('db_id') or (request.get_json(silent=True) or {}).get('db_id') or None
+        count = RESULT_CACHE.invalidate(db_id)
+        logging.info(f"语句结果缓存已清除：数据库：{db_id or '全部'} | 数量：{count}")
+        return jsonify({"status": "success", "message": f"已清除{count}条缓存结果", "count": count})
+    except Exception as e:
+        logging.error(f"清除语句结果缓存失败：{str(e)}")
+        return jsonify({"status": "error", "message": f"清除失败：{str(e)}"})
+
+
+@app.route('/maintenance_stats')
+@require_auth
+def maintenance_stats():
+    """获取后台清理统计信息（运行次数、各项清理数量、最近一次耗时）"""
+    try:
+        return jsonify({"status": "success", "data": MAINTENANCE.snapshot()})
+    except Exception as e:
+        logging.error(f"获取后台清理统计失败：{str(e)}")
+        return jsonify({"status": "error", "message": f"获取失败：{str(e)}"})
+
+
+@app.route('/pool_stats')
+@require_auth
+def pool_stats():
+    """获取数据库连接池统计信息"""
+    try:
+        # 顺带回收空闲超时的连接
+        CONNECTION_POOLS.evict_idle()
+        HELD_CURSORS.close_expired()
+        return jsonify({
+            "status": "success",
+            "data": CONNECTION_POOLS.stats(),
+            "held_cursors": HELD_CURSORS.stats()
+        })
+    except Exception as e:
+        logging.error(f"获取连接池统计失败：{str(e)}")
+        return jsonify({"status": "error", "message": f"获取失败：{str(e)}"})
+
+
 # ===================== 启动 =====================
 
 
@@ -2457,13 +6769,13 @@ def check_app_password():
         input_password = data.get('password', '')
         
         # 加载已保存的密码
-        saved_password = load_app_password()
+        saved_password, password_version = APP_PASSWORD_CACHE.get()
         
         # 验证密码
-        if saved_password == "" or input_password == saved_password:
+        if saved_password == "" or hmac.compare_digest(str(input_password).encode('utf-8'), saved_password.encode('utf-8')):
             # 如果没有设置密码，或者输入密码正确，则验证通过
             # 返回会话令牌用于后续API调用
-            session_token = hashlib.sha256(saved_password.encode()).hexdigest() if saved_password else ""
+            session_token = issue_session_token(password_version) if saved_password else ""
             return jsonify({
                 "status": "success", 
                 "message": "验证通过", 
@@ -2514,7 +6826,7 @@ def change_app_password():
                 return jsonify({"status": "error", "message": "密码设置失败"})
         else:
             # 如果当前已有密码，则需要验证旧密码
-            if old_password != current_password:
+            if not hmac.compare_digest(old_password.encode('utf-8'), current_password.encode('utf-8')):
                 return jsonify({"status": "error", "message": "旧密码错误"})
             
             # 保存新密码
@@ -2576,170 +6888,245 @@ def has_app_password():
         return jsonify({"has_password": False})
 
 
-if __name__ == '__main__':
-    import sys
-    port = 5000  # 默认端口
-    for arg in sys.argv:
-        if arg.startswith('--port='):
+@app.route('/get_app_config')
+def get_app_config():
+    """获取应用配置"""
+    return jsonify({
+        "status": "success",
+        "config": APP_CONFIG
+    })
+
+
+@app.route('/save_app_config', methods=['POST'])
+@require_auth
+def save_app_config():
+    """保存应用配置"""
+    # 在函数开始时声明全局变量
+    global APP_CONFIG, DB_TIMEOUT_CONFIG, APP_CONFIG_SIGNATURE
+
+    try:
+        data = request.get_json()
+
+        # 验证输入数据
+        if not data:
+            return jsonify({"status": "error", "message": "缺少配置数据"}), 400
+
+        timeout_minutes = data.get('app_auto_lock_timeout_minutes')
+        reminder_minutes = data.get('app_auto_lock_reminder_minutes')
+        app_title = data.get('app_title', '朝阳数据')  # 获取应用标题，如果未提供则使用默认值
+        statement_timeout = data.get('db_statement_timeout', 30)  # 数据库语句超时时间
+        connect_timeout = data.get('db_connect_timeout', 10)      # 数据库连接超时时间
+        app_password = data.get('app_password', '')              # 应用访问密码
+        max_connections = data.get('app_max_connections', 10)    # 最大连接数
+        min_connections = data.get('app_min_connections', 1)     # 最小连接数
+        connection_pool_timeout = data.get('app_connection_pool_timeout', 30)  # 连接池超时时间
+        result_cache_time = data.get('app_result_cache_time', 3600)           # 结果缓存时间
+        max_result_size = data.get('app_max_result_size', 10000)              # 最大结果集大小
+        login_failures_limit = data.get('app_login_failures_limit', 5)        # 登录失败次数限制
+        account_lockout_minutes = data.get('app_account_lockout_minutes', 30) # 账户锁定时间
+        password_strength_required = data.get('app_password_strength_required', False)  # 密码强度要求
+        log_level = data.get('app_log_level', 'INFO')                       # 日志级别
+        log_retention_days = data.get('app_log_retention_days', 30)         # 日志保留天数
+        audit_logging_enabled = data.get('app_audit_logging_enabled', True)  # 审计日志开关
+        theme_color = data.get('app_theme_color', 'default')               # 主题色
+        language = data.get('app_language', 'zh-CN')                      # 界面语言
+        page_size = data.get('app_page_size', 50)                        # 页面大小
+        auto_save_interval = data.get('app_auto_save_interval', 300)      # 自动保存间隔
+        concurrent_queries = data.get('app_concurrent_queries', 5)       # 并发查询数
+        query_queue_size = data.get('app_query_queue_size', 10)         # 查询队列大小
+        memory_limit_mb = data.get('app_memory_limit_mb', 512)         # 内存限制
+        batch_insert_size = data.get('app_batch_insert_size', 1000)   # 批量插入大小
+        transaction_timeout = data.get('app_transaction_timeout', 120)  # 事务超时时间
+        connection_retry_count = data.get('app_connection_retry_count', 3)  # 连接重试次数
+        cleanup_interval = data.get('app_cleanup_interval', APP_CONFIG.get('app_cleanup_interval', 60))  # 后台清理间隔
+
+        if timeout_minutes is None or reminder_minutes is None:
+            return jsonify({"status": "error", "message": "缺少必要的配置参数"}), 400
+
+        # 验证配置值的合理性
+        if not isinstance(timeout_minutes, (int, float)) or not isinstance(reminder_minutes, (int, float)):
+            return jsonify({"status": "error", "message": "配置值必须为数字"}), 400
+
+        if timeout_minutes <= 0 or timeout_minutes > 1440:
+            return jsonify({"status": "error", "message": "自动锁定时间应在1-1440分钟之间"}), 400
+
+        if reminder_minutes <= 0 or reminder_minutes >= timeout_minutes:
+            return jsonify({"status": "error", "message": "提醒时间应大于0且小于自动锁定时间"}), 400
+
+        # 验证应用标题
+        if not isinstance(app_title, str) or len(app_title.strip()) == 0:
+            return jsonify({"status": "error", "message": "应用标题不能为空"}), 400
+
+        # 限制标题长度
+        if len(app_title) > 50:
+            return jsonify({"status": "error", "message": "应用标题不能超过50个字符"}), 400
+
+        # 验证数据库超时配置
+        if not isinstance(statement_timeout, (int, float)) or statement_timeout <= 0:
+            return jsonify({"status": "error", "message": "语句超时时间必须为正数"}), 400
+
+        if not isinstance(connect_timeout, (int, float)) or connect_timeout <= 0:
+            return jsonify({"status": "error", "message": "连接超时时间必须为正数"}), 400
+
+        # 创建新的配置字典
+        new_config = {
+            "app_auto_lock_timeout_minutes": int(timeout_minutes),
+            "app_auto_lock_reminder_minutes": int(reminder_minutes),
+            "app_title": app_title.strip(),  # 保存提供的标题
+            "db_statement_timeout": int(statement_timeout),
+            "db_connect_timeout": int(connect_timeout),
+            "app_max_connections": int(max_connections),
+            "app_min_connections": int(min_connections),
+            "app_connection_pool_timeout": int(connection_pool_timeout),
+            "app_result_cache_time": int(result_cache_time),
+            "app_max_result_size": int(max_result_size),
+            "app_login_failures_limit": int(login_failures_limit),
+            "app_account_lockout_minutes": int(account_lockout_minutes),
+            "app_password_strength_required": bool(password_strength_required),
+            "app_log_level": log_level,
+            "app_log_retention_days": int(log_retention_days),
+            "app_audit_logging_enabled": bool(audit_logging_enabled),
+            "app_theme_color": theme_color,
+            "app_language": language,
+            "app_page_size": int(page_size),
+            "app_auto_save_interval": int(auto_save_interval),
+            "app_concurrent_queries": int(concurrent_queries),
+            "app_query_queue_size": int(query_queue_size),
+            "app_memory_limit_mb": int(memory_limit_mb),
+            "app_batch_insert_size": int(batch_insert_size),
+            "app_transaction_timeout": int(transaction_timeout),
+            "app_connection_retry_count": int(connection_retry_count),
+            "app_cleanup_interval": int(cleanup_interval)
+        }
+
+        # 如果提供了密码，则加密并添加到配置中
+        if app_password:  # 只有当密码不为空时才更新
+            # 检查是否启用了密码强度验证
+            if password_strength_required:
+                # 验证密码强度
+                if not is_strong_password(app_password):
+                    return jsonify({"status": "error", "message": "密码不符合强度要求：至少8位，包含大写字母、小写字母、数字和特殊字符"}), 400
+            encrypted_password = encrypt_app_password(app_password)
+            new_config["app_password"] = encrypted_password
+        else:
+            # 如果没有提供密码，保留原有密码或使用空密码
+            # 先从原配置文件读取当前密码，而不是直接使用内存中的APP_CONFIG
             try:
-                port = int(arg.split('=')[1])
-                break
-            except ValueError:
-                print(f"无效的端口号: {arg}")
-                sys.exit(1)
+                with open(APP_CONFIG_FILE, 'r', encoding='utf-8') as f:
+                    current_config = json.load(f)
+                existing_password = current_config.get("app_password", "")
+            except:
+                existing_password = ""
+            new_config["app_password"] = existing_password
+
+        # 保存到配置文件
+        with open(APP_CONFIG_FILE, 'w', encoding='utf-8') as f:
+            json.dump(new_config, f, ensure_ascii=False, indent=4)
+
+        # 更新内存中的配置
+        APP_CONFIG = load_app_config()
+        APP_CONFIG_SIGNATURE = get_file_signature(APP_CONFIG_FILE)
+
+        # 更新数据库超时配置
+        DB_TIMEOUT_CONFIG = get_db_timeout_config()
+
+        logging.info(f"应用配置已更新: {new_config}")
 
-    @app.route('/get_app_config')
-    def get_app_config():
-        """获取应用配置"""
         return jsonify({
             "status": "success",
-            "config": APP_CONFIG
+            "message": "配置保存成功"
         })
 
-
-    @app.route('/save_app_config', methods=['POST'])
-    @require_auth
-    def save_app_config():
-        """保存应用配置"""
-        # 在函数开始时声明全局变量
-        global APP_CONFIG, DB_TIMEOUT_CONFIG
-        
+    except Exception as e:
+        logging.error(f"保存应用配置失败: {str(e)}")
+        return jsonify({
+            "status": "error", 
+            "message": f"保存配置失败: {str(e)}"
+        }), 500
+
+
+# ===================== 服务启动 =====================
+# 默认工作线程数（每个工作进程）
+DEFAULT_SERVER_THREADS = 8
+# 长时间导出/查询的请求超时（秒），gunicorn 默认30秒会中断大文件下载
+SERVER_REQUEST_TIMEOUT = 3600
+
+
+def parse_server_args(argv=None):
+    """解析启动参数"""
+    import argparse
+    parser = argparse.ArgumentParser(description='朝阳数据SQL查询工具')
+    parser.add_argument('--host', default='0.0.0.0', help='监听地址')
+    parser.add_argument('--port', type=int, default=5000, help='监听端口')
+    parser.add_argument('--workers', type=int, default=1, help='工作进程数（大于1时需要gunicorn）')
+    parser.add_argument('--threads', type=int, default=DEFAULT_SERVER_THREADS, help='每个工作进程的线程数')
+    parser.add_argument('--server', choices=['auto', 'gunicorn', 'waitress', 'dev'], default='auto',
+                        help='服务器：auto 依次尝试 gunicorn、waitress，都未安装时使用Flask开发服务器')
+    parser.add_argument('--state-backend', choices=['memory', 'sqlite'], default=None,
+                        help='共享状态后端，默认单进程为memory、多进程为sqlite')
+    parser.add_argument('--state-path', default=STATE_DB_FILE, help='sqlite共享状态文件路径')
+    args = parser.parse_args(argv)
+    if args.workers < 1 or args.threads < 1:
+        parser.error('--workers 和 --threads 必须为正整数')
+    if args.state_backend is None:
+        args.state_backend = 'sqlite' if args.workers > 1 else 'memory'
+    if args.workers > 1 and args.state_backend == 'memory':
+        parser.error('多进程部署（--workers > 1）需要使用 --state-backend=sqlite')
+    return args
+
+
+def select_server(name, workers):
+    """选择可用的服务器实现"""
+    candidates = [name] if name != 'auto' else (['gunicorn'] if workers > 1 else ['gunicorn', 'waitress'])
+    for candidate in candidates:
+        if candidate == 'dev':
+            return candidate
         try:
-            data = request.get_json()
-            
-            # 验证输入数据
-            if not data:
-                return jsonify({"status": "error", "message": "缺少配置数据"}), 400
-            
-            timeout_minutes = data.get('app_auto_lock_timeout_minutes')
-            reminder_minutes = data.get('app_auto_lock_reminder_minutes')
-            app_title = data.get('app_title', '朝阳数据')  # 获取应用标题，如果未提供则使用默认值
-            statement_timeout = data.get('db_statement_timeout', 30)  # 数据库语句超时时间
-            connect_timeout = data.get('db_connect_timeout', 10)      # 数据库连接超时时间
-            app_password = data.get('app_password', '')              # 应用访问密码
-            max_connections = data.get('app_max_connections', 10)    # 最大连接数
-            min_connections = data.get('app_min_connections', 1)     # 最小连接数
-            connection_pool_timeout = data.get('app_connection_pool_timeout', 30)  # 连接池超时时间
-            result_cache_time = data.get('app_result_cache_time', 3600)           # 结果缓存时间
-            max_result_size = data.get('app_max_result_size', 10000)              # 最大结果集大小
-            login_failures_limit = data.get('app_login_failures_limit', 5)        # 登录失败次数限制
-            account_lockout_minutes = data.get('app_account_lockout_minutes', 30) # 账户锁定时间
-            password_strength_required = data.get('app_password_strength_required', False)  # 密码强度要求
-            log_level = data.get('app_log_level', 'INFO')                       # 日志级别
-            log_retention_days = data.get('app_log_retention_days', 30)         # 日志保留天数
-            audit_logging_enabled = data.get('app_audit_logging_enabled', True)  # 审计日志开关
-            theme_color = data.get('app_theme_color', 'default')               # 主题色
-            language = data.get('app_language', 'zh-CN')                      # 界面语言
-            page_size = data.get('app_page_size', 50)                        # 页面大小
-            auto_save_interval = data.get('app_auto_save_interval', 300)      # 自动保存间隔
-            concurrent_queries = data.get('app_concurrent_queries', 5)       # 并发查询数
-            query_queue_size = data.get('app_query_queue_size', 10)         # 查询队列大小
-            memory_limit_mb = data.get('app_memory_limit_mb', 512)         # 内存限制
-            batch_insert_size = data.get('app_batch_insert_size', 1000)   # 批量插入大小
-            transaction_timeout = data.get('app_transaction_timeout', 120)  # 事务超时时间
-            connection_retry_count = data.get('app_connection_retry_count', 3)  # 连接重试次数
-            
-            if timeout_minutes is None or reminder_minutes is None:
-                return jsonify({"status": "error", "message": "缺少必要的配置参数"}), 400
-            
-            # 验证配置值的合理性
-            if not isinstance(timeout_minutes, (int, float)) or not isinstance(reminder_minutes, (int, float)):
-                return jsonify({"status": "error", "message": "配置值必须为数字"}), 400
-            
-            if timeout_minutes <= 0 or timeout_minutes > 1440:
-                return jsonify({"status": "error", "message": "自动锁定时间应在1-1440分钟之间"}), 400
-            
-            if reminder_minutes <= 0 or reminder_minutes >= timeout_minutes:
-                return jsonify({"status": "error", "message": "提醒时间应大于0且小于自动锁定时间"}), 400
-            
-            # 验证应用标题
-            if not isinstance(app_title, str) or len(app_title.strip()) == 0:
-                return jsonify({"status": "error", "message": "应用标题不能为空"}), 400
-            
-            # 限制标题长度
-            if len(app_title) > 50:
-                return jsonify({"status": "error", "message": "应用标题不能超过50个字符"}), 400
-            
-            # 验证数据库超时配置
-            if not isinstance(statement_timeout, (int, float)) or statement_timeout <= 0:
-                return jsonify({"status": "error", "message": "语句超时时间必须为正数"}), 400
-                
-            if not isinstance(connect_timeout, (int, float)) or connect_timeout <= 0:
-                return jsonify({"status": "error", "message": "连接超时时间必须为正数"}), 400
-            
-            # 创建新的配置字典
-            new_config = {
-                "app_auto_lock_timeout_minutes": int(timeout_minutes),
-                "app_auto_lock_reminder_minutes": int(reminder_minutes),
-                "app_title": app_title.strip(),  # 保存提供的标题
-                "db_statement_timeout": int(statement_timeout),
-                "db_connect_timeout": int(connect_timeout),
-                "app_max_connections": int(max_connections),
-                "app_min_connections": int(min_connections),
-                "app_connection_pool_timeout": int(connection_pool_timeout),
-                "app_result_cache_time": int(result_cache_time),
-                "app_max_result_size": int(max_result_size),
-                "app_login_failures_limit": int(login_failures_limit),
-                "app_account_lockout_minutes": int(account_lockout_minutes),
-                "app_password_strength_required": bool(password_strength_required),
-                "app_log_level": log_level,
-                "app_log_retention_days": int(log_retention_days),
-                "app_audit_logging_enabled": bool(audit_logging_enabled),
-                "app_theme_color": theme_color,
-                "app_language": language,
-                "app_page_size": int(page_size),
-                "app_auto_save_interval": int(auto_save_interval),
-                "app_concurrent_queries": int(concurrent_queries),
-                "app_query_queue_size": int(query_queue_size),
-                "app_memory_limit_mb": int(memory_limit_mb),
-                "app_batch_insert_size": int(batch_insert_size),
-                "app_transaction_timeout": int(transaction_timeout),
-                "app_connection_retry_count": int(connection_retry_count)
-            }
-            
-            # 如果提供了密码，则加密并添加到配置中
-            if app_password:  # 只有当密码不为空时才更新
-                # 检查是否启用了密码强度验证
-                if password_strength_required:
-                    # 验证密码强度
-                    if not is_strong_password(app_password):
-                        return jsonify({"status": "error", "message": "密码不符合强度要求：至少8位，包含大写字母、小写字母、数字和特殊字符"}), 400
-                encrypted_password = encrypt_app_password(app_password)
-                new_config["app_password"] = encrypted_password
-            else:
-                # 如果没有提供密码，保留原有密码或使用空密码
-                # 先从原配置文件读取当前密码，而不是直接使用内存中的APP_CONFIG
-                try:
-                    with open(APP_CONFIG_FILE, 'r', encoding='utf-8') as f:
-                        current_config = json.load(f)
-                    existing_password = current_config.get("app_password", "")
-                except:
-                    existing_password = ""
-                new_config["app_password"] = existing_password
-            
-            # 保存到配置文件
-            with open(APP_CONFIG_FILE, 'w', encoding='utf-8') as f:
-                json.dump(new_config, f, ensure_ascii=False, indent=4)
-            
-            # 更新内存中的配置
-            APP_CONFIG = load_app_config()
-            
-            # 更新数据库超时配置
-            DB_TIMEOUT_CONFIG = get_db_timeout_config()
-            
-            logging.info(f"应用配置已更新: {new_config}")
-            
-            return jsonify({
-                "status": "success",
-                "message": "配置保存成功"
-            })
-            
-        except Exception as e:
-            logging.error(f"保存应用配置失败: {str(e)}")
-            return jsonify({
-                "status": "error", 
-                "message": f"保存配置失败: {str(e)}"
-            }), 500
+            importlib.import_module(candidate)
+            return candidate
+        except ImportError:
+            continue
+    if name != 'auto' or workers > 1:
+        raise RuntimeError(f"未安装服务器 {candidates[0]}，请执行：pip install {candidates[0]}")
+    return 'dev'
+
+
+def run_gunicorn(host, port, workers, threads):
+    """以gunicorn多进程+多线程（gthread）方式运行"""
+    from gunicorn.app.base import BaseApplication
+
+    class StandaloneApplication(BaseApplication):
+        def load_config(self):
+            for key, value in {
+                'bind': f"{host}:{port}",
+                'workers': workers,
+                'threads': threads,
+                'worker_class': 'gthread',
+                'timeout': SERVER_REQUEST_TIMEOUT,
+            }.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    StandaloneApplication().run()
+
+
+def run_server(args):
+    """按启动参数运行服务"""
+    configure_state_backend(args.state_backend, args.state_path)
+    server = select_server(args.server, args.workers)
+    logging.info(f"SQL查询工具已启动（支持Excel/CSV/HTML导出），服务器：{server}，端口：{args.port}，"
+                 f"进程数：{args.workers}，线程数：{args.threads}")
+    if server == 'gunicorn':
+        run_gunicorn(args.host, args.port, args.workers, args.threads)
+    elif server == 'waitress':
+        from waitress import serve
+        serve(app, host=args.host, port=args.port, threads=args.threads, channel_timeout=SERVER_REQUEST_TIMEOUT)
+    else:
+        logging.warning("未安装gunicorn/waitress，使用Flask开发服务器（单进程多线程），不建议用于生产环境")
+        app.run(host=args.host, port=args.port, debug=False, threaded=True)
 
-    logging.info(f"SQL查询工具已启动（支持Excel/CSV/HTML导出），端口：{port}）")
-    app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
+
+if __name__ == '__main__':
+    run_server(parse_server_args())
@@ -0,0 +1,62 @@
+"""游标分页（HeldQueryCursor）的测试：用列表模拟服务端游标"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# app 在导入时配置日志文件
+os.makedirs(os.path.join(ROOT, 'log'), exist_ok=True)
+
+import app  # noqa: E402
+
+
+class ListCursor:
+    """可滚动的服务端游标：与psycopg2命名游标一样，MOVE越过末尾时不报错"""
+    description = [('id', None, None, None, None, None, None)]
+
+    def __init__(self, count):
+        self.rows = [(i,) for i in range(count)]
+        self.pos = 0
+
+    def fetchmany(self, size):
+        rows = self.rows[self.pos:self.pos + size]
+        self.pos += len(rows)
+        return rows
+
+    def scroll(self, value, mode='relative'):
+        self.pos = value if mode == 'absolute' else self.pos + value
+
+
+def held_cursor(count, db_type='postgresql'):
+    return app.HeldQueryCursor('q1', 'select id from t', {'type': db_type}, None, None, ListCursor(count), True)
+
+
+def test_total_count_after_reading_to_end():
+    held = held_cursor(25)
+    rows, has_more = held.fetch_page(20, 10)
+    assert rows == [(i,) for i in range(20, 25)] and not has_more
+    assert held.total_count() == 25 and held.total_count_exact()
+
+
+def test_page_past_end_does_not_report_offset():
+    held = held_cursor(25)
+    held.fetch_page(0, 10)
+    rows, has_more = held.fetch_page(100, 10)
+    assert rows == [] and not has_more
+    # 只确认读到过前10行（另有1行预读），总数不是跳过的偏移量100
+    assert held.total_count() == 11
+    assert not held.total_count_exact()
+
+    response = app.build_cursor_page_response('q1', held.columns, rows, 11, 10, has_more,
+                                              held.total_count(), held.total_count_exact())
+    assert response['total_count'] == 11 and response['total_count_exact'] is False
+
+
+@pytest.mark.parametrize('db_type, idle_timeout', [
+    ('postgresql', app.HELD_CURSOR_TRANSACTION_IDLE_TIMEOUT),
+    ('mysql', app.HELD_CURSOR_IDLE_TIMEOUT),
+])
+def test_idle_timeout_by_driver(db_type, idle_timeout):
+    assert held_cursor(1, db_type).idle_timeout == idle_timeout
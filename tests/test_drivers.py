@@ -0,0 +1,47 @@
+"""数据库驱动适配器（DatabaseDriver）的测试，驱动模块用假对象代替"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# app 在导入时配置日志文件
+os.makedirs(os.path.join(ROOT, 'log'), exist_ok=True)
+
+import app  # noqa: E402
+
+
+class FakeCxOracle:
+    """记录 connect 参数的 cx_Oracle"""
+
+    def __init__(self):
+        self.kwargs = None
+
+    def makedsn(self, host, port, service_name):
+        return (f"(DESCRIPTION=(ADDRESS=(PROTOCOL=TCP)(HOST={host})(PORT={port}))"
+                f"(CONNECT_DATA=(SERVICE_NAME={service_name})))")
+
+    def connect(self, **kwargs):
+        self.kwargs = kwargs
+        return object()
+
+
+def test_oracle_connect_timeout_in_dsn(monkeypatch):
+    driver = app.OracleDriver('oracle', 'Oracle')
+    fake = FakeCxOracle()
+    monkeypatch.setattr(driver, 'import_driver', lambda: fake)
+    driver.connect({'host': 'db', 'port': '1521', 'user': 'u', 'database': 'orcl'}, 7)
+    assert fake.kwargs['dsn'].startswith(
+        "(DESCRIPTION=(TRANSPORT_CONNECT_TIMEOUT=7)(CONNECT_TIMEOUT=7)(ADDRESS=(PROTOCOL=TCP)(HOST=db)(PORT=1521))"
+    )
+
+
+def test_driver_must_implement_connect():
+    with pytest.raises(TypeError):
+        app.DatabaseDriver('x', 'X')
+
+
+def test_copy_csv_out_unsupported():
+    with pytest.raises(ValueError):
+        app.DB_DRIVERS['mysql'].copy_csv_out(None, 'select 1', None)
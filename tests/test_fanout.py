@@ -0,0 +1,48 @@
+"""多数据库并发查询（execute_fanout_query / FanoutNode）的测试，使用sqlite内存库模拟各数据库"""
+import os
+import sqlite3
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# app 在导入时配置日志文件
+os.makedirs(os.path.join(ROOT, 'log'), exist_ok=True)
+
+import app  # noqa: E402
+
+
+class SQLiteTestDriver(app.DatabaseDriver):
+    module = 'sqlite3'
+    driver_name = 'sqlite3'
+
+    def connect(self, db_config, connect_timeout):
+        return sqlite3.connect(':memory:', check_same_thread=False)
+
+
+@pytest.fixture
+def databases(monkeypatch):
+    monkeypatch.setitem(app.DB_DRIVERS, 'sqlitetest', SQLiteTestDriver('sqlitetest', 'SQLite'))
+    return [{'id': db_id, 'name': db_id, 'type': 'sqlitetest', 'host': 'localhost', 'port': '0',
+             'user': 'u', 'database': db_id} for db_id in ('a', 'b')]
+
+
+def test_merge_results(databases):
+    data = app.execute_fanout_query("select 1 as x, 'v' as y", databases, 1, 10, 5)
+    assert data['status'] == 'success'
+    assert data['columns'] == [app.FANOUT_SOURCE_COLUMN, 'x', 'y']
+    assert data['results'] == [('a', 1, 'v'), ('b', 1, 'v')]
+    assert [node['status'] for node in data['nodes']] == [app.FANOUT_SUCCESS] * 2
+
+
+def test_abandoned_node_ignores_late_result(databases):
+    node = app.FanoutNode(databases[0])
+    node.started_at = time.monotonic()
+    node.abandon()
+    # 放弃等待后执行线程才结束：结果不再写入
+    node.run("select 1 as x", 5)
+    result = node.snapshot()
+    assert result.status == app.FANOUT_TIMEOUT
+    assert result.rows == () and result.columns is None
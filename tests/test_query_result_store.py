@@ -0,0 +1,87 @@
+"""查询结果缓存（QueryResultStore）溢出到磁盘的测试"""
+import os
+import stat
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# app 在导入时配置日志文件
+os.makedirs(os.path.join(ROOT, 'log'), exist_ok=True)
+
+import app  # noqa: E402
+
+COLUMNS = ['id', 'name']
+ROWS = [(i, f'row{i}') for i in range(10)]
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    # 预算为0：每个结果保存后立即溢出
+    monkeypatch.setitem(app.APP_CONFIG, 'app_memory_limit_mb', 0)
+    return app.QueryResultStore(str(tmp_path / 'results'))
+
+
+def test_rows_readable_while_spilling(store, monkeypatch):
+    seen = []
+    dump = app.pickle.dump
+
+    def checking_dump(obj, f, protocol=None):
+        # 写盘期间（锁外）结果仍可从内存读取
+        seen.append(store.read_page('q1', 0, 2, fmt='python'))
+        assert 'q1' in store
+        dump(obj, f, protocol=protocol)
+
+    monkeypatch.setattr(app.pickle, 'dump', checking_dump)
+    store.put('q1', COLUMNS, ROWS, sql='select 1')
+    assert seen and all(page == ROWS[:2] for page in seen)
+
+    snapshot = store.snapshot()
+    assert snapshot['disk_entries'] == 1 and snapshot['memory_bytes'] == 0
+    assert store.read_page('q1', 3, 5, fmt='python') == ROWS[3:5]
+
+
+def test_removed_while_spilling_leaves_no_file(store, monkeypatch):
+    dump = app.pickle.dump
+
+    def removing_dump(obj, f, protocol=None):
+        store.remove('q1')
+        dump(obj, f, protocol=protocol)
+
+    monkeypatch.setattr(app.pickle, 'dump', removing_dump)
+    store.put('q1', COLUMNS, ROWS)
+    assert store.snapshot()['entries'] == 0
+    assert os.listdir(store.spill_dir) == []
+
+
+@pytest.mark.skipif(not hasattr(os, 'getuid'), reason='POSIX权限')
+def test_spill_files_private(store):
+    os.makedirs(store.spill_dir, mode=0o777)
+    os.chmod(store.spill_dir, 0o777)
+    store.put('q1', COLUMNS, ROWS)
+    assert stat.S_IMODE(os.stat(store.spill_dir).st_mode) == 0o700
+    path = os.path.join(store.spill_dir, 'q1.rows')
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+
+class DescribedCursor:
+    """只提供 description 和 fetchall 的游标"""
+    description = [('id', None, None, None, None, None, None), ('name', None, None, None, None, None, None)]
+
+    def fetchall(self):
+        return list(ROWS)
+
+
+@pytest.mark.parametrize('sql, rerunnable', [
+    ("select id, name from t", True),
+    ("insert into t (name) values ('x') returning id, name", False),
+    ("call list_rows()", False),
+])
+def test_only_row_queries_record_sql(sql, rerunnable):
+    data = app.fetch_query_result(DescribedCursor(), sql, 1, 5, None)
+    entry = app.QUERY_RESULTS.lookup(data['query_id'])
+    assert (entry.meta.get('sql') == sql) is rerunnable
+    if not rerunnable:
+        # 不会重新执行，只能从缓存导出
+        assert app.open_export_source(data['query_id'], source='database') is None
@@ -0,0 +1,124 @@
+"""SQL安全分析（classify_sql）和流式导出COPY路径的回归测试"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# app 在导入时配置日志文件
+os.makedirs(os.path.join(ROOT, 'log'), exist_ok=True)
+
+import app  # noqa: E402
+
+COPY_PROGRAM_PAYLOAD = "select 1) TO PROGRAM 'touch /tmp/pwned' --"
+
+
+class RecordingCursor:
+    """记录 copy_expert 收到的SQL"""
+
+    def __init__(self):
+        self.sql = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def copy_expert(self, sql, sink):
+        self.sql = sql
+
+
+class RecordingConnection:
+    def __init__(self):
+        self.cursor_obj = RecordingCursor()
+
+    def cursor(self):
+        return self.cursor_obj
+
+
+@pytest.mark.parametrize('sql', [
+    COPY_PROGRAM_PAYLOAD,
+    "select 1) TO '/var/lib/postgresql/out.csv' --",
+    "select (1",
+    "select 1)); select (1",
+])
+def test_unbalanced_parentheses_rejected(sql):
+    assert not app.classify_sql(sql, 'postgresql').safe
+    assert app.validate_sql_request(sql, 1, 1, 'postgresql') == app.SQL_UNBALANCED_MESSAGE
+    assert not app.is_copy_export_query(sql, 'postgresql')
+
+
+@pytest.mark.parametrize('sql, expected', [
+    ("select * from t where a in (select b from u)", True),
+    ("select ')' from t;", True),
+    ("select 1 -- trailing comment", True),
+    ("select 1; select 2", False),
+    ("delete from t", False),
+])
+def test_copy_export_query(sql, expected):
+    assert app.is_copy_export_query(sql, 'postgresql') is expected
+
+
+def test_copy_wraps_query_on_its_own_lines():
+    conn = RecordingConnection()
+    app.PostgreSQLDriver('postgresql', 'PostgreSQL').copy_csv_out(conn, "select 1 -- note;", None)
+    assert conn.cursor_obj.sql.startswith("COPY (\nselect 1 -- note\n) TO STDOUT WITH (FORMAT csv")
+
+
+@pytest.mark.parametrize('sql, dialect', [
+    ("DO 'BEGIN DROP TABLE t; END'", 'postgresql'),
+    ("DO LANGUAGE plpgsql 'BEGIN DROP TABLE t; END'", 'postgresql'),
+    ("DO $$ BEGIN EXECUTE format('DROP TABLE %I', 't'); END $$", 'postgresql'),
+    ("PREPARE s FROM 'DROP TABLE t'; EXECUTE s", 'mysql'),
+    ("PREPARE s FROM @q; EXECUTE s", 'mysql'),
+    ("/*!50000 DROP TABLE t */", 'mysql'),
+    ("select 1 /*! ; DROP TABLE t */", 'mysql'),
+])
+def test_executed_code_is_analyzed(sql, dialect):
+    assert not app.classify_sql(sql, dialect).safe
+
+
+@pytest.mark.parametrize('sql, dialect', [
+    ("DO $$ BEGIN UPDATE t SET a = 1; END $$", 'postgresql'),
+    ("PREPARE s FROM 'select * from t where a = ?'; EXECUTE s USING @a", 'mysql'),
+    ("PREPARE p (int) AS SELECT * FROM t WHERE a = $1; EXECUTE p(1)", 'postgresql'),
+    ("select /*!40001 SQL_NO_CACHE */ * from t", 'mysql'),
+    ("select 'it''s DROP TABLE x' from t", 'postgresql'),
+    ("select q'[DROP TABLE x]' from dual", 'oracle'),
+])
+def test_code_strings_without_danger_allowed(sql, dialect):
+    assert app.classify_sql(sql, dialect).safe
+
+
+@pytest.mark.parametrize('sql, expected', [
+    ("WITH d AS (DELETE FROM t RETURNING *) SELECT * FROM d", False),
+    ("WITH a AS (SELECT 1), b AS (SELECT * FROM (UPDATE t SET x = 1 RETURNING x) u) SELECT * FROM b", False),
+    ("WITH RECURSIVE r AS (SELECT 1) INSERT INTO t SELECT * FROM r", False),
+    ("WITH a AS (SELECT * FROM t FOR UPDATE) SELECT * FROM a", True),
+    ("WITH a AS (SELECT 1) SELECT * FROM a", True),
+    ("SELECT * FROM t", True),
+])
+def test_with_data_modification_is_not_row_query(sql, expected):
+    assert app.is_row_query(sql, 'postgresql') is expected
+    assert app.script_should_stop('auto', sql, 'postgresql') is not expected
+
+
+@pytest.mark.parametrize('sql, expected', [
+    ("SELECT * FROM t WHERE a = 1", True),
+    ("SELECT share, lock_time FROM t", True),
+    ("SELECT * FROM t FOR UPDATE", False),
+    ("SELECT * FROM t FOR NO KEY UPDATE", False),
+    ("SELECT * FROM t FOR KEY SHARE", False),
+    ("SELECT * FROM t FOR SHARE", False),
+    ("SELECT * INTO new_t FROM t", False),
+    ("WITH d AS (DELETE FROM t RETURNING *) SELECT * FROM d", False),
+    ("INSERT INTO t VALUES (1)", False),
+])
+def test_cacheable_query(sql, expected):
+    assert app.is_cacheable_query(sql, 'postgresql') is expected
+
+
+def test_cacheable_query_mysql_lock():
+    assert not app.is_cacheable_query("SELECT * FROM t LOCK IN SHARE MODE", 'mysql')
@@ -0,0 +1,61 @@
+"""共享状态后端（SQLiteStateBackend）和会话令牌的测试"""
+import os
+import sqlite3
+import stat
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# app 在导入时配置日志文件
+os.makedirs(os.path.join(ROOT, 'log'), exist_ok=True)
+
+import app  # noqa: E402
+
+
+@pytest.fixture
+def sqlite_backend(tmp_path, monkeypatch):
+    backend = app.SQLiteStateBackend(str(tmp_path / 'state.sqlite3'))
+    monkeypatch.setattr(app, 'STATE_BACKEND', backend)
+    return backend
+
+
+def test_session_token_stored_as_digest(sqlite_backend):
+    token = app.issue_session_token('v1')
+    assert app.validate_session_token(token, 'v1')
+    assert not app.validate_session_token(token, 'v2')
+    assert not app.validate_session_token(token + 'x', 'v1')
+
+    keys = [row[0] for row in sqlite3.connect(sqlite_backend.path).execute("SELECT key FROM kv WHERE ns = 'session'")]
+    assert keys == [app.session_key(token)]
+    assert token not in keys
+
+
+@pytest.mark.skipif(not hasattr(os, 'getuid'), reason='POSIX权限')
+def test_state_file_private(sqlite_backend):
+    assert stat.S_IMODE(os.stat(sqlite_backend.path).st_mode) == 0o600
+
+
+@pytest.mark.skipif(not hasattr(os, 'getuid'), reason='POSIX权限')
+def test_app_temp_dir_private(tmp_path, monkeypatch):
+    temp_dir = tmp_path / 'hinautility'
+    temp_dir.mkdir(mode=0o755)
+    monkeypatch.setattr(app, 'APP_TEMP_DIR', str(temp_dir))
+    path = app.ensure_private_dir(str(temp_dir / 'exports'))
+    assert path == str(temp_dir / 'exports')
+    assert stat.S_IMODE(os.stat(temp_dir).st_mode) == 0o700
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o700
+
+
+def test_get_value_does_not_wait_for_write_lock(sqlite_backend):
+    sqlite_backend.set_value('query_source', 'q1', {'sql': 'select 1'}, 60)
+    writer = sqlite3.connect(sqlite_backend.path, timeout=0, isolation_level=None)
+    writer.execute("BEGIN IMMEDIATE")  # 其他工作进程正在写
+    try:
+        started = app.time.monotonic()
+        assert sqlite_backend.get_value('query_source', 'q1') == {'sql': 'select 1'}
+        assert app.time.monotonic() - started < 1
+    finally:
+        writer.execute("ROLLBACK")
+        writer.close()